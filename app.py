@@ -3,29 +3,27 @@
 QDashboard 主應用程式入口
 """
 
+import os
+
 from backend.app import create_app
+from backend.app.static_assets import StaticAssets
 
 # 建立 Flask 應用程式
 app = create_app()
 
+# 前端檔案在啟動時載入記憶體（文字類檔案預先壓縮）
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), 'frontend'))
+static_assets.preload()
+
 @app.route('/')
 def index():
     """首頁路由 - 提供前端頁面"""
-    from flask import send_file
-    import os
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'index.html')
-    return send_file(frontend_path)
+    return static_assets.send('index.html') or ("File not found", 404)
 
 @app.route('/<path:filename>')
 def static_files(filename):
     """靜態文件路由"""
-    from flask import send_file
-    import os
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', filename)
-    if os.path.exists(frontend_path):
-        return send_file(frontend_path)
-    else:
-        return "File not found", 404
+    return static_assets.send(filename) or ("File not found", 404)
 
 @app.route('/old-index')
 def old_index():
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+QDashboard ASGI 入口
+與 app.py 相同的路由與回應格式，由 asyncio 事件迴圈處理連線：
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 1 --bind :8080 asgi:app
+
+QDASHBOARD_WS_ENABLED=1 時同一個埠也提供 WebSocket 多工閘道（/api/ws）
+"""
+
+from app import app as flask_app
+from backend.ai import ai_routes
+from backend.app.asgi import create_asgi_app
+from backend.app.data_provider import get_data_provider
+from backend.app.ws_gateway import flask_view_job
+
+# create_app 已啟動背景輪詢，資料端點由原生 async 處理讀取快照，AI 路由在推理執行緒池中執行
+app = create_asgi_app(flask_app, get_data_provider(), ws_jobs={
+    "analyze": flask_view_job(flask_app, ai_routes.analyze_network_data),
+    "query": flask_view_job(flask_app, ai_routes.ai_query)
+})
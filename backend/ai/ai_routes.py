@@ -4,7 +4,7 @@ AI 分析 API 路由
 """
 
 from flask import Blueprint, jsonify, request
-from ..app.qubic_client import QubicNetworkClient
+from ..app.data_provider import get_data_provider
 import time
 import logging
 
@@ -14,8 +14,8 @@ logger = logging.getLogger(__name__)
 # 建立 AI API 藍圖
 ai_bp = Blueprint('ai_api', __name__)
 
-# 初始化組件
-qubic_client = QubicNetworkClient()
+# 初始化組件（與 API 路由共用同一個客戶端與背景輪詢快照）
+qubic_client = get_data_provider()
 
 # 延遲初始化推理引擎
 _inference_engine = None
@@ -65,44 +65,11 @@ def analyze_network_data():
         custom_query = request_data.get('query', '')
         language = request_data.get('language', 'zh-tw')  # 支援語言選擇
         
-        # 如果沒有提供數據，嘗試獲取即時數據
+        # 如果沒有提供數據，直接讀取共用資料層的最新快照
+        # （與 /api/tick、/api/stats 相同的內容，另附近期異常事件與 epoch 預測）
         if not data_to_analyze:
-            logger.info("未提供分析數據，獲取即時 Qubic 數據")
-            
-            # 使用與主應用相同的數據源
-            try:
-                import requests
-                import json
-                from flask import current_app
-                
-                # 嘗試從主應用的 API 端點獲取數據
-                with current_app.test_client() as client:
-                    # 獲取 tick 數據
-                    tick_response = client.get('/api/tick')
-                    tick_data = json.loads(tick_response.data) if tick_response.status_code == 200 else {}
-                    
-                    # 獲取統計數據
-                    stats_response = client.get('/api/stats')
-                    stats_data = json.loads(stats_response.data) if stats_response.status_code == 200 else {}
-                    
-                    data_to_analyze = {
-                        **tick_data,
-                        **stats_data
-                    }
-                    logger.info(f"🔍 從主應用API獲取數據: tick={data_to_analyze.get('tick')}, duration={data_to_analyze.get('duration')}")
-                    
-            except Exception as e:
-                logger.warning(f"從主應用API獲取數據失敗，使用備用方法: {e}")
-                # 備用方法：使用原來的 qubic_client
-                tick_info = qubic_client.get_tick_info()
-                stats = qubic_client.get_network_stats()
-                health = qubic_client.get_network_health()
-                
-                data_to_analyze = {
-                    **tick_info,
-                    **stats,
-                    "health": health
-                }
+            logger.info("未提供分析數據，讀取即時 Qubic 數據")
+            data_to_analyze = qubic_client.network_context()
         
         # 執行 AI 分析
         logger.info(f"開始 AI 分析... (語言: {language})")
@@ -309,17 +276,9 @@ def get_network_insights():
         # 獲取推理引擎
         engine = get_inference_engine()
         
-        # 獲取最新網路數據
-        tick_info = qubic_client.get_tick_info()
-        stats = qubic_client.get_network_stats()
-        health = qubic_client.get_network_health()
-        
-        # 合併數據
-        network_data = {
-            **tick_info,
-            **stats,
-            "health": health
-        }
+        # 獲取最新網路數據（tick、統計、健康狀況、異常與預測）
+        network_data = qubic_client.network_context()
+        health = network_data["health"]
         
         # 執行洞察分析
         logger.info("生成網路洞察...")
@@ -359,12 +318,8 @@ def get_ai_status():
         engine = get_inference_engine()
         engine_status = engine.get_status()
         
-        # 測試 Qubic 連接
-        try:
-            qubic_client.get_tick_info()
-            qubic_connected = True
-        except:
-            qubic_connected = False
+        # 由最新快照與斷路器判斷 Qubic 連接狀態（不發出請求，上游故障時不會卡在逾時）
+        qubic_connected = qubic_client.upstream_connected
         
         # 組合狀態資訊
         status = {
@@ -376,7 +331,8 @@ def get_ai_status():
             },
             "qubic_client": {
                 "status": "connected" if qubic_connected else "disconnected",
-                "connected": qubic_connected
+                "connected": qubic_connected,
+                "circuit_breaker": qubic_client.breaker.state
             },
             "api": {
                 "version": "1.0",
@@ -15,6 +15,9 @@ from transformers import AutoTokenizer, AutoModelForCausalLM
 import threading
 import logging
 from .qubic_knowledge import get_qubic_knowledge_base
+from .response_processor import get_response_processor
+from backend.app.anomaly_detector import format_anomalies
+from backend.app.epoch_forecast import format_forecast
 
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
@@ -23,12 +26,14 @@ logger = logging.getLogger(__name__)
 class DeepSeekInferenceEngine:
     """DeepSeek 推理引擎類別"""
     
-    def __init__(self, model_path: str = "/Users/apple/deepseek-qubic-ai/backend/ai/models/deepseek"):
+    def __init__(self, model_path: str = "/Users/apple/deepseek-qubic-ai/backend/ai/models/deepseek",
+                 use_model_embeddings: bool = False):
         """
         初始化推理引擎
         
         Args:
             model_path: 模型檔案路徑
+            use_model_embeddings: 模型載入後是否改用模型隱藏狀態建立知識向量索引
         """
         self.model_path = Path(model_path)
         self.tokenizer = None
@@ -36,10 +41,14 @@ class DeepSeekInferenceEngine:
         self.device = "cpu"  # 使用 CPU 模式
         self.model_loaded = False
         self.load_lock = threading.Lock()
+        self.use_model_embeddings = use_model_embeddings
         
         # 初始化 Qubic 知識庫
         self.qubic_kb = get_qubic_knowledge_base()
         
+        # 預編譯的回應後處理器
+        self.response_processor = get_response_processor()
+        
         # 推理配置 - 針對 Qubic 知識優化
         self.generation_config = {
             "max_new_tokens": 200,    # 使用 max_new_tokens 而非 max_length
@@ -113,6 +122,16 @@ class DeepSeekInferenceEngine:
                 logger.info(f"模型載入完成，耗時: {load_time:.2f}秒")
                 
                 self.model_loaded = True
+                
+                # 以已載入的模型重建知識向量索引（僅編碼內容變更的片段）
+                if self.use_model_embeddings:
+                    try:
+                        from .vector_index import ModelEncoder
+                        self.qubic_kb.use_encoder(ModelEncoder(self.model, self.tokenizer))
+                        logger.info("✅ 知識向量索引已改用模型隱藏狀態")
+                    except Exception as e:
+                        logger.warning(f"⚠️ 模型向量索引建立失敗，沿用本地編碼器: {e}")
+                
                 return True
                 
         except Exception as e:
@@ -121,25 +140,7 @@ class DeepSeekInferenceEngine:
     
     def _clean_response_format(self, response: str) -> str:
         """清理回應格式，移除過度格式化"""
-        # 移除過多的表情符號（保留適量）
-        import re
-        
-        # 移除連續的表情符號，只保留第一個
-        response = re.sub(r'([📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟]+)\s*([📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟]+)', r'\1', response)
-        
-        # 移除過度的星號格式
-        response = re.sub(r'\*\*([^*]+)\*\*', r'\1', response)
-        
-        # 簡化分隔線
-        response = re.sub(r'[-=]{3,}', '', response)
-        
-        # 移除過多的換行
-        response = re.sub(r'\n{3,}', '\n\n', response)
-        
-        # 確保句子結構自然
-        response = response.strip()
-        
-        return response
+        return self.response_processor.clean(response)
     
     def generate_response(self, prompt: str, max_length: Optional[int] = None, enhance_with_qubic: bool = True, language: str = "zh-tw", **kwargs) -> str:
         """
@@ -208,64 +209,43 @@ class DeepSeekInferenceEngine:
             logger.info(f"完整回應前200字符: {full_response[:200]}")
             logger.info(f"提示詞長度: {len(enhanced_prompt)} 字符")
             
-            # 處理 DeepSeek-R1 的回應格式
-            # 首先移除輸入提示詞
-            if full_response.startswith(enhanced_prompt):
-                response = full_response[len(enhanced_prompt):].strip()
-            else:
-                response = full_response.strip()
-            
-            logger.info(f"移除提示詞後的回應長度: {len(response)}")
-            logger.info(f"移除提示詞後的回應前100字符: {response[:100]}")
-            
-            # 處理 DeepSeek-R1 的 <think> 標籤
-            if '<think>' in response and '</think>' in response:
-                # 提取 </think> 之後的實際回應
-                think_end = response.find('</think>')
-                if think_end != -1:
-                    response = response[think_end + 8:].strip()  # 8 = len('</think>')
-                    logger.info(f"移除 <think> 標籤後: {response[:50]}")
-            
-            # 如果是 Qubic 增強查詢，嘗試找到標記
-            if enhance_with_qubic and response:
-                answer_markers = ["專業分析：", "分析：", "Analysis:", "回答：", "答案：", "Answer:", "回應："]
-                found_marker = False
-                
-                for marker in answer_markers:
-                    if marker in response:
-                        response = response.split(marker)[-1].strip()
-                        logger.info(f"✅ 找到標記 '{marker}'，提取回應: {response[:50]}")
-                        found_marker = True
-                        break
-                
-                if not found_marker:
-                    logger.info("未找到特定標記，使用完整回應")
+            # 單次掃描完成提示詞移除、<think> 截斷、標記擷取、格式清理與品質評分
+            processed = self.response_processor.process(
+                full_response,
+                prompt=enhanced_prompt,
+                extract_answer=enhance_with_qubic,
+                language=language
+            )
+            if processed['think_stripped']:
+                logger.info("已移除 <think> 區塊")
+            if processed['marker']:
+                logger.info(f"✅ 找到標記 '{processed['marker']}'")
+            elif enhance_with_qubic:
+                logger.info("未找到特定標記，使用完整回應")
             
             # 最終清理
-            if not response or len(response.strip()) < 10:
+            if processed['answer_length'] < 10:
                 logger.warning("回應過短或為空，使用備用回應")
                 if language == "en":
-                    response = self._get_fallback_english_response(enhanced_prompt)
+                    fallback = self._get_fallback_english_response(enhanced_prompt)
                 else:
-                    response = self._get_fallback_qubic_response(enhanced_prompt)
+                    fallback = self._get_fallback_qubic_response(enhanced_prompt)
+                processed = self.response_processor.process(fallback, extract_answer=False, language=language)
             
             generation_time = time.time() - start_time
             logger.info(f"回應生成完成，耗時: {generation_time:.2f}秒")
             
-            # 清理回應格式
-            response = self._clean_response_format(response)
+            response = processed['response']
+            validation = processed['validation']
             
             # 語言一致性檢查
-            if language == "en":
-                # 檢查是否包含中文字符
-                has_chinese = any('\u4e00' <= char <= '\u9fff' for char in response)
-                if has_chinese:
-                    logger.warning("英文回應包含中文字符，使用備用英文回應")
-                    response = self._get_fallback_english_response(prompt)
+            if not processed['language_ok']:
+                logger.warning("英文回應包含中文字符，使用備用英文回應")
+                response = self._get_fallback_english_response(prompt)
+                validation = self.qubic_kb.validate_response(response)
             
             # 驗證回應品質（僅針對 Qubic 相關查詢）
             if enhance_with_qubic:
-                validation = self.qubic_kb.validate_response(response)
                 logger.info(f"回應品質評估: {validation['quality']} (分數: {validation['accuracy_score']})")
                 
                 # 只有在極端情況下才使用備用回應
@@ -290,8 +270,8 @@ class DeepSeekInferenceEngine:
         
         # 嘗試獲取當前網路數據來提供即時分析
         try:
-            from backend.app.qubic_client import QubicNetworkClient
-            client = QubicNetworkClient()
+            from backend.app.data_provider import get_data_provider
+            client = get_data_provider()
             tick_info = client.get_tick_info()
             health = client.get_network_health()
             
@@ -322,20 +302,17 @@ Epoch: {current_epoch} - 當前階段運行中
 建議：{"繼續保持當前狀態" if current_duration <= 1 else "持續監控，暫無異常" if current_duration <= 2 else "加強監控，觀察趨勢變化"}"""
             
             elif any(word in query_lower for word in ['epoch', '進度', 'progress', '預測', 'predict']):
-                # 計算 Epoch 進度（假設每個 Epoch 約 1000 個 Tick）
-                epoch_start_tick = current_epoch * 1000
-                epoch_progress = ((current_tick - epoch_start_tick) / 1000) * 100
-                remaining_ticks = 1000 - (current_tick - epoch_start_tick)
-                estimated_minutes = remaining_ticks * (current_duration + 1) / 60
+                # 由 tick 歷史迴歸與 epoch 排程預測進度
+                forecast = client.get_epoch_forecast()
+                duration = forecast.get('duration') or {}
+                expected_s = duration.get('expected_ms', current_duration * 1000) / 1000
                 
-                return f"""Epoch {current_epoch} 進度預測分析：
+                return f"""Epoch {forecast.get('epoch', current_epoch)} 進度預測分析：
 
-當前進度: {epoch_progress:.1f}%
-剩餘 Ticks: 約 {remaining_ticks:,}
-預估完成時間: {estimated_minutes:.1f} 分鐘（基於當前 {current_duration}秒 Duration）
+{format_forecast(forecast)}
 
-趨勢分析：{"進度穩定，預計按時完成" if current_duration <= 1 else "進度正常，預計如期完成" if current_duration <= 2 else "進度略慢，密切觀察"}
-效率評估: {"高效率" if current_duration == 0 else "正常效率" if current_duration <= 2 else "效率偏低"}"""
+趨勢分析：{"進度穩定，預計按時完成" if expected_s <= 1 else "進度正常，預計如期完成" if expected_s <= 2 else "進度略慢，密切觀察"}
+效率評估: {"高效率" if expected_s <= 1 else "正常效率" if expected_s <= 2 else "效率偏低"}"""
         
         except Exception as e:
             if any(word in query_lower for word in ['status', 'health', '狀況', '健康']):
@@ -375,8 +352,8 @@ Epoch: {current_epoch} - 當前階段運行中
         
         # 嘗試獲取當前網路數據
         try:
-            from backend.app.qubic_client import QubicNetworkClient
-            client = QubicNetworkClient()
+            from backend.app.data_provider import get_data_provider
+            client = get_data_provider()
             tick_info = client.get_tick_info()
             health = client.get_network_health()
             
@@ -403,6 +380,14 @@ Epoch: {current_epoch} - 當前階段運行中
 - Observe Epoch transition stability
 
 💡 Data sourced from real-time Qubic network status."""
+            
+            elif any(word in query_lower for word in ['epoch', 'progress', 'predict', 'forecast']):
+                forecast = client.get_epoch_forecast()
+                return f"""📈 **Epoch {forecast.get('epoch', current_epoch)} Forecast**
+
+{format_forecast(forecast, language="en")}
+
+💡 Forecast fitted on recent tick history; ranges are 95% confidence intervals."""
         
         except Exception:
             if any(word in query_lower for word in ['status', 'health', 'analysis', 'network']):
@@ -496,6 +481,13 @@ Learn more at: https://docs.qubic.org/"""
         price = data.get('price', 0)
         active_addresses = data.get('activeAddresses', 0)
         
+        # 資料層偵測到的近期異常事件
+        anomaly_text = format_anomalies(data.get('anomalies') or [])
+        anomaly_section = f"\n近期異常事件：\n{anomaly_text}\n" if anomaly_text else ""
+        # 由 tick 歷史預測的 epoch 進度與近期持續時間
+        forecast_text = format_forecast(data.get('forecast'))
+        forecast_section = f"\nEpoch 預測：\n{forecast_text}\n" if forecast_text else ""
+        
         # 使用 Qubic 知識庫獲取分析上下文
         context = self.qubic_kb.get_relevant_context("network analysis", data)
         
@@ -508,11 +500,12 @@ Learn more at: https://docs.qubic.org/"""
 - Epoch: {epoch} (當前階段)
 - 健康狀況: {health.get('overall', '未知')}
 - 活躍地址: {active_addresses:,}
+- 近期異常事件: {len(data.get('anomalies') or [])} 筆
 
 分析重點：
 1. 基於這些具體數值評估網路性能
 2. 對比 Qubic 網路的正常運行標準
-3. 識別任何異常或優化機會
+3. 識別任何異常或優化機會（若有近期異常事件，說明其可能原因與影響）
 4. 提供實用的監控建議
 
 我需要提供專業、針對性的分析，避免通用模板。
@@ -529,7 +522,7 @@ Learn more at: https://docs.qubic.org/"""
 - 健康狀況: {health.get('overall', '未知')}
 - 價格: ${price:.9f}
 - 活躍地址: {active_addresses:,}
-
+{anomaly_section}{forecast_section}
 請提供專業的 Qubic 網路分析，包含：
 1. 當前性能評估（基於 Duration 和 Tick 指標）
 2. 網路健康狀況分析
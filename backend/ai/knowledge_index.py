@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Qubic 知識檢索索引
+預先計算的倒排索引 + BM25 評分，支援中英混合（CJK 二元組）分詞與 token 預算內的 top-k 檢索
+"""
+
+import math
+import re
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 英數詞與連續中文字串
+_TOKEN_RE = re.compile(r'[a-z0-9_]+|[一-鿿]+')
+# 粗估 token 數：中文字約 1 token、英數詞約 1 token、其他符號忽略
+_ESTIMATE_RE = re.compile(r'[A-Za-z0-9_]+|[一-鿿]')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    中英混合分詞
+
+    英數詞轉小寫保留整詞；連續中文字串拆成字元二元組（單字則保留單字），
+    讓「網路狀況」與「狀況」之類的查詢能互相匹配
+
+    Args:
+        text: 輸入文字
+
+    Returns:
+        詞項列表
+    """
+    tokens = []
+    for word in _TOKEN_RE.findall(text.lower()):
+        if word[0] < '一':
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估文字的模型 token 數"""
+    return len(_ESTIMATE_RE.findall(text))
+
+
+class PostingsView:
+    """以 CSR 陣列（可為記憶體映射）提供與倒排表 dict 相同的查詢介面"""
+
+    def __init__(self, vocab: List[str], offsets: np.ndarray, ids: np.ndarray, weights: np.ndarray):
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.ids = ids
+        self.weights = weights
+
+    def __len__(self) -> int:
+        return len(self.term_ids)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.term_ids
+
+    def __getitem__(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.term_ids[term]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.ids[start:end], self.weights[start:end]
+
+
+class BM25Index:
+    """BM25 倒排索引（建立時即計算每個詞項對每個文件的分數貢獻）"""
+
+    def __init__(self, documents: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75):
+        """
+        建立索引
+
+        Args:
+            documents: 文件列表，每個文件至少包含 "text" 欄位
+            k1: BM25 詞頻飽和參數
+            b: BM25 長度正規化參數
+        """
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.token_counts = [estimate_tokens(doc["text"]) for doc in documents]
+
+        term_freqs = []
+        doc_lengths = []
+        doc_freq: Dict[str, int] = {}
+        for doc in documents:
+            freqs: Dict[str, int] = {}
+            tokens = tokenize(doc.get("title", "") + "\n" + doc["text"])
+            for token in tokens:
+                freqs[token] = freqs.get(token, 0) + 1
+            for token in freqs:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+            term_freqs.append(freqs)
+            doc_lengths.append(len(tokens))
+
+        total = len(documents)
+        avg_length = (sum(doc_lengths) / total) if total else 0.0
+
+        # 倒排表：詞項 → (文件編號陣列, BM25 分數貢獻陣列)
+        lists: Dict[str, Tuple[List[int], List[float]]] = {}
+        for doc_id, freqs in enumerate(term_freqs):
+            norm = k1 * (1 - b + b * doc_lengths[doc_id] / avg_length) if avg_length else k1
+            for token, tf in freqs.items():
+                df = doc_freq[token]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                ids, weights = lists.setdefault(token, ([], []))
+                ids.append(doc_id)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {
+            token: (np.asarray(ids, dtype=np.int32), np.asarray(weights, dtype=np.float32))
+            for token, (ids, weights) in lists.items()
+        }
+
+    @classmethod
+    def from_postings(cls, documents: Sequence[Dict[str, Any]], postings: PostingsView,
+                      token_counts: Sequence[int], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        以預先計算好的倒排表建立索引（不重新分詞）
+
+        Args:
+            documents: 文件序列
+            postings: 倒排表
+            token_counts: 每個文件的 token 估計數
+
+        Returns:
+            BM25 索引
+        """
+        index = cls.__new__(cls)
+        index.documents = documents
+        index.k1 = k1
+        index.b = b
+        index.token_counts = token_counts
+        index.postings = postings
+        return index
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        BM25 檢索
+
+        Args:
+            query: 查詢文字
+            top_k: 回傳筆數
+
+        Returns:
+            [(文件編號, 分數)]，依分數由高到低
+        """
+        matched = [self.postings[token] for token in set(tokenize(query)) if token in self.postings]
+        if not matched:
+            return []
+
+        # 每個詞項的倒排表內文件編號不重複，可直接以向量化索引累加
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for ids, weights in matched:
+            scores[ids] += weights
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            top = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -scores[candidates]))
+        return [(int(candidates[i]), float(scores[candidates[i]])) for i in order]
+
+    def retrieve(self, query: str, top_k: int = 4, token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        檢索 top-k 文件，並在 token 預算內截止
+
+        Args:
+            query: 查詢文字
+            top_k: 最多回傳筆數
+            token_budget: 文件 token 總數上限（None 表示不限制）
+
+        Returns:
+            文件列表，依相關度排序
+        """
+        results = []
+        used = 0
+        for doc_id, _score in self.search(query, top_k):
+            cost = self.token_counts[doc_id]
+            if token_budget is not None and results and used + cost > token_budget:
+                continue
+            results.append(self.documents[doc_id])
+            used += cost
+        return results
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Qubic 知識儲存檔
+將 Qubic 知識 Markdown 文件依標題切成知識片段，寫成可記憶體映射的緊湊儲存檔
+（文字區塊 + 片段表 + BM25 倒排表），重建時僅重新處理內容有變更的檔案
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .knowledge_index import tokenize, estimate_tokens, PostingsView, BM25Index
+from .vector_index import document_hash
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_STORE_DIR = Path(__file__).parent / "index" / "knowledge"
+# 匯入的 Qubic 知識文件（明確列出，開發日誌、待辦追蹤、部署與規劃文件不進入回答脈絡）
+DEFAULT_SOURCES = [
+    "Qubic_Network_Capacity_Analysis.md",
+    "Qubic_Core_Economic_Analysis.md",
+    "Qubic_Node_Incentive_Economic_Model.md",
+    "Qubic_Subscription_Economic_Model.md",
+    "Qubic_vs_傳統區塊鏈_AI架構深度對話.md",
+    "AI_API_Usage_Guide.md",
+]
+
+# 片段表：來源檔案、標題與內文在文字區塊中的位元組位置、token 數與內容雜湊
+CHUNK_DTYPE = np.dtype([
+    ("source", "<i4"),
+    ("title_start", "<i8"), ("title_end", "<i8"),
+    ("text_start", "<i8"), ("text_end", "<i8"),
+    ("tokens", "<i4"),
+    ("hash", "S40"),
+])
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+_DECORATION_RE = re.compile(r'[*`]+')
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+
+def _split_section(content: str, max_tokens: int) -> List[str]:
+    """將過長的章節依段落（必要時依行）打包成不超過 max_tokens 的片段"""
+    units = []
+    for paragraph in _PARAGRAPH_RE.split(content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        cost = estimate_tokens(paragraph)
+        if cost > max_tokens:
+            units.extend((line, estimate_tokens(line)) for line in paragraph.split("\n") if line.strip())
+        else:
+            units.append((paragraph, cost))
+
+    pieces = []
+    current: List[str] = []
+    used = 0
+    for unit, cost in units:
+        if current and used + cost > max_tokens:
+            pieces.append("\n\n".join(current))
+            current, used = [], 0
+        current.append(unit)
+        used += cost
+    if current:
+        pieces.append("\n\n".join(current))
+    return pieces
+
+
+def chunk_markdown(text: str, source: str = "", max_tokens: int = 200) -> List[Dict[str, str]]:
+    """
+    依標題將 Markdown 切成知識片段
+
+    程式碼區塊內的 # 不視為標題；片段標題為「檔名 > 各層標題」，
+    片段內文以最近一層標題開頭，讓注入提示詞時保留章節脈絡
+
+    Args:
+        text: Markdown 內容
+        source: 來源檔案路徑（用於片段標題）
+        max_tokens: 每個片段的 token 上限
+
+    Returns:
+        片段列表，每個片段包含 "title" 與 "text"
+    """
+    document_title = Path(source).stem.replace("_", " ") if source else ""
+    sections: List[Tuple[List[str], str]] = []
+    headings: List[str] = []
+    body: List[str] = []
+    in_fence = False
+
+    def flush():
+        content = "\n".join(body).strip()
+        if content.strip("-=*_ \n"):  # 略過只有分隔線的章節
+            sections.append((list(headings), content))
+        body.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING_RE.match(line)
+            if match:
+                flush()
+                level = len(match.group(1))
+                del headings[level - 1:]
+                headings.extend([""] * (level - 1 - len(headings)))
+                headings.append(_DECORATION_RE.sub("", match.group(2)).strip())
+                continue
+        body.append(line)
+    flush()
+
+    chunks = []
+    for section_headings, content in sections:
+        names = [h for h in section_headings if h]
+        title = " > ".join([document_title] + names if document_title else names)
+        heading = names[-1] if names else document_title
+        for piece in _split_section(content, max_tokens):
+            chunks.append({"title": title, "text": f"{heading}\n{piece}".strip()})
+    return chunks
+
+
+def discover_sources(root: Optional[Path] = None, names: Optional[List[str]] = None) -> List[Path]:
+    """列出專案內存在的知識文件（預設為 DEFAULT_SOURCES）"""
+    root = Path(root or PROJECT_ROOT)
+    return [root / name for name in (names or DEFAULT_SOURCES) if (root / name).is_file()]
+
+
+class KnowledgeStore:
+    """記憶體映射的知識儲存檔，可直接作為片段序列與 BM25 索引使用"""
+
+    def __init__(self, path: Path):
+        """
+        載入一個儲存檔版本目錄
+
+        Args:
+            path: 版本目錄（由 CURRENT 指向）
+        """
+        self.path = Path(path)
+        with open(self.path / "manifest.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"不支援的儲存檔版本: {self.manifest.get('version')}")
+
+        self.sources: List[Dict[str, Any]] = self.manifest["sources"]
+        self.max_tokens = self.manifest["max_tokens"]
+        self.records = np.load(self.path / "chunks.npy", mmap_mode="r")
+        self.text = np.memmap(self.path / "text.bin", dtype=np.uint8, mode="r") \
+            if len(self.records) else np.zeros(0, dtype=np.uint8)
+        self.vocab = (self.path / "vocab.txt").read_text(encoding="utf-8").split("\n")
+        self.token_counts = self.records["tokens"]
+        self._term_freqs = None
+
+        postings = PostingsView(
+            self.vocab,
+            np.load(self.path / "term_offsets.npy", mmap_mode="r"),
+            np.load(self.path / "posting_ids.npy", mmap_mode="r"),
+            np.load(self.path / "posting_weights.npy", mmap_mode="r"),
+        )
+        self.index = BM25Index.from_postings(self, postings, self.token_counts,
+                                             self.manifest["k1"], self.manifest["b"])
+
+    @classmethod
+    def open(cls, store_dir: Optional[Path] = None) -> Optional["KnowledgeStore"]:
+        """
+        開啟目前版本的儲存檔
+
+        Args:
+            store_dir: 儲存檔目錄
+
+        Returns:
+            儲存檔，不存在、損毀或沒有片段時回傳 None
+        """
+        store_dir = Path(store_dir or DEFAULT_STORE_DIR)
+        try:
+            build = (store_dir / "CURRENT").read_text(encoding="utf-8").strip()
+            store = cls(store_dir / build)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, json.JSONDecodeError) as e:
+            logger.warning(f"無法載入知識儲存檔 {store_dir}: {e}")
+            return None
+        return store if len(store) else None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _decode(self, start: int, end: int) -> str:
+        return self.text[start:end].tobytes().decode("utf-8")
+
+    def __getitem__(self, row: int) -> Dict[str, str]:
+        record = self.records[row]
+        source = self.sources[record["source"]]
+        return {
+            "id": f"{source['path']}#{row - source['start']}",
+            "topic": "docs",
+            "source": source["path"],
+            "title": self._decode(record["title_start"], record["title_end"]),
+            "text": self._decode(record["text_start"], record["text_end"]),
+        }
+
+    @property
+    def hashes(self) -> List[str]:
+        """各片段的內容雜湊（與向量索引使用相同規則）"""
+        return [h.decode("ascii") for h in self.records["hash"].tolist()]
+
+    def term_freqs(self, row: int) -> Dict[str, int]:
+        """片段的詞頻（重建時沿用未變更檔案的分詞結果）"""
+        if self._term_freqs is None:
+            self._term_freqs = tuple(np.load(self.path / name, mmap_mode="r")
+                                     for name in ("tf_indptr.npy", "tf_terms.npy", "tf_counts.npy"))
+        indptr, terms, counts = self._term_freqs
+        start, end = indptr[row], indptr[row + 1]
+        return {self.vocab[t]: int(c) for t, c in zip(terms[start:end].tolist(), counts[start:end].tolist())}
+
+
+class ChunkSequence:
+    """將多個片段序列串接成單一唯讀序列（例如內建片段 + 儲存檔片段）"""
+
+    def __init__(self, *parts: Optional[Sequence[Dict[str, Any]]]):
+        self.parts = [part for part in parts if part is not None]
+        self.offsets = []
+        total = 0
+        for part in self.parts:
+            self.offsets.append(total)
+            total += len(part)
+        self.total = total
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if not 0 <= i < self.total:
+            raise IndexError(i)
+        part = bisect.bisect_right(self.offsets, i) - 1
+        return self.parts[part][i - self.offsets[part]]
+
+
+def build_store(sources: List[Path], store_dir: Optional[Path] = None, root: Optional[Path] = None,
+                max_tokens: int = 200, k1: float = 1.5, b: float = 0.75,
+                force: bool = False) -> Dict[str, Any]:
+    """
+    匯入 Markdown 文件並寫出新版本的知識儲存檔
+
+    內容雜湊未變更的檔案直接沿用上一版的片段與詞頻，只有變更的檔案重新切片與分詞；
+    BM25 權重依全域詞頻以向量化方式重新計算。新版本寫入獨立目錄後再原子替換 CURRENT
+
+    Args:
+        sources: Markdown 檔案列表
+        store_dir: 儲存檔目錄
+        root: 專案根目錄（來源路徑以相對路徑記錄）
+        max_tokens: 每個片段的 token 上限
+        k1: BM25 詞頻飽和參數
+        b: BM25 長度正規化參數
+        force: 忽略上一版，全部重新處理
+
+    Returns:
+        匯入統計
+    """
+    root = Path(root or PROJECT_ROOT).resolve()
+    store_dir = Path(store_dir or DEFAULT_STORE_DIR)
+    previous = None if force else KnowledgeStore.open(store_dir)
+    if previous is not None and (previous.max_tokens, previous.manifest["k1"], previous.manifest["b"]) != (max_tokens, k1, b):
+        previous = None
+    old_sources = {source["path"]: source for source in previous.sources} if previous else {}
+
+    blob = bytearray()
+    records = []
+    term_freqs: List[Dict[str, int]] = []
+    source_entries = []
+    stats = {"files": 0, "reprocessed": 0, "reused": 0, "skipped": 0}
+
+    def add(title: str, text: str, chunk_hash: str, freqs: Dict[str, int]):
+        title_bytes, text_bytes = title.encode("utf-8"), text.encode("utf-8")
+        title_start = len(blob)
+        blob.extend(title_bytes)
+        text_start = len(blob)
+        blob.extend(text_bytes)
+        records.append((len(source_entries), title_start, text_start, text_start, len(blob),
+                        estimate_tokens(text), chunk_hash.encode("ascii")))
+        term_freqs.append(freqs)
+
+    for path in sources:
+        path = Path(path).resolve()
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            logger.warning(f"無法讀取 {path}: {e}")
+            stats["skipped"] += 1
+            continue
+        rel = path.relative_to(root).as_posix() if path.is_relative_to(root) else str(path)
+        digest = hashlib.sha1(raw).hexdigest()
+        start = len(records)
+        old = old_sources.get(rel)
+
+        if old is not None and old["hash"] == digest:
+            for row in range(old["start"], old["end"]):
+                chunk = previous[row]
+                add(chunk["title"], chunk["text"], previous.records[row]["hash"].decode("ascii"),
+                    previous.term_freqs(row))
+            stats["reused"] += 1
+        else:
+            for chunk in chunk_markdown(raw.decode("utf-8", errors="replace"), rel, max_tokens):
+                freqs: Dict[str, int] = {}
+                for token in tokenize(chunk["title"] + "\n" + chunk["text"]):
+                    freqs[token] = freqs.get(token, 0) + 1
+                add(chunk["title"], chunk["text"], document_hash(chunk), freqs)
+            stats["reprocessed"] += 1
+
+        stats["files"] += 1
+        source_entries.append({"path": rel, "hash": digest, "start": start, "end": len(records)})
+
+    # 詞頻 CSR 與 BM25 倒排表（與 BM25Index 的評分公式一致）
+    vocab = sorted({term for freqs in term_freqs for term in freqs})
+    term_ids = {term: i for i, term in enumerate(vocab)}
+    total = len(records)
+    tf_indptr = np.zeros(total + 1, dtype=np.int64)
+    tf_indptr[1:] = np.cumsum([len(freqs) for freqs in term_freqs])
+    tf_terms = np.fromiter((term_ids[t] for freqs in term_freqs for t in freqs), dtype=np.int32, count=int(tf_indptr[-1]))
+    tf_counts = np.fromiter((c for freqs in term_freqs for c in freqs.values()), dtype=np.int32, count=int(tf_indptr[-1]))
+
+    doc_ids = np.repeat(np.arange(total, dtype=np.int32), np.diff(tf_indptr))
+    counts = tf_counts.astype(np.float64)
+    doc_lengths = np.bincount(doc_ids, weights=counts, minlength=total)
+    avg_length = doc_lengths.mean() if total else 0.0
+    doc_freq = np.bincount(tf_terms, minlength=len(vocab))
+    idf = np.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = k1 * (1 - b + b * doc_lengths / avg_length) if avg_length else np.full(total, k1)
+    weights = idf[tf_terms] * counts * (k1 + 1) / (counts + norm[doc_ids])
+    order = np.lexsort((doc_ids, tf_terms))
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    term_offsets[1:] = np.cumsum(doc_freq)
+
+    build = f"build-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    build_dir = store_dir / build
+    build_dir.mkdir(parents=True, exist_ok=True)
+    np.save(build_dir / "chunks.npy", np.array(records, dtype=CHUNK_DTYPE))
+    (build_dir / "text.bin").write_bytes(bytes(blob))
+    (build_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    np.save(build_dir / "term_offsets.npy", term_offsets)
+    np.save(build_dir / "posting_ids.npy", doc_ids[order])
+    np.save(build_dir / "posting_weights.npy", weights[order].astype(np.float32))
+    np.save(build_dir / "tf_indptr.npy", tf_indptr)
+    np.save(build_dir / "tf_terms.npy", tf_terms)
+    np.save(build_dir / "tf_counts.npy", tf_counts)
+    with open(build_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "created_at": time.time(),
+            "max_tokens": max_tokens,
+            "k1": k1,
+            "b": b,
+            "chunk_count": total,
+            "term_count": len(vocab),
+            "sources": source_entries,
+        }, f, ensure_ascii=False, indent=1)
+
+    # 原子切換 CURRENT，再清除舊版本（已映射的舊檔在 POSIX 上仍可讀到關閉為止）
+    tmp_current = store_dir / f"CURRENT.{os.getpid()}.tmp"
+    tmp_current.write_text(build, encoding="utf-8")
+    os.replace(tmp_current, store_dir / "CURRENT")
+    for old_build in store_dir.glob("build-*"):
+        if old_build.name != build:
+            shutil.rmtree(old_build, ignore_errors=True)
+
+    stats.update({"chunks": total, "terms": len(vocab), "bytes": len(blob), "path": str(build_dir)})
+    logger.info(f"知識儲存檔已更新: {stats['reprocessed']} 個檔案重新處理，{stats['reused']} 個沿用，共 {total} 個片段")
+    return stats
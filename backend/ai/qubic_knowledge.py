@@ -9,13 +9,44 @@ import re
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from .knowledge_index import BM25Index
+from .knowledge_store import KnowledgeStore, ChunkSequence
+from .vector_index import VectorIndex, document_hash
+from .response_validator import get_response_validator
+
 class QubicKnowledgeBase:
     """Qubic 知識庫"""
     
-    def __init__(self):
-        """初始化知識庫"""
+    def __init__(self, context_top_k: int = 4, context_token_budget: int = 300,
+                 store_dir: Optional[Path] = None):
+        """
+        初始化知識庫
+        
+        Args:
+            context_top_k: 每次檢索最多注入的知識片段數
+            context_token_budget: 注入知識片段的 token 預算
+            store_dir: 專案文件知識儲存檔目錄（由 scripts/ingest_knowledge.py 產生）
+        """
         self.knowledge_base = self._build_knowledge_base()
         self.contexts = self._build_contexts()
+        self.context_top_k = context_top_k
+        self.context_token_budget = context_token_budget
+        
+        # 預先建立 BM25 倒排索引與向量索引（向量索引僅在內容變更時重新編碼）
+        self.chunks = self._build_chunks()
+        self.context_index = BM25Index(self.chunks)
+        
+        # 專案文件片段直接記憶體映射已匯入的儲存檔，啟動時不重新切片與分詞
+        self.store = KnowledgeStore.open(store_dir)
+        self.documents = ChunkSequence(self.chunks, self.store)
+        self.token_counts = list(self.context_index.token_counts)
+        self.document_hashes = [document_hash(chunk) for chunk in self.chunks]
+        if self.store is not None:
+            self.token_counts += self.store.token_counts.tolist()
+            self.document_hashes += self.store.hashes
+        self.vector_index = VectorIndex(self.documents, hashes=self.document_hashes)
+        self.facts = self._build_facts()
+        self.fact_index = BM25Index([{"text": fact} for fact in self.facts])
         
     def _build_knowledge_base(self) -> Dict[str, Any]:
         """建立 Qubic 知識庫 - 基於官方文檔"""
@@ -182,23 +213,97 @@ class QubicKnowledgeBase:
 - 異常：多項指標有問題"""
         }
     
+    def _build_chunks(self) -> List[Dict[str, str]]:
+        """將上下文模板依段落切成知識片段（標題行併入下一段）"""
+        # 主題關鍵詞作為片段標題一併索引，讓英文查詢也能命中中文內容
+        topic_keywords = {
+            "general": "what definition about 是什麼 什麼是 定義",
+            "technology": "technology consensus upow qbc 技術 共識",
+            "development": "develop development api cli sdk 開發 工具",
+            "analysis": "analysis health status network 分析 狀況 健康"
+        }
+        chunks = []
+        for topic, context in self.contexts.items():
+            paragraphs = [p.strip() for p in context.split("\n\n") if p.strip()]
+            pending_header = ""
+            for paragraph in paragraphs:
+                if "\n" not in paragraph and paragraph.endswith("："):
+                    pending_header = f"{pending_header}\n{paragraph}".strip()
+                    continue
+                text = f"{pending_header}\n{paragraph}".strip()
+                pending_header = ""
+                chunks.append({"id": f"{topic}-{len(chunks)}", "topic": topic,
+                               "title": topic_keywords.get(topic, topic), "text": text})
+            if pending_header:
+                chunks.append({"id": f"{topic}-{len(chunks)}", "topic": topic,
+                               "title": topic_keywords.get(topic, topic), "text": pending_header})
+        return chunks
+    
+    def _build_facts(self) -> List[str]:
+        """建立 Qubic 事實列表"""
+        return [
+            "Qubic 使用基於法定人數的電腦（QBC）系統進行去中心化計算",
+            "有用工作量證明（UPoW）是 Qubic 的共識機制，結合安全性和實用性",
+            "Qubic Units (QUs) 是 Qubic 生態系統的原生代幣",
+            "Qubic 提供量子計算抗性，為未來技術做準備",
+            "Tick 是 Qubic 網路的處理週期，反映網路活動",
+            "Duration 測量 Tick 處理時間，影響網路性能",
+            "Epoch 代表 Qubic 網路的時代或階段",
+            "Computors 是 Qubic 網路中的計算節點",
+            "Qubic 支援智能合約執行和去中心化應用開發",
+            "Aigarth 是在 Qubic 網路上開發的重要項目"
+        ]
+    
+    def use_encoder(self, encoder):
+        """
+        切換向量索引的編碼器（例如改用已載入模型的隱藏狀態）
+        
+        Args:
+            encoder: 具備 name 與 encode(texts) 的編碼器
+        """
+        self.vector_index = VectorIndex(self.documents, encoder=encoder, hashes=self.document_hashes)
+    
+    def retrieve_chunks(self, query: str) -> List[Dict[str, str]]:
+        """
+        混合檢索：BM25 與向量相似度以倒數排名融合（RRF），並控制在 token 預算內
+        
+        Args:
+            query: 查詢文字
+            
+        Returns:
+            知識片段列表，依相關度排序
+        """
+        candidates = self.context_top_k * 2
+        rankings = [self.context_index.search(query, candidates),
+                    self.vector_index.search(query, candidates)]
+        if self.store is not None:
+            # 儲存檔片段接在內建片段之後編號
+            offset = len(self.chunks)
+            rankings.append([(offset + doc_id, score)
+                             for doc_id, score in self.store.index.search(query, candidates)])
+        
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (doc_id, _score) in enumerate(ranking):
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (60 + rank)
+        
+        selected = []
+        used = 0
+        for doc_id in sorted(fused, key=lambda i: (-fused[i], i))[:self.context_top_k]:
+            cost = self.token_counts[doc_id]
+            if selected and used + cost > self.context_token_budget:
+                continue
+            selected.append(self.documents[doc_id])
+            used += cost
+        return selected
+    
     def get_relevant_context(self, query: str, data: Optional[Dict] = None) -> str:
         """根據查詢獲取相關上下文"""
-        query_lower = query.lower()
-        
-        # 分析查詢類型
-        if any(word in query_lower for word in ['what', 'definition', '是什麼', '什麼是']):
-            context_type = "general"
-        elif any(word in query_lower for word in ['technology', 'consensus', 'upow', 'qbc', '技術', '共識']):
-            context_type = "technology"
-        elif any(word in query_lower for word in ['develop', 'api', 'cli', 'sdk', '開發', '工具']):
-            context_type = "development"
-        elif any(word in query_lower for word in ['analysis', 'health', 'status', '分析', '狀況', '健康']):
-            context_type = "analysis"
+        chunks = self.retrieve_chunks(query)
+        if chunks:
+            base_context = "\n\n".join(chunk["text"] for chunk in chunks)
         else:
-            context_type = "general"
-        
-        base_context = self.contexts[context_type]
+            base_context = self.contexts["general"]
         
         # 如果有當前網路數據，添加即時信息
         if data:
@@ -218,31 +323,15 @@ class QubicKnowledgeBase:
     
     def get_qubic_facts(self, topic: Optional[str] = None) -> List[str]:
         """獲取 Qubic 相關事實"""
-        all_facts = [
-            "Qubic 使用基於法定人數的電腦（QBC）系統進行去中心化計算",
-            "有用工作量證明（UPoW）是 Qubic 的共識機制，結合安全性和實用性",
-            "Qubic Units (QUs) 是 Qubic 生態系統的原生代幣",
-            "Qubic 提供量子計算抗性，為未來技術做準備",
-            "Tick 是 Qubic 網路的處理週期，反映網路活動",
-            "Duration 測量 Tick 處理時間，影響網路性能",
-            "Epoch 代表 Qubic 網路的時代或階段",
-            "Computors 是 Qubic 網路中的計算節點",
-            "Qubic 支援智能合約執行和去中心化應用開發",
-            "Aigarth 是在 Qubic 網路上開發的重要項目"
-        ]
-        
         if topic:
-            topic_lower = topic.lower()
-            relevant_facts = [fact for fact in all_facts 
-                            if any(keyword in fact.lower() for keyword in topic_lower.split())]
-            return relevant_facts[:5] if relevant_facts else all_facts[:3]
+            relevant_facts = [doc["text"] for doc in self.fact_index.retrieve(topic, top_k=5)]
+            return relevant_facts if relevant_facts else self.facts[:3]
         
-        return all_facts[:5]
+        return self.facts[:5]
     
     def enhance_query_with_context(self, query: str, network_data: Optional[Dict] = None, language: str = "zh-tw") -> str:
         """使用 Qubic 知識增強查詢"""
         context = self.get_relevant_context(query, network_data)
-        facts = self.get_qubic_facts()
         
         # 根據語言選擇提示詞模板
         if language == "en":
@@ -272,61 +361,12 @@ Analysis:"""
     
     def validate_response(self, response: str) -> Dict[str, Any]:
         """驗證回應的 Qubic 知識準確性 - 重新設計更合理的評分系統"""
-        score = 50  # 基礎分數，避免過於嚴苛
-        feedback = []
-        
-        # 檢查回應長度和結構合理性
-        if len(response) >= 20:
-            score += 10
-            feedback.append("回應長度合理")
-        
-        # 檢查是否包含數值分析（更實用的指標）
-        import re
-        numbers = re.findall(r'\d+', response)
-        if numbers:
-            score += 15
-            feedback.append("包含數值分析")
-        
-        # 檢查關鍵 Qubic 概念（放寬要求）
-        key_concepts = [
-            'tick', 'epoch', 'duration', 'qubic', '網路', 'network', 
-            '健康', 'health', '狀況', 'status', '分析', 'analysis'
-        ]
-        
-        found_concepts = [concept for concept in key_concepts if concept.lower() in response.lower()]
-        if found_concepts:
-            score += min(len(found_concepts) * 5, 25)  # 最多加 25 分
-            feedback.append(f"包含相關概念: {len(found_concepts)} 個")
-        
-        # 檢查是否有具體建議或結論
-        conclusion_indicators = [
-            '建議', '總結', '結論', 'recommend', 'conclusion', '分析', '評估'
-        ]
-        
-        found_conclusions = [ind for ind in conclusion_indicators if ind.lower() in response.lower()]
-        if found_conclusions:
-            score += 10
-            feedback.append("提供了結論或建議")
-        
-        # 檢查明顯錯誤（保持原有邏輯）
-        error_indicators = [
-            'netcat', 'netnat', '移動設備', 'mobile device',
-            '比特幣', 'bitcoin', '以太坊', 'ethereum', 'chatgpt', 'openai'
-        ]
-        
-        found_errors = [error for error in error_indicators if error.lower() in response.lower()]
-        if found_errors:
-            score -= len(found_errors) * 15  # 減少懲罰
-            feedback.append(f"發現錯誤信息: {', '.join(found_errors)}")
-        
-        # 確保分數在合理範圍
-        final_score = max(30, min(100, score))  # 最低 30 分，避免過低
-        
-        return {
-            "accuracy_score": final_score,
-            "feedback": feedback,
-            "quality": "good" if final_score >= 70 else "moderate" if final_score >= 50 else "poor"
-        }
+        # 詞彙由預編譯的多詞彙自動機一次掃描完成，評分規則見 validation_rules.json
+        return get_response_validator().score(response)
+    
+    def validate_responses(self, responses: List[str]) -> List[Dict[str, Any]]:
+        """批次驗證多個回應（評估與基準測試用）"""
+        return get_response_validator().score_batch(responses)
 
 # 全域知識庫實例
 _qubic_kb = None
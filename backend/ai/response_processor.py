@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+DeepSeek 回應後處理器
+以預編譯的模式完成提示詞移除、<think> 截斷、答案標記擷取、
+格式清理、語言檢查與品質評分，並支援串流分段輸入
+"""
+
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .response_validator import ResponseValidator, get_response_validator
+
+# 答案標記（依優先順序）
+DEFAULT_ANSWER_MARKERS = ["專業分析：", "分析：", "Analysis:", "回答：", "答案：", "Answer:", "回應："]
+
+_THINK_OPEN = '<think>'
+_THINK_CLOSE = '</think>'
+_EMOJI = '[📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟]'
+_EMOJI_PAIR_RE = re.compile('(' + _EMOJI + '+)\\s*' + _EMOJI + '+')
+
+# 串流時需保留的尾端字元（可能是尚未完整的格式標記）
+_UNSTABLE_TAIL = set('*-=\n \t\r<') | set('📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟')
+
+
+class ResponseProcessor:
+    """預編譯的回應後處理器"""
+
+    def __init__(self, answer_markers: Optional[List[str]] = None,
+                 validator: Optional[ResponseValidator] = None):
+        """
+        初始化後處理器並預編譯所有模式
+
+        Args:
+            answer_markers: 答案標記列表（依優先順序）
+            validator: 品質驗證器（預設為全域驗證器）
+        """
+        self.validator = validator or get_response_validator()
+        self.answer_markers = list(answer_markers or DEFAULT_ANSWER_MARKERS)
+        self._max_marker_len = max([len(m) for m in self.answer_markers] + [len(_THINK_CLOSE)])
+
+        # 結構掃描：<think>、</think> 與答案標記（串流時使用）
+        self._structure_re = re.compile(
+            '|'.join(re.escape(m) for m in [_THINK_OPEN, _THINK_CLOSE] + self.answer_markers)
+        )
+
+        # 四種格式清理合併為單一模式；每個分支以字面字元開頭，讓引擎能以字元集快速略過一般文字
+        self._clean_re = re.compile('|'.join(
+            [r'\*\*[^*]+\*\*', r'\n(?:[-=]{3,}|\n)*\n', r'-[-=]{2,}', r'=[-=]{2,}'] +
+            [re.escape(ch) + _EMOJI + r'*\s*' + _EMOJI + '+' for ch in _EMOJI[1:-1]]
+        ))
+
+    # ------------------------------------------------------------------
+    # 單次處理
+    # ------------------------------------------------------------------
+
+    def process(self, text: str, prompt: Optional[str] = None,
+                extract_answer: bool = True, language: str = "zh-tw") -> Dict[str, Any]:
+        """
+        處理完整的解碼輸出
+
+        Args:
+            text: 模型解碼後的完整文字
+            prompt: 輸入提示詞（若輸出以其開頭則移除）
+            extract_answer: 是否依答案標記擷取回應
+            language: 期望的回應語言
+
+        Returns:
+            包含清理後回應、語言判定與品質評分的字典
+        """
+        start = len(prompt) if prompt and text.startswith(prompt) else 0
+        answer_start, marker, think_stripped = self._locate_answer(text, start, extract_answer)
+
+        answer = text[answer_start:].strip()
+        tally = self.validator.new_tally()
+        cleaned = self._clean(answer, tally).strip()
+
+        return self._build_result(cleaned, len(answer), tally, marker, think_stripped, language)
+
+    def clean(self, text: str) -> str:
+        """僅清理回應格式"""
+        return self._clean_re.sub(self._replace, text).strip()
+
+    def score(self, text: str) -> Dict[str, Any]:
+        """僅計算品質評分（不改變文字）"""
+        return self.validator.score(text)
+
+    def stream(self, prompt: Optional[str] = None, extract_answer: bool = True,
+               language: str = "zh-tw") -> "StreamingResponseProcessor":
+        """建立串流處理器"""
+        return StreamingResponseProcessor(self, prompt=prompt, extract_answer=extract_answer,
+                                          language=language)
+
+    # ------------------------------------------------------------------
+    # 內部實作
+    # ------------------------------------------------------------------
+
+    def _locate_answer(self, text: str, start: int,
+                       extract_answer: bool) -> Tuple[int, Optional[str], bool]:
+        """找出答案起點（<think> 區塊之後、最後一個優先標記之後）"""
+        answer_start = start
+        think_stripped = False
+        close = text.find(_THINK_CLOSE, start)
+        if close != -1 and text.find(_THINK_OPEN, start) != -1:
+            answer_start = close + len(_THINK_CLOSE)
+            think_stripped = True
+
+        marker = None
+        if extract_answer:
+            for candidate in self.answer_markers:
+                position = text.rfind(candidate, answer_start)
+                if position != -1:
+                    marker = candidate
+                    answer_start = position + len(candidate)
+                    break
+
+        return answer_start, marker, think_stripped
+
+    def _clean(self, text: str, tally: Dict[str, Any]) -> str:
+        """清理格式並累計評分訊號"""
+        cleaned = self._clean_re.sub(self._replace, text)
+        self.validator.collect(cleaned, tally)
+        return cleaned
+
+    def _replace(self, match) -> str:
+        token = match.group()
+        first = token[0]
+        if first == '*':
+            return self._clean_re.sub(self._replace, token[2:-2])
+        if first == '\n':
+            newlines = token.count('\n')
+            return '\n\n' if newlines >= 3 else '\n' * newlines
+        if first == '-' or first == '=':
+            return ''
+        # 連續表情符號只保留第一段
+        return _EMOJI_PAIR_RE.match(token).group(1)
+
+    def _build_result(self, cleaned: str, answer_length: int, tally: Dict[str, Any],
+                      marker: Optional[str], think_stripped: bool, language: str) -> Dict[str, Any]:
+        has_chinese = tally["cjk"]
+        return {
+            "response": cleaned,
+            "answer_length": answer_length,
+            "marker": marker,
+            "think_stripped": think_stripped,
+            "has_chinese": has_chinese,
+            "language_ok": not (language == "en" and has_chinese),
+            "validation": self.validator.score_tally(len(cleaned), tally)
+        }
+
+
+class StreamingResponseProcessor:
+    """串流版本：逐段輸入，僅處理新到達的文字"""
+
+    def __init__(self, processor: ResponseProcessor, prompt: Optional[str] = None,
+                 extract_answer: bool = True, language: str = "zh-tw"):
+        self.processor = processor
+        self.prompt = prompt or ""
+        self.extract_answer = extract_answer
+        self.language = language
+
+        self._raw = ""
+        self._prompt_state = "pending" if self.prompt else "done"
+        self._start = 0            # 移除提示詞後的起點
+        self._scanned = 0          # 結構掃描進度
+        self._seen_open = False
+        self._first_close_end = None
+        self._last_marker: Dict[str, Tuple[int, int]] = {}
+
+        self._answer_start = 0
+        self._marker = None
+        self._think_stripped = False
+        self._consumed = 0         # 已清理到的原始位置
+        self._output: List[str] = []
+        self._emitted = False
+        self._tally = processor.validator.new_tally()
+
+    @property
+    def text(self) -> str:
+        """目前已確定的清理後回應"""
+        return ''.join(self._output).lstrip()
+
+    def feed(self, chunk: str) -> Tuple[str, bool]:
+        """
+        輸入一段新的解碼文字
+
+        Args:
+            chunk: 新的文字片段
+
+        Returns:
+            (新增的清理後文字, 答案是否重新開始)
+        """
+        self._raw += chunk
+        if self._prompt_state == "pending":
+            if len(self._raw) < len(self.prompt) and self.prompt.startswith(self._raw):
+                return "", False
+            self._start = len(self.prompt) if self._raw.startswith(self.prompt) else 0
+            self._prompt_state = "done"
+            self._scanned = self._start
+            self._answer_start = self._consumed = self._start
+
+        restarted = self._scan_structure()
+        before = len(self._output)
+        self._consume(self._stable_end())
+        delta = ''.join(self._output[before:])
+        if not self._emitted:
+            delta = delta.lstrip()
+            self._emitted = bool(delta)
+        return delta, restarted
+
+    def finish(self) -> Dict[str, Any]:
+        """結束串流並回傳與 process() 相同格式的結果"""
+        if self._prompt_state == "pending":
+            self._prompt_state = "done"
+            self._scanned = self._answer_start = self._consumed = 0
+        self._scan_structure(final=True)
+        self._consume(len(self._raw))
+        answer_length = len(self._raw[self._answer_start:].strip())
+        cleaned = self.text.rstrip()
+        return self.processor._build_result(cleaned, answer_length, self._tally, self._marker,
+                                            self._think_stripped, self.language)
+
+    def _scan_structure(self, final: bool = False) -> bool:
+        """掃描新文字中的結構標記，必要時重新定位答案起點"""
+        proc = self.processor
+        # 起點落在尾端 max_marker_len 內的標記可能尚未完整，留待下一段
+        stop = len(self._raw) if final else len(self._raw) - proc._max_marker_len + 1
+        resume = self._scanned
+        for match in proc._structure_re.finditer(self._raw, self._scanned):
+            if match.start() >= stop:
+                break
+            token = match.group()
+            if token == _THINK_OPEN:
+                self._seen_open = True
+            elif token == _THINK_CLOSE:
+                if self._first_close_end is None:
+                    self._first_close_end = match.end()
+            else:
+                self._last_marker[token] = (match.start(), match.end())
+            resume = match.end()
+        self._scanned = max(self._scanned, stop, resume)
+
+        answer_start = self._start
+        marker = None
+        think_stripped = False
+        if self._seen_open and self._first_close_end is not None:
+            answer_start = self._first_close_end
+            think_stripped = True
+        if self.extract_answer:
+            for candidate in proc.answer_markers:
+                position = self._last_marker.get(candidate)
+                if position and position[0] >= answer_start:
+                    marker = candidate
+                    answer_start = position[1]
+                    break
+
+        # 答案起點不變時（例如思考區塊在已找到的答案標記之前結束）也要更新，finish() 才與 process() 一致
+        self._think_stripped = think_stripped
+        if answer_start == self._answer_start:
+            return False
+        self._answer_start = answer_start
+        self._marker = marker
+        self._consumed = answer_start
+        self._output = []
+        self._emitted = False
+        self._tally = proc.validator.new_tally()
+        return True
+
+    def _stable_end(self) -> int:
+        """找出不會再被後續片段影響的清理邊界"""
+        end = min(len(self._raw), self._scanned)
+        # 思考區塊尚未結束時不輸出
+        if self._seen_open and self._first_close_end is None:
+            return self._consumed
+        # 退回到標點處，避免詞彙或格式標記被切斷
+        while end > self._consumed and (self._raw[end - 1] in _UNSTABLE_TAIL
+                                        or self._raw[end - 1].isalnum()):
+            end -= 1
+        # 未成對的 ** 需等待結尾
+        segment = self._raw[self._consumed:end]
+        if segment.count('**') % 2:
+            end = self._consumed + segment.rfind('**')
+        return max(end, self._consumed)
+
+    def _consume(self, end: int):
+        if end <= self._consumed:
+            return
+        self._output.append(self.processor._clean(self._raw[self._consumed:end], self._tally))
+        self._consumed = end
+
+
+# 全域後處理器實例
+_response_processor = None
+
+def get_response_processor() -> ResponseProcessor:
+    """獲取全域回應後處理器實例"""
+    global _response_processor
+    if _response_processor is None:
+        _response_processor = ResponseProcessor()
+    return _response_processor
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+DeepSeek 回應品質驗證器
+以單一預編譯的多詞彙自動機一次掃描找出所有概念、結論與錯誤詞彙，
+評分規則（詞彙、權重、回饋訊息）由 JSON 資料檔載入，並支援批次評分
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Any, FrozenSet, List, Optional, Set
+
+# 預設評分規則檔
+DEFAULT_RULES_PATH = Path(__file__).parent / "validation_rules.json"
+
+_CJK_RE = re.compile('[一-鿿]')
+_DIGITS_RE = re.compile(r'\d')
+
+
+def _trie_pattern(terms: List[str]) -> str:
+    """將詞彙建成字首樹並輸出對應的正規表示式（每個節點的分支都以不同字面字元開頭）"""
+    trie: Dict[str, Any] = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if '' in node:
+            # 已是完整詞彙：貪婪地嘗試延伸成更長的詞彙
+            return '(?:' + '|'.join(branches) + ')?' if branches else ''
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return emit(trie)
+
+
+class TermAutomaton:
+    """
+    多詞彙比對自動機
+
+    詞彙編譯成字首樹形狀的正規表示式，由 C 實作的比對引擎一次掃描文字，
+    在每個位置取最長詞彙；較短的詞彙若是已命中詞彙的子字串則由預先計算的閉包補齊，
+    可能與命中詞彙首尾重疊的少數詞彙再個別確認，結果與逐一子字串比對完全一致
+    """
+
+    def __init__(self, terms: List[str]):
+        """
+        編譯詞彙
+
+        Args:
+            terms: 詞彙列表（不分大小寫）
+        """
+        self.terms = list(dict.fromkeys(t.lower() for t in terms if t))
+        term_set = set(self.terms)
+        self._pattern = re.compile(_trie_pattern(self.terms)) if self.terms else None
+
+        # 命中某詞彙即代表其所有子字串詞彙也出現在文字中
+        self._implied: Dict[str, FrozenSet[str]] = {
+            term: frozenset(term[i:j] for i in range(len(term)) for j in range(i + 1, len(term) + 1)
+                            if term[i:j] in term_set)
+            for term in self.terms
+        }
+
+        # 命中詞彙的後綴若是更長詞彙的前綴，該詞彙可能從命中範圍內部開始而被不重疊的掃描略過，
+        # 這類候選詞彙數量很少，掃描後再以子字串比對確認
+        by_prefix: Dict[str, Set[str]] = {}
+        for term in self.terms:
+            for i in range(1, len(term)):
+                by_prefix.setdefault(term[:i], set()).add(term)
+        self._overlaps: Dict[str, FrozenSet[str]] = {
+            term: frozenset(other for i in range(1, len(term)) for other in by_prefix.get(term[i:], ()))
+            for term in self.terms
+        }
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _resolve(self, lowered: str, found: Set[str]) -> Set[str]:
+        """補上與已命中詞彙首尾重疊、可能被略過的詞彙"""
+        pending = set()
+        for term in found:
+            pending |= self._overlaps[term]
+        for term in pending - found:
+            if term in lowered:
+                found |= self._implied[term]
+        return found
+
+    def find(self, text: str, lowered: bool = False) -> Set[str]:
+        """
+        找出文字中出現的所有詞彙
+
+        Args:
+            text: 輸入文字
+            lowered: 輸入是否已轉為小寫
+
+        Returns:
+            出現過的詞彙集合
+        """
+        if self._pattern is None:
+            return set()
+        if not lowered:
+            text = text.lower()
+        found: Set[str] = set()
+        for term in set(self._pattern.findall(text)):
+            found |= self._implied[term]
+        return self._resolve(text, found)
+
+
+def load_scoring_rules(path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    載入評分規則
+
+    Args:
+        path: 規則檔路徑（預設為 validation_rules.json）
+
+    Returns:
+        評分規則字典
+    """
+    with open(path or DEFAULT_RULES_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ResponseValidator:
+    """資料驅動的回應品質驗證器"""
+
+    def __init__(self, rules: Optional[Dict[str, Any]] = None, rules_path: Optional[Path] = None):
+        """
+        初始化驗證器並編譯所有詞彙
+
+        類別的 terms 可以是詞彙列表（每個詞彙套用類別的 weight），
+        或是 {詞彙: 權重} 字典；設定 bonus 時命中任一詞彙即加固定分數
+
+        Args:
+            rules: 評分規則字典
+            rules_path: 評分規則檔路徑（未提供 rules 時載入）
+        """
+        self.rules = rules if rules is not None else load_scoring_rules(rules_path)
+        self.categories = []
+        all_terms: List[str] = []
+        for category in self.rules.get("categories", []):
+            terms = category.get("terms", [])
+            default_weight = category.get("weight", 0)
+            weights = {t.lower(): w for t, w in terms.items()} if isinstance(terms, dict) \
+                else {t.lower(): default_weight for t in terms}
+            self.categories.append({
+                "name": category["name"],
+                "terms": list(weights),
+                "weights": weights,
+                "bonus": category.get("bonus"),
+                "max_total": category.get("max_total"),
+                "min_total": category.get("min_total"),
+                "feedback": category.get("feedback", ""),
+            })
+            all_terms.extend(weights)
+        self.automaton = TermAutomaton(all_terms)
+
+    @staticmethod
+    def new_tally() -> Dict[str, Any]:
+        return {"terms": set(), "digits": False, "cjk": False}
+
+    def collect(self, text: str, tally: Dict[str, Any]):
+        """累計詞彙、數值與中文字元訊號（串流時可對每段文字重複呼叫）"""
+        tally["terms"] |= self.automaton.find(text)
+        if not tally["digits"] and _DIGITS_RE.search(text):
+            tally["digits"] = True
+        if not tally["cjk"] and _CJK_RE.search(text):
+            tally["cjk"] = True
+
+    def score_tally(self, length: int, tally: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        由統計結果計算品質評分
+
+        Args:
+            length: 回應長度
+            tally: collect() 累計的訊號
+
+        Returns:
+            包含 accuracy_score、feedback 與 quality 的評分結果
+        """
+        rules = self.rules
+        score = rules.get("base_score", 50)
+        feedback = []
+
+        length_rule = rules.get("length")
+        if length_rule and length >= length_rule["min_chars"]:
+            score += length_rule["bonus"]
+            feedback.append(length_rule["feedback"])
+
+        digits_rule = rules.get("digits")
+        if digits_rule and tally["digits"]:
+            score += digits_rule["bonus"]
+            feedback.append(digits_rule["feedback"])
+
+        found = tally["terms"]
+        for category in self.categories:
+            matched = [t for t in category["terms"] if t in found]
+            if not matched:
+                continue
+            if category["bonus"] is not None:
+                delta = category["bonus"]
+            else:
+                delta = sum(category["weights"][t] for t in matched)
+                if category["max_total"] is not None:
+                    delta = min(delta, category["max_total"])
+                if category["min_total"] is not None:
+                    delta = max(delta, category["min_total"])
+            score += delta
+            feedback.append(category["feedback"].format(count=len(matched), terms=", ".join(matched)))
+
+        final_score = max(rules.get("min_score", 30), min(rules.get("max_score", 100), score))
+        quality = "poor"
+        for level in rules.get("quality_levels", []):
+            if final_score >= level["min_score"]:
+                quality = level["label"]
+                break
+        return {
+            "accuracy_score": final_score,
+            "feedback": feedback,
+            "quality": quality
+        }
+
+    def score(self, text: str) -> Dict[str, Any]:
+        """計算單一回應的品質評分"""
+        tally = self.new_tally()
+        self.collect(text, tally)
+        return self.score_tally(len(text), tally)
+
+    def score_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        批次評分（評估與基準測試用），共用已編譯的自動機與規則
+
+        Args:
+            texts: 回應列表
+
+        Returns:
+            與輸入順序對應的評分結果列表
+        """
+        results = []
+        find = self.automaton.find
+        for text in texts:
+            tally = {
+                "terms": find(text),
+                "digits": _DIGITS_RE.search(text) is not None,
+                "cjk": _CJK_RE.search(text) is not None,
+            }
+            results.append(self.score_tally(len(text), tally))
+        return results
+
+
+# 全域驗證器實例
+_response_validator = None
+
+def get_response_validator() -> ResponseValidator:
+    """獲取全域回應驗證器實例"""
+    global _response_validator
+    if _response_validator is None:
+        _response_validator = ResponseValidator()
+    return _response_validator
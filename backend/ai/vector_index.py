@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Qubic 知識向量索引
+將知識片段編碼為向量並存成記憶體映射的 NumPy 矩陣，以向量化餘弦相似度做 top-k 檢索
+
+檢索遠低於 1 毫秒的預算只適用於預設的 HashingEncoder；改用 ModelEncoder 時，每個新查詢都需要
+一次完整的模型前向推論（CPU 上數十到數百毫秒），因此查詢向量以 LRU 快取，重複的查詢不再推論
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .knowledge_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# 預設索引目錄
+DEFAULT_INDEX_DIR = Path(__file__).parent / "index"
+# 查詢向量快取的最大筆數
+QUERY_CACHE_SIZE = 256
+
+
+class HashingEncoder:
+    """
+    輕量本地編碼器
+    以詞項、CJK 單字與英文字元三元組做特徵雜湊，不需模型即可處理同義改寫的部分重疊
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = tokenize(text)
+        for token in list(features):
+            if token[0] >= '一':
+                features.extend(token)  # CJK 單字
+            elif len(token) > 4:
+                padded = f"#{token}#"
+                features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        編碼文字為 L2 正規化向量
+
+        Args:
+            texts: 文字列表
+
+        Returns:
+            形狀為 (len(texts), dim) 的 float32 矩陣
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                slot = h % self.dim
+                counts[slot] = counts.get(slot, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+            if counts:
+                slots = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+                matrix[row, slots] = np.sign(values) * np.log1p(np.abs(values))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class ModelEncoder:
+    """
+    以已載入的 Qwen2 模型最後一層隱藏狀態做平均池化的編碼器
+    每次編碼都需要模型前向推論，適合建立索引；查詢向量由 VectorIndex 快取
+    """
+
+    def __init__(self, model, tokenizer, max_length: int = 256, name: Optional[str] = None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        hidden_size = getattr(getattr(model, "config", None), "hidden_size", "unknown")
+        model_name = getattr(getattr(model, "config", None), "_name_or_path", "model")
+        self.name = name or f"model-{Path(str(model_name)).name}-{hidden_size}"
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """編碼文字為 L2 正規化向量（逐筆推論，避免 padding 影響池化）"""
+        import torch
+
+        rows = []
+        with torch.no_grad():
+            for text in texts:
+                inputs = self.tokenizer(text, return_tensors="pt", truncation=True,
+                                        max_length=self.max_length)
+                outputs = self.model(**inputs, output_hidden_states=True)
+                hidden = outputs.hidden_states[-1][0].float()
+                mask = inputs["attention_mask"][0].unsqueeze(-1).float()
+                pooled = (hidden * mask).sum(0) / mask.sum().clamp(min=1)
+                rows.append(pooled.cpu().numpy())
+        matrix = np.asarray(rows, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+def content_hash(text: str) -> str:
+    """知識片段內容雜湊"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def document_text(doc: Dict[str, Any]) -> str:
+    """用於編碼與雜湊的片段文字（標題 + 內文）"""
+    return f"{doc.get('title', '')}\n{doc['text']}".strip()
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """知識片段雜湊（知識庫儲存檔預先計算時使用相同規則）"""
+    return content_hash(document_text(doc))
+
+
+class VectorIndex:
+    """記憶體映射的知識向量索引，僅在內容變更時增量重建"""
+
+    def __init__(self, documents: Sequence[Dict[str, Any]], encoder=None,
+                 index_dir: Optional[Path] = None, hashes: Optional[List[str]] = None):
+        """
+        建立或載入向量索引
+
+        Args:
+            documents: 文件序列，每個文件至少包含 "text" 欄位
+            encoder: 編碼器（預設為 HashingEncoder）
+            index_dir: 索引檔案目錄
+            hashes: 預先計算的片段雜湊（省略時逐一計算）
+        """
+        self.documents = documents
+        self.hashes = hashes
+        self.encoder = encoder or HashingEncoder()
+        self.index_dir = Path(index_dir or DEFAULT_INDEX_DIR)
+        self.matrix_path = self.index_dir / f"{self.encoder.name}.npy"
+        self.manifest_path = self.index_dir / f"{self.encoder.name}.json"
+        self.encoded_count = 0
+        self.matrix = self._load_or_build()
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _load_or_build(self) -> np.ndarray:
+        hashes = self.hashes if self.hashes is not None else [document_hash(doc) for doc in self.documents]
+        if not hashes:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        previous: Dict[str, int] = {}
+        old_matrix = None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            old_matrix = np.load(self.matrix_path, mmap_mode="r")
+            if manifest.get("hashes") == hashes and old_matrix.shape[0] == len(hashes):
+                return old_matrix  # 內容未變更，直接映射
+            previous = {h: row for row, h in enumerate(manifest.get("hashes", []))
+                        if row < old_matrix.shape[0]}
+        except (OSError, ValueError, json.JSONDecodeError):
+            old_matrix = None
+
+        # 僅編碼新增或變更的片段，其餘沿用既有向量
+        missing = [i for i, h in enumerate(hashes) if h not in previous]
+        encoded = self.encoder.encode([document_text(self.documents[i]) for i in missing]) \
+            if missing else None
+        dim = encoded.shape[1] if encoded is not None else (old_matrix.shape[1] if old_matrix is not None else 0)
+        self.encoded_count = len(missing)
+
+        matrix = np.zeros((len(hashes), dim), dtype=np.float32)
+        for row, h in enumerate(hashes):
+            if h in previous:
+                matrix[row] = old_matrix[previous[h]]
+        if encoded is not None:
+            matrix[missing] = encoded
+
+        try:
+            self._write(matrix, hashes)
+            logger.info(f"知識向量索引已更新: 重新編碼 {len(missing)}/{len(hashes)} 個片段")
+            return np.load(self.matrix_path, mmap_mode="r")
+        except OSError as e:
+            logger.warning(f"無法寫入知識向量索引，改用記憶體內矩陣: {e}")
+            return matrix
+
+    def _write(self, matrix: np.ndarray, hashes: List[str]):
+        """以暫存檔寫入後原子替換，避免其他程序讀到寫到一半的檔案"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_path.with_suffix(f".{os.getpid()}.tmp.npy")
+        tmp_manifest = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+
+        mapped = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=matrix.shape)
+        mapped[:] = matrix
+        mapped.flush()
+        del mapped
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump({"encoder": self.encoder.name, "dim": int(matrix.shape[1]), "hashes": hashes}, f)
+
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_manifest, self.manifest_path)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        餘弦相似度檢索
+
+        Args:
+            query: 查詢文字
+            top_k: 回傳筆數
+
+        Returns:
+            [(文件編號, 相似度)]，依相似度由高到低
+        """
+        if not len(self.documents):
+            return []
+        return self.search_vector(self.encode_query(query), top_k)
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """編碼查詢文字（LRU 快取，模型編碼器的重複查詢不再推論）"""
+        with self._query_lock:
+            vector = self._query_cache.get(query)
+            if vector is not None:
+                self._query_cache.move_to_end(query)
+                return vector
+        vector = self.encoder.encode([query])[0]
+        with self._query_lock:
+            self._query_cache[query] = vector
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def search_vector(self, vector: np.ndarray, top_k: int = 5) -> List[Tuple[int, float]]:
+        """以已編碼的查詢向量檢索（矩陣列向量皆已正規化，內積即餘弦相似度）"""
+        scores = self.matrix @ vector
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
@@ -5,8 +5,13 @@ QDashboard Flask 應用程式
 from flask import Flask
 from flask_cors import CORS
 
-def create_app():
-    """建立 Flask 應用程式"""
+def create_app(start_poller: bool = True):
+    """
+    建立 Flask 應用程式
+    
+    Args:
+        start_poller: 是否啟動 Qubic 網路背景輪詢
+    """
     app = Flask(__name__)
     
     # 啟用 CORS 以支援前端請求
@@ -15,8 +20,22 @@ def create_app():
     # 設置配置
     app.config['JSON_AS_ASCII'] = False  # 支援中文字符
     
+    # 超過門檻的 JSON 回應依 Accept-Encoding 壓縮（br/gzip）
+    from .compression import install_compression
+    install_compression(app)
+    
     # 註冊藍圖
     from .routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # AI 分析端點（ASGI 模式下在獨立的推理執行緒池中執行）
+    from ..ai.ai_routes import ai_bp
+    app.register_blueprint(ai_bp, url_prefix='/api/ai')
+    
+    # 啟動背景輪詢，最多等待第一份快照 5 秒，避免第一批請求拿到空數據
+    if start_poller:
+        from .data_provider import get_data_provider
+        client = get_data_provider()
+        client.start_polling(wait=5)
+    
     return app
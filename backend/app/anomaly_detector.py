@@ -0,0 +1,260 @@
+"""
+Qubic 網路指標串流異常偵測
+對每個指標維護指數加權的基準平均值與變異數，以滾動 z 分數偵測突發尖峰，
+以雙向 CUSUM 偵測持續的水準變化（change point），每個樣本 O(1) 更新，
+偵測到的事件放入有界佇列供 /api/anomalies 與 AI 分析提示使用
+"""
+
+import itertools
+import math
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# 預設參數
+DEFAULT_EVENT_CAPACITY = 200
+DEFAULT_ALPHA = 0.05         # 基準平均值/變異數的平滑係數
+DEFAULT_WARMUP = 20          # 開始偵測前需要的樣本數
+DEFAULT_Z_THRESHOLD = 4.0    # 尖峰 z 分數門檻
+DEFAULT_CUSUM_K = 0.5        # CUSUM 容許偏移（以標準差為單位）
+DEFAULT_CUSUM_H = 8.0        # CUSUM 決策門檻
+CRITICAL_Z = 8.0
+
+# 偵測的指標：{名稱: (顯示名稱, 相對最小標準差, 絕對最小標準差)}
+# 最小標準差避免指標幾乎不變（或長時間為 0）時微小波動產生極大的 z 分數；
+# 比例與百分比指標的平均值可能接近 0，相對下限無效，以絕對下限（比例 0.02、品質 0.5 個百分點）為準
+DEFAULT_METRICS = {
+    "duration_ms": ("tick 持續時間", 0.05, 10.0),
+    "empty_tick_ratio": ("空 tick 比例", 0.0, 0.02),
+    "tick_quality": ("tick 品質", 0.001, 0.5),
+}
+
+_KIND_LABELS = {
+    "spike_up": "突增",
+    "spike_down": "驟降",
+    "shift_up": "持續上升",
+    "shift_down": "持續下降",
+}
+
+
+def _fmt(value: float) -> str:
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.4g}"
+
+
+class MetricDetector:
+    """單一指標的 z 分數 + CUSUM 偵測器"""
+
+    def __init__(self, name: str, label: str, min_rel_std: float = 0.0, min_abs_std: float = 0.0,
+                 alpha: float = DEFAULT_ALPHA,
+                 warmup: int = DEFAULT_WARMUP, z_threshold: float = DEFAULT_Z_THRESHOLD,
+                 cusum_k: float = DEFAULT_CUSUM_K, cusum_h: float = DEFAULT_CUSUM_H):
+        self.name = name
+        self.label = label
+        self.min_rel_std = min_rel_std
+        self.min_abs_std = min_abs_std
+        self.alpha = alpha
+        self.warmup = warmup
+        self.z_threshold = z_threshold
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum_pos = 0.0
+        self.cusum_neg = 0.0
+
+    def _std(self) -> float:
+        floor = max(abs(self.mean) * self.min_rel_std, self.min_abs_std)
+        return max(math.sqrt(self.var), floor, 1e-9)
+
+    def update(self, value: float) -> Optional[Dict[str, Any]]:
+        """
+        加入一個樣本
+
+        Args:
+            value: 指標值
+
+        Returns:
+            偵測到的事件（未偵測到時為 None）
+        """
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return None
+
+        std = self._std()
+        baseline = self.mean
+        z = (value - baseline) / std
+        event = None
+
+        if self.count > self.warmup:
+            # CUSUM 累積超出容許偏移的標準化殘差
+            zc = max(-self.z_threshold, min(self.z_threshold, z))
+            self.cusum_pos = max(0.0, self.cusum_pos + zc - self.cusum_k)
+            self.cusum_neg = max(0.0, self.cusum_neg - zc - self.cusum_k)
+
+            if abs(z) >= self.z_threshold:
+                event = self._event("spike_up" if z > 0 else "spike_down", value, baseline, z)
+            elif self.cusum_pos > self.cusum_h or self.cusum_neg > self.cusum_h:
+                event = self._event("shift_up" if self.cusum_pos > self.cusum_h else "shift_down",
+                                    value, baseline, z)
+                # 新的水準成為基準
+                self.mean = value
+                self.cusum_pos = self.cusum_neg = 0.0
+                return event
+
+        if self.count > self.warmup:
+            # 尖峰以截斷後的值更新基準，避免單一極端值拉動平均值
+            value = baseline + max(-self.z_threshold, min(self.z_threshold, z)) * std
+            alpha = self.alpha
+        else:
+            alpha = 1.0 / self.count
+        delta = value - self.mean
+        self.mean += alpha * delta
+        self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        return event
+
+    def _event(self, kind: str, value: float, baseline: float, z: float) -> Dict[str, Any]:
+        return {
+            "metric": self.name,
+            "kind": kind,
+            "value": round(value, 4),
+            "baseline": round(baseline, 4),
+            "zscore": round(z, 2),
+            "severity": "critical" if abs(z) >= CRITICAL_Z else "warning",
+            "message": f"{self.label}{_KIND_LABELS[kind]}: {_fmt(value)}（基準 {_fmt(baseline)}，z={z:.1f}）"
+        }
+
+
+class AnomalyDetector:
+    """多指標串流異常偵測器，事件存放於有界佇列（執行緒安全）"""
+
+    def __init__(self, metrics: Optional[Dict[str, Any]] = None, capacity: int = DEFAULT_EVENT_CAPACITY,
+                 **detector_options):
+        """
+        初始化偵測器
+
+        Args:
+            metrics: {指標: (顯示名稱, 相對最小標準差, 絕對最小標準差)}
+            capacity: 保留的最近事件數
+            **detector_options: 傳給 MetricDetector 的參數（alpha、warmup、z_threshold、cusum_k、cusum_h）
+        """
+        self.detectors = {
+            name: MetricDetector(name, label, min_rel_std, min_abs_std, **detector_options)
+            for name, (label, min_rel_std, min_abs_std) in (metrics or DEFAULT_METRICS).items()
+        }
+        self.events: deque = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._last_epoch_ticks: Optional[tuple] = None
+        self._last_stats_version: Optional[tuple] = None
+
+    def observe(self, timestamp: float, values: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        加入一組指標樣本
+
+        Args:
+            timestamp: 樣本時間（Unix 秒）
+            values: {指標: 值}（未設定偵測器的指標會被忽略）
+
+        Returns:
+            本次偵測到的事件
+        """
+        emitted = []
+        with self._lock:
+            for name, value in values.items():
+                detector = self.detectors.get(name)
+                if detector is None or value is None:
+                    continue
+                event = detector.update(float(value))
+                if event is not None:
+                    event["id"] = next(self._ids)
+                    event["timestamp"] = timestamp
+                    self.events.append(event)
+                    emitted.append(event)
+        return emitted
+
+    def observe_stats(self, timestamp: float, stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        由網路統計計算兩次輪詢之間新增 tick 的空 tick 比例與 tick 品質並偵測
+
+        上游統計未更新（ticksInCurrentEpoch 與統計時間戳都沒變）時不加入樣本，
+        重複的相同值不會壓低基準變異數，使之後的微小變動被誤判為尖峰
+
+        Args:
+            timestamp: 統計抓取時間（Unix 秒）
+            stats: 含 ticksInCurrentEpoch、emptyTicksInCurrentEpoch、epochTickQuality 的統計
+
+        Returns:
+            本次偵測到的事件
+        """
+        values: Dict[str, Any] = {}
+        try:
+            ticks = int(stats.get("ticksInCurrentEpoch", 0))
+            empty = int(stats.get("emptyTicksInCurrentEpoch", 0))
+        except (TypeError, ValueError):
+            ticks = empty = 0
+        version = (ticks, stats.get("timestamp"))
+        if version == self._last_stats_version:
+            return []
+        self._last_stats_version = version
+        previous = self._last_epoch_ticks
+        if ticks > 0:
+            self._last_epoch_ticks = (ticks, empty)
+            # epoch 切換時計數歸零，只比較同一 epoch 內的增量
+            if previous is not None and ticks > previous[0] and empty >= previous[1]:
+                values["empty_tick_ratio"] = (empty - previous[1]) / (ticks - previous[0])
+        quality = stats.get("epochTickQuality")
+        if quality not in (None, ""):
+            values["tick_quality"] = float(quality)
+        return self.observe(timestamp, values) if values else []
+
+    def recent(self, limit: int = 20, since_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        最近的異常事件（由舊到新）
+
+        Args:
+            limit: 最多回傳的事件數
+            since_id: 只回傳 id 大於此值的事件
+
+        Returns:
+            事件列表
+        """
+        with self._lock:
+            events = [e for e in self.events if since_id is None or e["id"] > since_id]
+        return events[-limit:] if limit > 0 else []
+
+    def baselines(self) -> Dict[str, Dict[str, Any]]:
+        """各指標目前的基準值與 CUSUM 狀態"""
+        with self._lock:
+            return {
+                name: {
+                    "samples": d.count,
+                    "baseline": round(d.mean, 4),
+                    "std": round(math.sqrt(d.var), 4),
+                    "cusum_pos": round(d.cusum_pos, 2),
+                    "cusum_neg": round(d.cusum_neg, 2)
+                }
+                for name, d in self.detectors.items()
+            }
+
+
+def format_anomalies(anomalies: List[Dict[str, Any]], language: str = "zh-tw") -> str:
+    """
+    將異常事件整理成分析提示用的文字
+
+    Args:
+        anomalies: 事件列表
+        language: 語言
+
+    Returns:
+        每行一個事件的文字（無事件時為空字串）
+    """
+    lines = []
+    for event in anomalies:
+        if language == "en":
+            lines.append(f"- [{event['severity']}] {event['metric']} {event['kind'].replace('_', ' ')}: "
+                         f"{event['value']} (baseline {event['baseline']}, z={event['zscore']})")
+        else:
+            lines.append(f"- [{event['severity']}] {event['message']}")
+    return "\n".join(lines)
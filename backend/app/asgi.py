@@ -0,0 +1,487 @@
+"""
+ASGI 服務模式
+以單一 asyncio 事件迴圈處理所有連線，不為每個連線佔用執行緒，既有的 Flask 路由與回應格式不變：
+- 只讀取背景輪詢快照的資料端點（tick、統計、狀態、異常、預測）由原生 async 處理，不經過 Flask：
+  ETag 比對、304 與已序列化內容的回傳在事件迴圈中完成，序列化與壓縮在執行緒池中進行；
+  上游 I/O 只在輪詢器中進行，上游緩慢時請求不會等待，回應內容、ETag 與壓縮和 WSGI 模式相同
+- /api/stream 的 SSE 連線以 asyncio 等待事件，閒置連線只佔用記憶體，連線上限可提高到數千
+- AI 路由（CPU 密集的推理）在獨立的有限執行緒池中執行，其他 Flask 路由在一般執行緒池中執行，
+  慢速的生成不會佔滿資料端點與其他路由的資源
+- QDASHBOARD_WS_ENABLED=1 時，WebSocket 多工閘道與 HTTP 共用同一個埠（/api/ws），
+  AI 工作與 AI 路由共用同一個推理執行緒池
+
+需要 ASGI 伺服器（例如 uvicorn）:
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+    gunicorn -k uvicorn.workers.UvicornWorker --workers 1 asgi:app
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header, parse_etags
+
+from .compression import compress, encoding_etag, negotiate_encoding
+from .conditional import match_etag
+from .ws_gateway import WS_PATH, CLOSE_POLICY, WebSocketConnection, create_ws_gateway
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WSGI_THREADS = int(os.environ.get("QDASHBOARD_ASGI_THREADS", "8"))
+DEFAULT_INFERENCE_WORKERS = int(os.environ.get("QDASHBOARD_ASGI_INFERENCE_WORKERS", "2"))
+DEFAULT_STREAM_MAX_CLIENTS = int(os.environ.get("QDASHBOARD_ASGI_STREAM_MAX_CLIENTS", "5000"))
+MAX_BODY_BYTES = 1024 * 1024
+# 只讀取快照、不進行 I/O 的路由（背景輪詢執行中時以原生 async 處理）
+# 有版本的端點：{路徑: 回應快取名稱}
+VERSIONED_PATHS = {"/api/tick": "tick", "/api/stats": "stats"}
+PAYLOAD_PATHS = frozenset({"/api/status", "/api/anomalies", "/api/forecast"})
+STREAM_PATH = "/api/stream"
+INFERENCE_PREFIX = "/api/ai/"
+_DONE = object()
+
+
+def build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """
+    由 ASGI HTTP scope 建立 WSGI environ
+
+    Args:
+        scope: ASGI scope
+        body: 完整的請求內容
+
+    Returns:
+        WSGI environ
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    # WSGI 的路徑為以 latin-1 表示的原始位元組
+    raw_path = scope.get("raw_path") or scope["path"].encode("utf-8")
+    root_path = scope.get("root_path", "").encode("utf-8")
+    if root_path and raw_path.startswith(root_path):
+        raw_path = raw_path[len(root_path):]
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.decode("latin-1"),
+        "PATH_INFO": raw_path.split(b"?", 1)[0].decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] if server[1] is not None else 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if key == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{key}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _last_event_id(scope: Dict[str, Any]) -> Optional[int]:
+    """由 Last-Event-ID 標頭或 lastEventId 參數取得續傳位置"""
+    value = _header(scope, b"last-event-id")
+    if not value:
+        value = (parse_qs(scope.get("query_string", b"").decode("latin-1")).get("lastEventId") or [""])[0]
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+class AsgiBridge:
+    """以 asyncio 處理連線的 Flask 應用程式包裝（ASGI 應用程式）"""
+
+    def __init__(self, flask_app, provider, wsgi_threads: int = DEFAULT_WSGI_THREADS,
+                 inference_workers: int = DEFAULT_INFERENCE_WORKERS,
+                 stream_max_clients: int = DEFAULT_STREAM_MAX_CLIENTS,
+                 ws_jobs: Optional[Dict[str, Callable]] = None):
+        """
+        初始化 ASGI 包裝
+
+        Args:
+            flask_app: Flask 應用程式（路由與回應格式不變）
+            provider: 資料提供者（判斷是否背景輪詢，並提供 SSE 廣播器）
+            wsgi_threads: 執行一般 Flask 路由的執行緒數
+            inference_workers: 執行 AI 路由與 WebSocket AI 工作的執行緒數
+            stream_max_clients: SSE 連線上限（不再受執行緒數限制）
+            ws_jobs: WebSocket 閘道的 {工作種類: 處理函式}（閘道啟用時註冊）
+        """
+        self.flask_app = flask_app
+        self.provider = provider
+        self._wsgi = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix="asgi-wsgi")
+        self._inference = ThreadPoolExecutor(max_workers=inference_workers, thread_name_prefix="asgi-inference")
+        self.provider.events.max_subscribers = max(self.provider.events.max_subscribers, stream_max_clients)
+        self.counts = {"native": 0, "threaded": 0, "inference": 0, "streams": 0}
+        self.active = {"requests": 0, "streams": 0}
+        self.wsgi_threads = wsgi_threads
+        self.inference_workers = inference_workers
+        self.gateway = create_ws_gateway(provider.events, jobs=ws_jobs, executor=self._inference)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            self.active["requests"] += 1
+            try:
+                await self._http(scope, receive, send)
+            finally:
+                self.active["requests"] -= 1
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if self.gateway is not None:
+                    self.gateway.attach(asyncio.get_running_loop())
+                logger.info(f"⚡ ASGI 模式已啟動（一般路由 {self.wsgi_threads} 執行緒，"
+                            f"AI 路由 {self.inference_workers} 執行緒，"
+                            f"SSE 上限 {self.provider.events.max_subscribers} 連線）")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _websocket(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        """/api/ws：WebSocket 多工閘道（未啟用或其他路徑時拒絕握手）"""
+        if self.gateway is None or scope["path"] != WS_PATH:
+            await receive()
+            await send({"type": "websocket.close", "code": CLOSE_POLICY})
+            return
+        await self.gateway.handle(WebSocketConnection(receive, send))
+
+    async def _http(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        path = scope["path"]
+        if path == STREAM_PATH and scope["method"] == "GET":
+            await self._stream(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            await self._send_json(send, 413, {"error": "請求內容過大"})
+            return
+
+        if scope["method"] == "GET" and self.provider.polling:
+            if path in VERSIONED_PATHS and await self._versioned(scope, send, VERSIONED_PATHS[path]):
+                self.counts["native"] += 1
+                return
+            if path in PAYLOAD_PATHS and await self._payload(scope, send, path):
+                self.counts["native"] += 1
+                return
+
+        if path.startswith(INFERENCE_PREFIX):
+            executor = self._inference
+            self.counts["inference"] += 1
+        else:
+            executor = self._wsgi
+            self.counts["threaded"] += 1
+        await self._call_wsgi(scope, body, receive, send, executor)
+
+    async def _versioned(self, scope: Dict[str, Any], send: Callable, name: str) -> bool:
+        """
+        /api/tick、/api/stats：版本與內容由同一份快照取得，304 與快取命中在事件迴圈中回覆
+
+        Returns:
+            是否已送出回應（無法判斷版本或發生錯誤時為 False，改由 Flask 路由處理）
+        """
+        loop = asyncio.get_running_loop()
+        version = self.provider.tick_version if name == "tick" else self.provider.stats_version
+        try:
+            etag, build = version()
+        except Exception as e:
+            logger.error(f"❌ ASGI 取得 {name} 版本失敗: {e}")
+            return False
+        if etag is None:
+            return False
+
+        max_age = self.provider.poll_interval(name)
+        matched = match_etag(parse_etags(_header(scope, b"if-none-match")), etag)
+        if matched is not None:
+            headers = [(b"etag", f'"{matched}"'.encode("latin-1")), (b"vary", b"Accept-Encoding")]
+            if max_age is not None:
+                headers.append((b"cache-control", f"max-age={int(max_age)}".encode("latin-1")))
+            await self._send_bytes(send, scope, 304, headers, b"")
+            return True
+
+        # 快取命中且所需的變體已序列化時不離開事件迴圈
+        responses = self.provider.responses
+        try:
+            entry = responses.peek(name, etag)
+            if entry is None:
+                entry = await loop.run_in_executor(self._wsgi, self._in_app, responses.get, name, etag, build)
+            raw = entry.cached()
+            if raw is None:
+                raw = await loop.run_in_executor(self._wsgi, self._in_app, entry.body)
+            encoding = negotiate_encoding(len(raw), parse_accept_header(_header(scope, b"accept-encoding")))
+            body = entry.cached(encoding=encoding) if encoding else raw
+            if body is None:
+                body = await loop.run_in_executor(self._wsgi, self._in_app, entry.body, False, encoding)
+        except Exception as e:
+            logger.error(f"❌ ASGI 建立 {name} 回應失敗: {e}")
+            return False
+
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"age", str(max(0, int(time.time() - entry.created_at))).encode("latin-1")),
+            (b"etag", f'"{encoding_etag(etag, encoding)}"'.encode("latin-1")),
+            (b"vary", b"Accept-Encoding")
+        ]
+        if max_age is not None:
+            headers.append((b"cache-control", f"max-age={int(max_age)}".encode("latin-1")))
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        await self._send_bytes(send, scope, 200, headers, body)
+        return True
+
+    async def _payload(self, scope: Dict[str, Any], send: Callable, path: str) -> bool:
+        """
+        /api/status、/api/anomalies、/api/forecast：讀取快照組成內容，只有壓縮在執行緒池中進行
+
+        Returns:
+            是否已送出回應（參數錯誤或發生錯誤時為 False，改由 Flask 路由回覆相同的錯誤內容）
+        """
+        # 延遲匯入：routes 匯入時會建立資料提供者與其他全域元件
+        from . import routes
+        try:
+            if path == "/api/anomalies":
+                query = scope.get("query_string", b"").decode("latin-1")
+                payload = routes.anomalies_payload(MultiDict(parse_qsl(query, keep_blank_values=True)))
+            elif path == "/api/forecast":
+                payload = routes.forecast_payload()
+            else:
+                payload = routes.status_payload()
+            body = (self.flask_app.json.dumps(payload) + "\n").encode("utf-8")
+        except Exception:
+            return False
+
+        headers = [(b"content-type", b"application/json"), (b"vary", b"Accept-Encoding")]
+        encoding = negotiate_encoding(len(body), parse_accept_header(_header(scope, b"accept-encoding")))
+        if encoding:
+            body = await asyncio.get_running_loop().run_in_executor(self._wsgi, compress, body, encoding)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        await self._send_bytes(send, scope, 200, headers, body)
+        return True
+
+    def _in_app(self, func: Callable, *args) -> Any:
+        """在 Flask 應用程式情境中執行（序列化使用應用程式的 JSON 設定）"""
+        with self.flask_app.app_context():
+            return func(*args)
+
+    @staticmethod
+    async def _send_bytes(send: Callable, scope: Dict[str, Any], status: int,
+                          headers: List[Tuple[bytes, bytes]], body: bytes):
+        """送出完整回應（CORS 標頭與 Flask-CORS 相同）"""
+        origin = _header(scope, b"origin")
+        headers = headers + [
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"access-control-allow-origin", (origin or "*").encode("latin-1"))
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    async def _read_body(self, receive: Callable) -> Optional[bytes]:
+        """讀取完整的請求內容（超過上限時為 None）"""
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    def _start_wsgi(self, environ: Dict[str, Any]) -> Tuple[Dict[str, Any], List[bytes], Any]:
+        """執行 Flask 應用程式，回傳 (狀態與標頭, write() 寫入的內容, 回應內容迭代器)"""
+        started: Dict[str, Any] = {}
+        written: List[bytes] = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started["status"] = status
+            started["headers"] = headers
+            return written.append
+
+        result = self.flask_app(environ, start_response)
+        return started, written, result
+
+    async def _call_wsgi(self, scope: Dict[str, Any], body: bytes, receive: Callable, send: Callable,
+                         executor: ThreadPoolExecutor):
+        """
+        在執行緒池中執行 Flask 路由並送出回應
+
+        Args:
+            executor: 執行的執行緒池
+        """
+        loop = asyncio.get_running_loop()
+
+        def run(func, *args):
+            return loop.run_in_executor(executor, func, *args)
+
+        environ = build_environ(scope, body)
+        try:
+            started, written, result = await run(self._start_wsgi, environ)
+        except Exception as e:
+            logger.error(f"❌ ASGI 執行 {scope['path']} 失敗: {e}")
+            await self._send_json(send, 500, {"error": "伺服器內部錯誤"})
+            return
+
+        closed = asyncio.Event()
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, closed))
+        iterator = iter(result)
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": int(started["status"].split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                            for name, value in started["headers"]]
+            })
+            for chunk in written:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            # 串流回應逐段取出（在執行緒池中等待下一段），客戶端斷線時停止
+            while not closed.is_set():
+                chunk = await run(next, iterator, _DONE)
+                if chunk is _DONE:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            watcher.cancel()
+            close = getattr(result, "close", None)
+            if close is not None:
+                await run(close)
+
+    @staticmethod
+    async def _watch_disconnect(receive: Callable, closed: asyncio.Event, wake: Optional[asyncio.Event] = None):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                closed.set()
+                if wake is not None:
+                    wake.set()
+                return
+
+    async def _stream(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        """/api/stream：在事件迴圈中等待廣播事件的 SSE 串流"""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        broker = self.provider.events
+        subscriber = broker.subscribe(_last_event_id(scope), notify=lambda: loop.call_soon_threadsafe(wake.set))
+        if subscriber is None:
+            await self._send_json(send, 503, {"error": "串流連線已達上限，請改用輪詢"})
+            return
+
+        headers = [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no")
+        ]
+        if _header(scope, b"origin"):
+            headers.append((b"access-control-allow-origin", b"*"))
+        closed = asyncio.Event()
+        watcher = asyncio.ensure_future(self._watch_disconnect(receive, closed, wake))
+        self.counts["streams"] += 1
+        self.active["streams"] += 1
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            async for text in broker.astream(subscriber, wake, closed):
+                await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": True})
+            if not closed.is_set():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            self.active["streams"] -= 1
+            watcher.cancel()
+            broker.unsubscribe(subscriber)
+
+    @staticmethod
+    async def _send_json(send: Callable, status: int, data: Dict[str, Any]):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode("latin-1"))]})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    def metrics(self) -> Dict[str, Any]:
+        """各執行方式的請求數、目前的連線數與執行緒池大小"""
+        return {
+            "enabled": True,
+            **self.counts,
+            "active_requests": self.active["requests"],
+            "active_streams": self.active["streams"],
+            "wsgi_threads": self.wsgi_threads,
+            "inference_workers": self.inference_workers
+        }
+
+    def close(self):
+        """關閉執行緒池"""
+        if self.gateway is not None:
+            self.gateway.close()
+        self._wsgi.shutdown(wait=False)
+        self._inference.shutdown(wait=False)
+
+
+# 全域 ASGI 包裝（/api/status 顯示統計）
+_bridge: Optional[AsgiBridge] = None
+_bridge_lock = threading.Lock()
+
+def get_asgi_bridge() -> Optional[AsgiBridge]:
+    """獲取 ASGI 包裝（未以 ASGI 模式執行時為 None）"""
+    return _bridge
+
+def create_asgi_app(flask_app, provider, **kwargs) -> AsgiBridge:
+    """
+    建立全域 ASGI 應用程式
+
+    Args:
+        flask_app: Flask 應用程式
+        provider: 資料提供者（應已啟動背景輪詢，否則資料端點改由執行緒池中的 Flask 路由處理）
+        **kwargs: AsgiBridge 的其他參數
+
+    Returns:
+        ASGI 應用程式
+    """
+    global _bridge
+    with _bridge_lock:
+        if _bridge is None:
+            if not provider.polling:
+                logger.warning("⚠️ 資料提供者未啟動背景輪詢，資料端點將由執行緒池中的 Flask 路由處理")
+            _bridge = AsgiBridge(flask_app, provider, **kwargs)
+    return _bridge
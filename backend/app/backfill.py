@@ -0,0 +1,332 @@
+"""
+tick 歷史回補
+冷啟動時儲存檔沒有目前 epoch 的歷史，圖表、串流統計與 epoch 預測要輪詢數小時後才有資料。
+回補工作在背景以固定間隔抽樣目前 epoch 的 tick，逐一查詢 tick-data 取得網路時間戳，分批並行抓取：
+- 同時進行的請求數有上限，並以可調整的速率限制配合上游限流（失敗時減半、成功時逐步恢復），
+  端點池對沖或容錯多送出的請求也計入速率限制；上游斷路器斷開時暫停
+- 每批完成後將抽樣結果與規劃（結束 tick、抽樣間隔）寫入檢查點檔，服務重新啟動時沿用同一規劃從中斷處繼續
+- 完成後由相鄰抽樣的時間差計算平均 tick 持續時間，一次合併到歷史儲存檔與記憶體歷史
+  （合併在各自的鎖內完成，不會遺失並行寫入的新 tick），再通知資料提供者重新預熱串流統計與 epoch 預測
+
+QubiPy 0.4 沒有批次查詢 tick 資料的範圍 API，因此以抽樣的單一 tick 查詢代替逐 tick 回補；
+預設每個 epoch 抽樣 4096 個 tick，每秒 20 個請求約 3–4 分鐘完成
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .history_store import HistoryStore
+from .tick_history import TickHistory
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_ENABLED = os.environ.get("QDASHBOARD_BACKFILL", "1") != "0"
+DEFAULT_SAMPLES = int(os.environ.get("QDASHBOARD_BACKFILL_SAMPLES", "4096"))
+DEFAULT_CONCURRENCY = int(os.environ.get("QDASHBOARD_BACKFILL_CONCURRENCY", "8"))
+DEFAULT_RATE = float(os.environ.get("QDASHBOARD_BACKFILL_RATE", "20"))
+DEFAULT_BATCH_SIZE = 64
+MIN_RATE = 1.0
+MAX_ATTEMPTS = 3
+CHECKPOINT_NAME = "backfill.json"
+# 等待第一份 tick 資訊的最長秒數
+TICK_INFO_WAIT_S = 60
+
+
+class RateLimiter:
+    """平均分配請求時間的速率限制（失敗時減半、成功時逐步恢復）"""
+
+    def __init__(self, rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """等待到可以發出下一個請求"""
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + 1.0 / self.rate
+        if at > now:
+            time.sleep(at - now)
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1)
+
+
+def _timestamp_ms(tick_data: Mapping[str, Any]) -> Optional[int]:
+    """tick 資料的網路時間戳（毫秒，空 tick 為 None）"""
+    value = (tick_data or {}).get("timestamp")
+    if value in (None, "", 0, "0"):
+        return None
+    timestamp = int(float(value))
+    # 以秒表示的時間戳換算為毫秒
+    return timestamp * 1000 if timestamp < 10 ** 12 else timestamp
+
+
+def build_rows(epoch: int, samples: Dict[int, Optional[int]]) -> Dict[str, np.ndarray]:
+    """
+    由抽樣結果建立歷史欄位
+
+    Args:
+        epoch: epoch 編號
+        samples: {tick: 網路時間戳毫秒（空 tick 為 None）}
+
+    Returns:
+        {欄位: 依 tick 排序的陣列}；duration_ms 為與前一個抽樣之間的平均 tick 持續時間，
+        tick_quality 為截至該 tick 的抽樣中非空 tick 的比例（%），沒有歷史值的欄位記為 0
+    """
+    ticks = sorted(samples)
+    rows: List[Tuple[int, int, float]] = []
+    non_empty = 0
+    for i, tick in enumerate(ticks, 1):
+        timestamp = samples[tick]
+        if timestamp is None:
+            continue
+        non_empty += 1
+        rows.append((tick, timestamp, non_empty / i * 100))
+
+    tick_column = np.array([row[0] for row in rows], dtype=np.int64)
+    ts_column = np.array([row[1] for row in rows], dtype=np.int64)
+    durations = np.zeros(len(rows), dtype=np.float32)
+    if len(rows) > 1:
+        durations[1:] = np.maximum(0, np.diff(ts_column)) / np.maximum(1, np.diff(tick_column))
+        durations[0] = durations[1]
+    return {
+        "timestamp_ms": ts_column,
+        "tick": tick_column,
+        "duration_ms": durations,
+        "epoch": np.full(len(rows), epoch, dtype=np.int32),
+        "tick_quality": np.array([row[2] for row in rows], dtype=np.float32)
+    }
+
+
+class BackfillWorker:
+    """目前 epoch 的 tick 歷史回補工作（背景執行緒）"""
+
+    def __init__(self, backend, store: HistoryStore, history: TickHistory,
+                 samples: int = DEFAULT_SAMPLES, concurrency: int = DEFAULT_CONCURRENCY,
+                 rate: float = DEFAULT_RATE, batch_size: int = DEFAULT_BATCH_SIZE,
+                 checkpoint_path: Optional[Path] = None, paused: Optional[Callable[[], bool]] = None,
+                 on_merged: Optional[Callable[[], None]] = None):
+        """
+        初始化回補工作
+
+        Args:
+            backend: 資料後端（需實作 fetch_tick_data）
+            store: 歷史儲存檔（回補結果合併的目標）
+            history: 記憶體歷史（回補結果也合併到此）
+            samples: 每個 epoch 最多抽樣的 tick 數
+            concurrency: 同時進行的請求數上限
+            rate: 每秒請求數上限
+            batch_size: 每批抓取的 tick 數（每批完成後寫入檢查點）
+            checkpoint_path: 檢查點檔（預設位於儲存檔目錄）
+            paused: 回傳是否應暫停的函式（例如上游斷路器斷開）
+            on_merged: 合併完成後呼叫（例如以新歷史重新預熱統計）
+        """
+        self.backend = backend
+        self.store = store
+        self.history = history
+        self.samples = samples
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.limiter = RateLimiter(rate)
+        self.checkpoint_path = Path(checkpoint_path or store.store_dir / CHECKPOINT_NAME)
+        self.paused = paused
+        self.on_merged = on_merged
+        self.state = "idle"
+        self.epoch: Optional[int] = None
+        self.stride = 0
+        self.end_tick: Optional[int] = None
+        self.planned = 0
+        self.fetched: Dict[int, Optional[int]] = {}
+        self.failed = 0
+        self.merged = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, tick_info_fn: Callable[[], Mapping[str, Any]]) -> "BackfillWorker":
+        """
+        在背景執行緒開始回補
+
+        Args:
+            tick_info_fn: 取得目前 tick 資訊（tick、epoch、initialTick）的函式
+        """
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(tick_info_fn,),
+                                            name="qubic-history-backfill", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """停止回補（已抓取的抽樣保留在檢查點檔）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, tick_info_fn: Callable[[], Mapping[str, Any]]):
+        deadline = time.monotonic() + TICK_INFO_WAIT_S
+        tick_info = tick_info_fn()
+        while not (tick_info.get("tick") and tick_info.get("initialTick")):
+            if time.monotonic() > deadline or self._stop.wait(1.0):
+                self.state = "no_tick_info"
+                return
+            tick_info = tick_info_fn()
+        try:
+            self.run(int(tick_info["epoch"]), int(tick_info["initialTick"]), int(tick_info["tick"]))
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+            logger.error(f"❌ tick 歷史回補失敗: {e}")
+
+    def run(self, epoch: int, initial_tick: int, end_tick: int) -> int:
+        """
+        回補 epoch 從 initial_tick 到 end_tick 的抽樣歷史（在呼叫的執行緒中執行）
+
+        Args:
+            epoch: epoch 編號
+            initial_tick: epoch 第一個 tick
+            end_tick: 回補到的 tick（通常為目前 tick）
+
+        Returns:
+            合併到儲存檔的紀錄數
+        """
+        self.epoch = epoch
+        self.started_at = time.time()
+
+        # 同一 epoch 的檢查點沿用當時規劃的結束 tick 與抽樣間隔（目前 tick 持續前進，重新計算會得到不同的抽樣）
+        checkpoint = self._load_checkpoint(epoch, initial_tick)
+        if checkpoint.get("completed"):
+            self.state = "covered"
+            return 0
+        if checkpoint:
+            self.stride = int(checkpoint["stride"])
+            end_tick = int(checkpoint["end_tick"])
+        else:
+            self.stride = max(1, math.ceil((end_tick - initial_tick + 1) / self.samples))
+            # 儲存檔已有此 epoch 的紀錄時，只回補最早紀錄之前的部分
+            existing = self.store.query(epoch=epoch, fields=["tick"])["tick"]
+            if len(existing):
+                if int(existing.min()) - initial_tick <= self.stride:
+                    self.state = "covered"
+                    return 0
+                end_tick = int(existing.min()) - 1
+        self.end_tick = end_tick
+
+        ticks = list(range(initial_tick, end_tick + 1, self.stride))
+        if ticks[-1] != end_tick:
+            ticks.append(end_tick)
+        self.planned = len(ticks)
+        planned = set(ticks)
+        self.fetched = {tick: value for tick, value in checkpoint.get("samples", {}).items() if tick in planned}
+
+        self.state = "running"
+        logger.info(f"⏪ 開始回補 epoch {epoch} 的 tick 歷史：{len(ticks):,} 個抽樣（每 {self.stride} tick），"
+                    f"檢查點已有 {len(self.fetched):,} 個")
+        attempts: Dict[int, int] = {}
+        pending = [tick for tick in ticks if tick not in self.fetched]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="qubic-backfill") as executor:
+            while pending and not self._stop.is_set():
+                batch, pending = pending[:self.batch_size], pending[self.batch_size:]
+                for tick, timestamp, error in executor.map(self._fetch, batch):
+                    if error is None:
+                        self.fetched[tick] = timestamp
+                        self.limiter.speed_up()
+                        continue
+                    self.limiter.slow_down()
+                    attempts[tick] = attempts.get(tick, 0) + 1
+                    if attempts[tick] < MAX_ATTEMPTS:
+                        pending.append(tick)
+                    else:
+                        self.failed += 1
+                        logger.warning(f"⚠️ 回補 tick {tick} 失敗: {error}")
+                self._save_checkpoint(epoch, initial_tick, completed=False)
+
+        if self._stop.is_set():
+            self.state = "stopped"
+            return 0
+        rows = build_rows(epoch, self.fetched)
+        self.merged = self.store.merge(rows)
+        self.history.merge(rows)
+        self._save_checkpoint(epoch, initial_tick, completed=True)
+        if self.on_merged is not None and self.merged:
+            self.on_merged()
+        self.finished_at = time.time()
+        self.state = "done"
+        logger.info(f"✅ tick 歷史回補完成：{self.merged:,} 筆，"
+                    f"耗時 {self.finished_at - self.started_at:.0f} 秒（失敗 {self.failed} 個）")
+        return self.merged
+
+    def _fetch(self, tick: int) -> Tuple[int, Optional[int], Optional[str]]:
+        while self.paused is not None and self.paused() and not self._stop.is_set():
+            self._stop.wait(1.0)
+        self.limiter.acquire()
+        try:
+            return tick, _timestamp_ms(self.backend.fetch_tick_data(tick, on_launch=self.limiter.acquire)), None
+        except Exception as e:
+            return tick, None, str(e)
+
+    def _load_checkpoint(self, epoch: int, initial_tick: int) -> Dict[str, Any]:
+        """讀取同一 epoch 與起始 tick 的檢查點（沒有、不相符或缺少規劃時為空）"""
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if (checkpoint.get("epoch"), checkpoint.get("initial_tick")) != (epoch, initial_tick):
+            return {}
+        if not checkpoint.get("completed") and not (checkpoint.get("stride") and checkpoint.get("end_tick")):
+            return {}
+        checkpoint["samples"] = {int(tick): value for tick, value in checkpoint.get("samples", {}).items()}
+        return checkpoint
+
+    def _save_checkpoint(self, epoch: int, initial_tick: int, completed: bool):
+        tmp = self.checkpoint_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({
+            "epoch": epoch,
+            "initial_tick": initial_tick,
+            "stride": self.stride,
+            "end_tick": self.end_tick,
+            "completed": completed,
+            "samples": {str(tick): value for tick, value in self.fetched.items()}
+        }), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def metrics(self) -> Dict[str, Any]:
+        """回補進度、速率與結果"""
+        end = self.finished_at or time.time()
+        return {
+            "state": self.state,
+            "epoch": self.epoch,
+            "stride": self.stride,
+            "end_tick": self.end_tick,
+            "planned": self.planned,
+            "fetched": len(self.fetched),
+            "empty": sum(1 for value in list(self.fetched.values()) if value is None),
+            "failed": self.failed,
+            "merged": self.merged,
+            "rate": round(self.limiter.rate, 1),
+            "elapsed_s": round(end - self.started_at, 1) if self.started_at else None,
+            "error": self.error
+        }
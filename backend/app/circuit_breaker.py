@@ -0,0 +1,194 @@
+"""
+上游呼叫的斷路器
+依滑動時間窗內的失敗率判斷上游是否故障：
+- closed（正常）：呼叫照常發出並記錄結果，窗內呼叫數達門檻且失敗率超過上限時轉為 open
+- open（斷開）：不發出呼叫，直接拋出 CircuitOpenError（呼叫端改用最後一份成功的資料）
+- half_open（試探）：冷卻時間過後只放行少量試探呼叫，成功則回到 closed，失敗則重新 open
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 預設設定（可由環境變數覆寫）
+DEFAULT_WINDOW_S = float(os.environ.get("QDASHBOARD_BREAKER_WINDOW_S", "60"))
+DEFAULT_MIN_CALLS = int(os.environ.get("QDASHBOARD_BREAKER_MIN_CALLS", "5"))
+DEFAULT_FAILURE_RATE = float(os.environ.get("QDASHBOARD_BREAKER_FAILURE_RATE", "0.5"))
+DEFAULT_OPEN_S = float(os.environ.get("QDASHBOARD_BREAKER_OPEN_S", "30"))
+DEFAULT_HALF_OPEN_CALLS = 1
+
+
+class CircuitOpenError(RuntimeError):
+    """斷路器斷開時拒絕呼叫"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"斷路器 {name} 已斷開，{retry_in:.0f} 秒後重試")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """以失敗率滑動窗判斷的斷路器（執行緒安全）"""
+
+    def __init__(self, name: str, window_s: float = DEFAULT_WINDOW_S, min_calls: int = DEFAULT_MIN_CALLS,
+                 failure_rate: float = DEFAULT_FAILURE_RATE, open_s: float = DEFAULT_OPEN_S,
+                 half_open_calls: int = DEFAULT_HALF_OPEN_CALLS):
+        """
+        初始化斷路器
+
+        Args:
+            name: 名稱（用於日誌與狀態）
+            window_s: 計算失敗率的滑動時間窗（秒）
+            min_calls: 時間窗內至少要有的呼叫數才會判斷失敗率
+            failure_rate: 觸發斷開的失敗率（0–1）
+            open_s: 斷開後到允許試探呼叫的冷卻時間（秒）
+            half_open_calls: 試探狀態同時放行的呼叫數
+        """
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_s = open_s
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (完成時間, 是否成功)
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        """目前狀態（open 且冷卻時間已過時視為 half_open）"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    @property
+    def is_open(self) -> bool:
+        """是否拒絕呼叫（冷卻中）"""
+        return self.state == OPEN
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_s:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"🔌 斷路器 {self.name} 進入試探狀態")
+        return self._state
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window_s:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.counts["opened"] += 1
+        logger.warning(f"⛔ 斷路器 {self.name} 已斷開 {self.open_s:.0f} 秒（最近錯誤: {self.last_error}）")
+
+    def _acquire(self) -> bool:
+        """是否放行此次呼叫"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.counts["rejected"] += 1
+            return False
+
+    def record(self, success: bool, error: Optional[str] = None):
+        """
+        記錄一次呼叫結果
+
+        Args:
+            success: 是否成功
+            error: 失敗的錯誤訊息
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.counts["calls"] += 1
+            if not success:
+                self.counts["failures"] += 1
+                self.last_error = error
+            if self._state == HALF_OPEN:
+                if success:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"✅ 斷路器 {self.name} 已恢復")
+                else:
+                    self._open(now)
+                return
+            if self._state == OPEN:
+                # 斷開前已發出的呼叫，結果不影響狀態
+                return
+            self._outcomes.append((now, success))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open(now)
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        """
+        經由斷路器執行呼叫
+
+        Args:
+            func: 上游呼叫（失敗時拋出例外）
+
+        Returns:
+            呼叫結果
+
+        Raises:
+            CircuitOpenError: 斷路器斷開時（不發出呼叫）
+        """
+        if not self._acquire():
+            raise CircuitOpenError(self.name, self.retry_in())
+        try:
+            result = func()
+        except Exception as e:
+            self.record(False, str(e))
+            raise
+        self.record(True)
+        return result
+
+    def wrap(self, func: Callable[[], Any]) -> Callable[[], Any]:
+        """回傳經由斷路器執行的函式"""
+        return lambda: self.call(func)
+
+    def retry_in(self) -> float:
+        """距離允許試探呼叫的秒數（未斷開時為 0）"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.open_s - (time.monotonic() - self._opened_at))
+
+    def metrics(self) -> Dict[str, Any]:
+        """狀態、時間窗失敗率與累計次數"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            self._trim(now)
+            window_calls = len(self._outcomes)
+            window_failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "name": self.name,
+                "state": state,
+                "window_calls": window_calls,
+                "window_failure_rate": round(window_failures / window_calls, 3) if window_calls else 0.0,
+                "retry_in_s": round(max(0.0, self.open_s - (now - self._opened_at)), 1) if state == OPEN else 0.0,
+                "last_error": self.last_error,
+                **self.counts
+            }
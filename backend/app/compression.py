@@ -0,0 +1,138 @@
+"""
+回應壓縮
+依 Accept-Encoding 選擇 brotli（有安裝 brotli 套件時）或 gzip；動態 API 的 JSON 回應超過門檻時
+在 after_request 壓縮，預先序列化與預先壓縮的內容則直接回傳已壓縮的位元組
+"""
+
+import gzip
+import logging
+from typing import Optional
+
+from flask import Flask, Response, request
+from werkzeug.datastructures import Accept
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 小於此大小的內容不壓縮（壓縮標頭與 CPU 成本不划算）
+MIN_COMPRESS_BYTES = 1024
+# 動態內容每次都要壓縮，使用較快的等級；靜態檔案只壓縮一次，使用最高等級
+DYNAMIC_LEVELS = {"br": 4, "gzip": 6}
+STATIC_LEVELS = {"br": 11, "gzip": 9}
+# 伺服器偏好順序
+ENCODINGS = ("br", "gzip") if BROTLI_AVAILABLE else ("gzip",)
+COMPRESSIBLE_MIMETYPES = {"application/json"}
+
+
+def negotiate_encoding(size: Optional[int] = None, accepted: Optional[Accept] = None) -> Optional[str]:
+    """
+    依請求的 Accept-Encoding 選擇壓縮方式
+
+    Args:
+        size: 未壓縮內容大小（小於門檻時不壓縮）
+        accepted: 已解析的 Accept-Encoding（省略時讀取目前的 Flask 請求）
+
+    Returns:
+        "br"、"gzip" 或 None（不壓縮）
+    """
+    if size is not None and size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = accepted if accepted is not None else request.accept_encodings
+    for encoding in ENCODINGS:
+        if accepted[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    """
+    壓縮內容
+
+    Args:
+        data: 未壓縮內容
+        encoding: "br" 或 "gzip"
+        static: 是否為只壓縮一次的靜態內容（使用最高壓縮等級）
+
+    Returns:
+        壓縮後的位元組
+    """
+    level = (STATIC_LEVELS if static else DYNAMIC_LEVELS)[encoding]
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def encoding_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    壓縮後內容的強 ETag：不同編碼的位元組不同，版本加上編碼後綴（例如 "tick-123-live-br"）
+
+    Args:
+        etag: 未壓縮內容的 ETag（不含引號）
+        encoding: 壓縮方式（None 表示未壓縮）
+
+    Returns:
+        該編碼的 ETag
+    """
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def base_etag(etag: str) -> str:
+    """去除 encoding_etag() 加上的編碼後綴，取得內容版本"""
+    for encoding in ("br", "gzip"):
+        suffix = f"-{encoding}"
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+    return etag
+
+
+def encoded_response(response: Response, encoding: Optional[str]) -> Response:
+    """
+    標記回應的內容編碼（內容已為壓縮後的位元組）
+
+    Args:
+        response: 回應
+        encoding: 壓縮方式（None 表示未壓縮）
+
+    Returns:
+        同一個回應
+    """
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+        # 不同編碼的內容位元組不同，每個編碼使用各自的強 ETag
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoding_etag(etag, encoding), weak=weak)
+    return response
+
+
+def _compress_response(response: Response) -> Response:
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    encoding = negotiate_encoding(len(data))
+    if encoding is None:
+        response.vary.add("Accept-Encoding")
+        return response
+    response.set_data(compress(data, encoding))
+    return encoded_response(response, encoding)
+
+
+def install_compression(app: Flask):
+    """
+    為應用程式的 JSON 回應啟用壓縮（已壓縮、串流或小於門檻的回應不處理）
+
+    Args:
+        app: Flask 應用程式
+    """
+    app.after_request(_compress_response)
+    if not BROTLI_AVAILABLE:
+        logger.info("ℹ️ 未安裝 brotli，回應壓縮只使用 gzip（pip install brotli）")
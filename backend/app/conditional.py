@@ -0,0 +1,232 @@
+"""
+資料 API 的條件式 GET 與預先序列化的回應
+以快照版本（tick 編號、統計時間戳等）組成強 ETag，If-None-Match 相符時直接回覆 304，
+不重建也不序列化回應內容；Cache-Control max-age 與輪詢間隔一致
+
+版本改變後第一個請求建立內容並序列化成位元組（原始、{"success","data"} 包裝、br/gzip 壓縮各一次），
+同一版本的其他請求直接回傳這些位元組，不再建立字典或呼叫 jsonify
+"""
+
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Response, current_app, jsonify, request
+from werkzeug.datastructures import ETags
+
+from .compression import base_etag, compress, encoded_response, negotiate_encoding
+
+_UNSAFE = re.compile(r"[^0-9A-Za-z._-]+")
+
+
+def etag_for(*parts: Any) -> str:
+    """
+    由版本值組成 ETag（不含引號）
+
+    Args:
+        *parts: 版本值，例如 ("tick", 31470123, "健康")
+
+    Returns:
+        ETag 值；非 ASCII 的部分（例如中文健康狀態）以 UTF-8 十六進位表示
+    """
+    tokens = []
+    for part in parts:
+        text = str(part)
+        if _UNSAFE.search(text):
+            text = text.encode("utf-8").hex()
+        tokens.append(text)
+    return "-".join(tokens)
+
+
+def matching_etag(etag: str) -> Optional[str]:
+    """
+    If-None-Match 中與版本相符的 ETag（客戶端可能送回任一編碼的 ETag，比對時去除編碼後綴）
+
+    Args:
+        etag: 內容版本（不含引號）
+
+    Returns:
+        相符的 ETag（回覆 304 時原樣送回），不相符時為 None
+    """
+    return match_etag(request.if_none_match, etag)
+
+
+def match_etag(tags: ETags, etag: str) -> Optional[str]:
+    """
+    已解析的 If-None-Match 中與版本相符的 ETag（不依賴 Flask 請求，ASGI 原生處理也使用）
+
+    Args:
+        tags: 已解析的 If-None-Match
+        etag: 內容版本（不含引號）
+
+    Returns:
+        相符的 ETag，不相符時為 None
+    """
+    if tags.star_tag:
+        return etag
+    for tag in tags.as_set(include_weak=True):
+        if base_etag(tag) == etag:
+            return tag
+    return None
+
+
+def conditional_json(etag: Optional[str], build: Callable[[], Dict[str, Any]],
+                     max_age: Optional[float] = None) -> Response:
+    """
+    依 ETag 回覆 304 或建立 JSON 回應
+
+    Args:
+        etag: 回應版本（None 表示無法判斷版本，一律建立內容且不加 ETag）
+        build: 建立回應內容的函式（版本相符時不會呼叫）
+        max_age: Cache-Control max-age 秒數（通常為資料來源的輪詢間隔）
+
+    Returns:
+        304 或 200 回應
+    """
+    matched = matching_etag(etag) if etag is not None else None
+    if matched is not None:
+        response = Response(status=304)
+        response.set_etag(matched)
+        response.vary.add("Accept-Encoding")
+    else:
+        response = jsonify(build())
+        if etag is not None:
+            response.set_etag(etag)
+    if max_age is not None:
+        response.cache_control.max_age = int(max_age)
+    return response
+
+
+class SerializedResponse:
+    """單一版本的回應內容，各輸出變體只序列化一次"""
+
+    def __init__(self, etag: str, payload: Dict[str, Any]):
+        """
+        初始化回應內容
+
+        Args:
+            etag: 內容版本
+            payload: 回應內容（建立後不再修改）
+        """
+        self.etag = etag
+        self.payload = payload
+        self.created_at = time.time()
+        self._variants: Dict[Tuple[bool, Optional[str]], bytes] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, wrapped: bool = False, encoding: Optional[str] = None) -> Optional[bytes]:
+        """已序列化的變體（尚未建立時為 None，不會序列化或壓縮）"""
+        return self._variants.get((wrapped, encoding))
+
+    def body(self, wrapped: bool = False, encoding: Optional[str] = None) -> bytes:
+        """
+        取得序列化後的位元組（第一次取得某變體時序列化，之後重用）
+
+        Args:
+            wrapped: 是否包裝成 {"success": true, "data": ...}
+            encoding: 壓縮方式（"br"、"gzip"，None 表示未壓縮）
+
+        Returns:
+            回應內容位元組
+        """
+        key = (wrapped, encoding)
+        body = self._variants.get(key)
+        if body is not None:
+            return body
+        with self._lock:
+            body = self._variants.get(key)
+            if body is None:
+                if encoding:
+                    body = compress(self.body(wrapped), encoding)
+                else:
+                    payload = {"success": True, "data": self.payload} if wrapped else self.payload
+                    body = (current_app.json.dumps(payload) + "\n").encode("utf-8")
+                self._variants[key] = body
+        return body
+
+
+class ResponseCache:
+    """各端點最新版本的預先序列化回應（每個端點只保留一個版本）"""
+
+    def __init__(self):
+        self._entries: Dict[str, SerializedResponse] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def get(self, name: str, etag: str, build: Callable[[], Dict[str, Any]]) -> SerializedResponse:
+        """
+        取得端點目前版本的回應，版本改變時重新建立
+
+        Args:
+            name: 端點名稱
+            etag: 目前版本
+            build: 建立回應內容的函式（同一版本只呼叫一次）
+
+        Returns:
+            回應內容
+        """
+        entry = self._entries.get(name)
+        if entry is not None and entry.etag == etag:
+            self.hits += 1
+            return entry
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.etag != etag:
+                entry = SerializedResponse(etag, build())
+                self._entries[name] = entry
+                self.builds += 1
+        return entry
+
+    def peek(self, name: str, etag: str) -> Optional[SerializedResponse]:
+        """端點目前版本為 etag 時回傳其回應內容（不建立內容）"""
+        entry = self._entries.get(name)
+        if entry is not None and entry.etag == etag:
+            self.hits += 1
+            return entry
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        """命中數、建立數與各端點目前版本"""
+        return {
+            "hits": self.hits,
+            "builds": self.builds,
+            "versions": {name: entry.etag for name, entry in self._entries.items()}
+        }
+
+
+def cached_json(cache: ResponseCache, name: str, etag: Optional[str],
+                build: Callable[[], Dict[str, Any]], max_age: Optional[float] = None,
+                wrapped: bool = False) -> Response:
+    """
+    依 ETag 回覆 304，或回傳該版本預先序列化的 JSON 位元組
+
+    內容在版本建立時凍結，build 必須只包含同一版本內不變的欄位，並與 etag 由同一份快照計算
+    （例如 DataProvider.tick_version()）；Age 標頭表示內容建立至今的秒數
+
+    Args:
+        cache: 回應快取
+        name: 端點名稱
+        etag: 回應版本（None 表示無法判斷版本，每次建立內容且不快取）
+        build: 建立此版本內容的函式
+        max_age: Cache-Control max-age 秒數
+        wrapped: 是否包裝成 {"success": true, "data": ...}
+
+    Returns:
+        304 或 200 回應
+    """
+    if etag is None or matching_etag(etag) is not None:
+        if wrapped:
+            return conditional_json(etag, lambda: {"success": True, "data": build()}, max_age)
+        return conditional_json(etag, build, max_age)
+
+    entry = cache.get(name, etag, build)
+    encoding = negotiate_encoding(len(entry.body(wrapped)))
+
+    response = Response(entry.body(wrapped, encoding), mimetype="application/json")
+    response.headers["Age"] = str(max(0, int(time.time() - entry.created_at)))
+    response.set_etag(etag)
+    if max_age is not None:
+        response.cache_control.max_age = int(max_age)
+    return encoded_response(response, encoding)
@@ -0,0 +1,814 @@
+"""
+統一的 Qubic 資料提供者
+DataBackend 定義取得網路資料的介面，內建 QubiPy、直接 HTTP 與重播/模擬三種後端；
+DataProvider 包裝任何後端，提供共用的輪詢與快取、tick 歷史、串流統計、異常偵測、epoch 預測、
+SSE 廣播與序列化回應快取，所有應用程式入口都透過它取得資料，效能改進只需要做一次
+
+上游呼叫經過斷路器：上游故障時快速失敗而不是每次等待逾時；未啟動背景輪詢時採用
+stale-while-revalidate，已有資料時立即回傳最後一份成功的快照（標記為 stale）並在背景重新抓取
+
+後端由 QDASHBOARD_DATA_BACKEND 選擇：auto（預設，有 QubiPy 時用 QubiPy，否則直接 HTTP）、
+qubipy、http、replay（重播歷史儲存檔的紀錄）、mock（合成數據）；QubiPy 與 HTTP 後端可設定多個 RPC 端點
+（QDASHBOARD_RPC_URLS），依延遲對沖請求並在端點失敗時自動切換；真實後端啟動背景輪詢時，
+儲存檔缺少目前 epoch 的歷史會在背景回補（QDASHBOARD_BACKFILL=0 停用）
+"""
+
+import atexit
+import bisect
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .network_poller import NetworkPoller, NetworkSnapshot, DEFAULT_POLL_INTERVALS
+from .tick_history import TickHistory
+from .history_store import HistoryStore, open_history_store, warm_history
+from .rolling_stats import TickStatsEngine
+from .anomaly_detector import AnomalyDetector
+from .epoch_forecast import EpochForecaster
+from .event_stream import EventBroker
+from .conditional import ResponseCache, etag_for
+from .circuit_breaker import CircuitBreaker
+from .backfill import BACKFILL_ENABLED, BackfillWorker
+from .http_client import get_http_client
+from .rpc_pool import EndpointPool
+
+try:
+    from qubipy.rpc.rpc_client import QubiPy_RPC
+    QUBIPY_AVAILABLE = True
+except ImportError:
+    QubiPy_RPC = None
+    QUBIPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.environ.get("QDASHBOARD_DATA_BACKEND", "auto")
+DEFAULT_TIMEOUT = 10
+# 重播後端預設載入的歷史長度
+DEFAULT_REPLAY_WINDOW_S = 24 * 3600
+# 背景輪詢時，資料超過幾個更新間隔未更新視為過期
+STALE_AFTER_INTERVALS = 2
+
+
+class DataBackend:
+    """資料後端介面：以 Qubic RPC 的格式回傳原始資料，失敗時拋出例外"""
+
+    name = "base"
+    # 是否為真實網路資料（只有真實資料會寫入歷史儲存檔）
+    real = True
+
+    def fetch_tick(self) -> Dict[str, Any]:
+        """tick 資訊：{"tick", "epoch", "duration", "initialTick"}"""
+        raise NotImplementedError
+
+    def fetch_stats(self) -> Dict[str, Any]:
+        """最新統計（/v1/latest-stats 的 data 欄位）"""
+        raise NotImplementedError
+
+    def fetch_status(self) -> Dict[str, Any]:
+        """RPC 狀態（/v1/status）"""
+        raise NotImplementedError
+
+    def fetch_tick_data(self, tick: int, on_launch: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """
+        單一 tick 的資料（/v1/ticks/{tick}/tick-data 的 tickData 欄位，空 tick 為空字典），供歷史回補使用
+
+        Args:
+            tick: tick 編號
+            on_launch: 對沖或容錯多送出請求前呼叫（呼叫端的速率限制）
+        """
+        raise NotImplementedError
+
+    def fetchers(self) -> Dict[str, Callable[[], Any]]:
+        """{資料來源: 抓取函式}，供輪詢器使用"""
+        return {"tick": self.fetch_tick, "stats": self.fetch_stats, "status": self.fetch_status}
+
+    def metrics(self) -> Dict[str, Any]:
+        """上游端點統計（沒有時為空）"""
+        return {}
+
+
+def _rpc_urls(urls: Union[str, Sequence[str], None]) -> Optional[List[str]]:
+    """單一 URL 或 URL 列表（省略時為 None，使用 QDASHBOARD_RPC_URLS）"""
+    if not urls:
+        return None
+    return [urls] if isinstance(urls, str) else list(urls)
+
+
+class QubiPyBackend(DataBackend):
+    """透過 QubiPy RPC 客戶端取得資料（每個 RPC 端點一個客戶端）"""
+
+    name = "qubipy"
+
+    def __init__(self, rpc_url: Union[str, Sequence[str], None] = None, timeout: int = DEFAULT_TIMEOUT):
+        """
+        初始化 QubiPy 後端
+
+        Args:
+            rpc_url: RPC 伺服器 URL 或 URL 列表（省略時讀取 QDASHBOARD_RPC_URLS）
+            timeout: 請求超時時間（秒）
+        """
+        if not QUBIPY_AVAILABLE:
+            raise RuntimeError("未安裝 QubiPy（pip install qubipy）")
+        self.pool = EndpointPool(_rpc_urls(rpc_url), timeout=timeout)
+        self.clients = {url: QubiPy_RPC(rpc_url=url, timeout=timeout) for url in self.pool.urls}
+        # 相容舊介面：第一個端點的客戶端
+        self.rpc = self.clients[self.pool.urls[0]]
+
+    def fetch_tick(self) -> Dict[str, Any]:
+        return self.pool.call(lambda url: self.clients[url].get_tick_info())
+
+    def fetch_stats(self) -> Dict[str, Any]:
+        return self.pool.call(lambda url: self.clients[url].get_latest_stats())
+
+    def fetch_status(self) -> Dict[str, Any]:
+        return self.pool.call(lambda url: self.clients[url].get_rpc_status())
+
+    def fetch_tick_data(self, tick: int, on_launch: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        return self.pool.call(lambda url: self.clients[url].get_tick_data(tick), on_launch) or {}
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.pool.metrics()
+
+
+class HTTPBackend(DataBackend):
+    """直接呼叫 Qubic RPC HTTP API（共用 keep-alive 連線池與回應快取，不需要 QubiPy）"""
+
+    name = "http"
+
+    def __init__(self, base_url: Union[str, Sequence[str], None] = None, timeout: int = DEFAULT_TIMEOUT):
+        """
+        初始化 HTTP 後端
+
+        Args:
+            base_url: RPC API 基礎 URL 或 URL 列表（省略時讀取 QDASHBOARD_RPC_URLS）
+            timeout: 請求超時時間（秒）
+        """
+        self.pool = EndpointPool(_rpc_urls(base_url), timeout=timeout)
+        self.base_url = self.pool.urls[0].rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, endpoint: str, on_launch: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        return self.pool.call(
+            lambda url: get_http_client().get_json(f"{url.rstrip('/')}{endpoint}", timeout=self.timeout),
+            on_launch
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.pool.metrics()
+
+    def fetch_tick(self) -> Dict[str, Any]:
+        return self._get("/tick-info").get("tickInfo", {})
+
+    def fetch_stats(self) -> Dict[str, Any]:
+        return self._get("/latest-stats").get("data", {})
+
+    def fetch_status(self) -> Dict[str, Any]:
+        return self._get("/status")
+
+    def fetch_tick_data(self, tick: int, on_launch: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        return self._get(f"/ticks/{tick}/tick-data", on_launch).get("tickData") or {}
+
+
+class ReplayBackend(DataBackend):
+    """
+    重播後端：依經過時間循環重播記錄的 tick 歷史；沒有紀錄時產生合成數據（mock）
+    用於離線開發、展示與負載測試
+    """
+
+    real = False
+
+    def __init__(self, columns: Optional[Dict[str, Any]] = None, speed: float = 1.0):
+        """
+        初始化重播後端
+
+        Args:
+            columns: 歷史查詢結果 {欄位: 依時間排序的陣列}（省略或為空時使用合成數據）
+            speed: 重播速度倍數
+        """
+        self.speed = speed
+        self.started = time.time()
+        self.rows: List[Dict[str, Any]] = []
+        if columns and len(columns.get("timestamp_ms", [])) > 1:
+            names = list(columns)
+            self.rows = [dict(zip(names, values)) for values in zip(*(columns[n].tolist() for n in names))]
+        self._timestamps = [row["timestamp_ms"] for row in self.rows]
+        self.name = "replay" if self.rows else "mock"
+
+    def _row(self) -> Optional[Dict[str, Any]]:
+        if not self.rows:
+            return None
+        first, last = self._timestamps[0], self._timestamps[-1]
+        offset = ((time.time() - self.started) * self.speed * 1000) % max(1, last - first)
+        index = bisect.bisect_right(self._timestamps, first + offset) - 1
+        return self.rows[max(0, index)]
+
+    def _epoch_initial_tick(self, row: Dict[str, Any]) -> int:
+        for candidate in self.rows:
+            if candidate["epoch"] == row["epoch"]:
+                return int(candidate["tick"])
+        return int(row["tick"])
+
+    def fetch_tick(self) -> Dict[str, Any]:
+        row = self._row()
+        if row is None:
+            now = time.time()
+            return {"tick": 31500000 + int(now % 100000), "epoch": 175, "duration": 1,
+                    "initialTick": 31500000}
+        return {
+            "tick": int(row["tick"]),
+            "epoch": int(row["epoch"]),
+            "duration": int(round(row["duration_ms"] / 1000)),
+            "initialTick": self._epoch_initial_tick(row)
+        }
+
+    def fetch_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        row = self._row()
+        if row is None:
+            return {
+                "currentTick": 31500000 + int(now % 100000),
+                "epoch": 175,
+                "ticksInCurrentEpoch": 35000 + int(now % 5000),
+                "emptyTicksInCurrentEpoch": 4000,
+                "epochTickQuality": 88.5 + (now % 10),
+                "activeAddresses": 590000 + int(now % 10000),
+                "circulatingSupply": "155563915170467",
+                "marketCap": "424689489",
+                "price": 2.73e-06,
+                "burnedQus": "19436084829533",
+                "timestamp": str(int(now))
+            }
+        return {
+            "currentTick": int(row["tick"]),
+            "epoch": int(row["epoch"]),
+            "ticksInCurrentEpoch": int(row["tick"]) - self._epoch_initial_tick(row),
+            "epochTickQuality": float(row["tick_quality"]),
+            "activeAddresses": int(row["active_addresses"]),
+            "price": float(row["price"]),
+            "timestamp": str(int(row["timestamp_ms"] // 1000))
+        }
+
+    def fetch_status(self) -> Dict[str, Any]:
+        return {"lastProcessedTick": self.fetch_tick(), "source": self.name}
+
+
+def create_backend(kind: Optional[str] = None, timeout: int = DEFAULT_TIMEOUT) -> DataBackend:
+    """
+    依名稱建立資料後端
+
+    Args:
+        kind: auto、qubipy、http、replay 或 mock（省略時讀取 QDASHBOARD_DATA_BACKEND）
+        timeout: 請求超時時間（秒）
+
+    Returns:
+        資料後端
+    """
+    kind = (kind or DEFAULT_BACKEND).lower()
+    if kind == "auto":
+        kind = "qubipy" if QUBIPY_AVAILABLE else "http"
+    if kind == "qubipy":
+        return QubiPyBackend(timeout=timeout)
+    if kind == "http":
+        return HTTPBackend(timeout=timeout)
+    if kind == "replay":
+        store = open_history_store(writer=False)
+        columns = None
+        if store is not None:
+            newest = store.query(limit=1)["timestamp_ms"]
+            if len(newest):
+                columns = store.query(start_ms=int(newest[-1]) - DEFAULT_REPLAY_WINDOW_S * 1000)
+            store.close()
+        return ReplayBackend(columns)
+    if kind == "mock":
+        return ReplayBackend()
+    raise ValueError(f"未知的資料後端: {kind}")
+
+
+class DataProvider:
+    """任何後端共用的輪詢/快取、統計與事件層"""
+
+    def __init__(self, backend: Optional[DataBackend] = None, intervals: Optional[Dict[str, float]] = None,
+                 timeout: int = DEFAULT_TIMEOUT):
+        """
+        初始化資料提供者
+
+        Args:
+            backend: 資料後端（省略時依 QDASHBOARD_DATA_BACKEND 建立）
+            intervals: {資料來源: 更新間隔秒數}；未啟動背景輪詢時也是按需抓取的快取存活時間
+            timeout: 請求超時時間（秒）
+        """
+        self.backend = backend or create_backend(timeout=timeout)
+        self.timeout = timeout
+        self.last_tick_info = None
+        # 觀察到的 tick 歷史
+        self.history = TickHistory()
+        self.history_store: Optional[HistoryStore] = None
+        # 冷啟動時回補目前 epoch 的歷史（背景輪詢且有儲存檔時才啟動）
+        self.backfill: Optional[BackfillWorker] = None
+        # tick 持續時間與健康狀態的串流統計
+        self.tick_stats = TickStatsEngine()
+        # tick 持續時間與空 tick 比例的異常偵測
+        self.anomalies = AnomalyDetector()
+        # epoch 結束時間與近期 tick 持續時間預測
+        self.forecaster = EpochForecaster()
+        # /api/stream 的 SSE 廣播（由輪詢執行緒推送變動）
+        self.events = EventBroker()
+        # /api/tick、/api/stats 每個快照版本的序列化回應
+        self.responses = ResponseCache()
+        # 所有上游呼叫共用一個斷路器（斷開時抓取函式立即失敗，快照保留最後一份成功的資料）
+        self.breaker = CircuitBreaker(f"{self.backend.name}-rpc")
+        # 背景輪詢與按需抓取共用同一個輪詢器，快照、新鮮度與延遲統計只有一份
+        self.poller = NetworkPoller({source: self.breaker.wrap(fetch) for source, fetch in self.backend.fetchers().items()},
+                                    intervals or DEFAULT_POLL_INTERVALS, fetch_timeout=timeout)
+        self.poller.subscribe(self._on_snapshot)
+        self._refresh_lock = threading.Lock()
+        # 各資料來源最後一次嘗試抓取的時間（失敗的來源每個更新間隔最多重試一次）
+        self._attempted_at: Dict[str, float] = {}
+        self._revalidating = False
+        self._revalidate_lock = threading.Lock()
+        self.counts = {"stale_reads": 0, "revalidations": 0}
+        self._history_opened = False
+        # 新 tick 的統計與歷史寫入，與回補後的重新預熱互斥
+        self._record_lock = threading.Lock()
+
+    @property
+    def data_source(self) -> str:
+        """資料後端名稱（qubipy、http、replay、mock）"""
+        return self.backend.name
+
+    @property
+    def polling(self) -> bool:
+        """是否正在背景輪詢"""
+        return self.poller.running
+
+    @property
+    def snapshot(self) -> NetworkSnapshot:
+        """最新網路快照"""
+        return self.poller.snapshot
+
+    def poll_interval(self, source: str) -> Optional[float]:
+        """資料來源的更新間隔（作為 Cache-Control max-age）"""
+        return self.poller.intervals.get(source)
+
+    def start_polling(self, intervals: Optional[Dict[str, float]] = None, wait: float = 0.0) -> NetworkPoller:
+        """
+        啟動背景輪詢，之後的查詢只讀取最新快照而不在呼叫端發出請求
+
+        Args:
+            intervals: {資料來源: 更新間隔秒數}
+            wait: 等待第一份快照的最長秒數
+
+        Returns:
+            網路輪詢器
+        """
+        if intervals:
+            self.poller.intervals.update({s: float(v) for s, v in intervals.items() if s in self.poller.fetchers})
+        self._open_history()
+        self.poller.start(wait=wait)
+        self._start_backfill()
+        return self.poller
+
+    def _open_history(self):
+        """載入上次執行保存的歷史，之後每個新 tick 同時寫入儲存檔（只有真實資料）"""
+        if self._history_opened or not self.backend.real:
+            return
+        self._history_opened = True
+        self.history_store = open_history_store()
+        if self.history_store is not None:
+            warm_history(self.history, self.history_store)
+            atexit.register(self.history_store.close)
+            self.tick_stats.warm(self.history.query(start_ms=int((time.time() - self.tick_stats.horizon) * 1000)))
+
+    def _start_backfill(self):
+        """儲存檔缺少目前 epoch 的歷史時，在背景回補（上游斷路器斷開時暫停）"""
+        if not BACKFILL_ENABLED or self.history_store is None or self.backfill is not None:
+            return
+        self.backfill = BackfillWorker(self.backend, self.history_store, self.history,
+                                       paused=lambda: self.breaker.is_open, on_merged=self._rewarm)
+        self.backfill.start(lambda: self.poller.snapshot.tick)
+
+    def _rewarm(self):
+        """回補合併後以完整歷史重建串流統計並重新計算 epoch 預測（在回補執行緒中執行）"""
+        with self._record_lock:
+            tick_stats = TickStatsEngine()
+            samples = tick_stats.warm(self.history.query(start_ms=int((time.time() - tick_stats.horizon) * 1000)))
+            self.tick_stats = tick_stats
+        snapshot = self.poller.snapshot
+        self.forecaster.update(self._forecast_stats(snapshot.tick, snapshot.stats), self.history, self.tick_stats)
+        logger.info(f"📈 已以回補的歷史重新預熱 tick 統計（{samples:,} 個樣本）與 epoch 預測")
+
+    def refresh(self, sources: List[str]) -> NetworkSnapshot:
+        """
+        取得指定資料來源的最新快照：背景輪詢時直接讀取；否則重新抓取超過更新間隔的來源
+        （已有資料時在背景抓取並立即回傳目前的快照，從未成功的來源才在呼叫端等待；
+        斷路器斷開時不抓取）
+
+        Args:
+            sources: 資料來源列表
+
+        Returns:
+            最新快照
+        """
+        snapshot = self.poller.snapshot
+        if not self.poller.running and not self.breaker.is_open:
+            expired = self._due(snapshot, sources)
+            if expired:
+                if all(s in snapshot.fetched_at for s in expired):
+                    self._revalidate(expired)
+                else:
+                    snapshot = self._fetch(expired)
+        stale = [s for s in sources if s in snapshot.fetched_at and self.is_stale(s, snapshot)]
+        if stale:
+            self.counts["stale_reads"] += 1
+        return snapshot
+
+    def _due(self, snapshot: NetworkSnapshot, sources: List[str]) -> List[str]:
+        """超過更新間隔、且本間隔內尚未嘗試抓取的資料來源"""
+        now = time.monotonic()
+        return [s for s in sources if snapshot.is_stale(s, self.poller.intervals[s])
+                and now - self._attempted_at.get(s, float("-inf")) >= self.poller.intervals[s]]
+
+    def _fetch(self, sources: List[str]) -> NetworkSnapshot:
+        """並行抓取資料來源（同時到達的請求只抓取一次）"""
+        with self._refresh_lock:
+            due = self._due(self.poller.snapshot, sources)
+            if due:
+                now = time.monotonic()
+                self._attempted_at.update({s: now for s in due})
+                self.poller.refresh(due)
+        return self.poller.snapshot
+
+    def _revalidate(self, sources: List[str]):
+        """在背景執行緒重新抓取資料來源（同一時間只有一個背景抓取）"""
+        with self._revalidate_lock:
+            if self._revalidating:
+                return
+            self._revalidating = True
+
+        def run():
+            try:
+                self._fetch(sources)
+                self.counts["revalidations"] += 1
+            finally:
+                self._revalidating = False
+
+        threading.Thread(target=run, name="qubic-data-revalidate", daemon=True).start()
+
+    def is_stale(self, source: str, snapshot: Optional[NetworkSnapshot] = None) -> bool:
+        """
+        資料來源目前的資料是否過期（最近一次抓取失敗、斷路器斷開或超過更新間隔未更新）
+
+        Args:
+            source: 資料來源
+            snapshot: 判斷的快照（省略時為最新快照）
+
+        Returns:
+            是否過期
+        """
+        snapshot = snapshot or self.poller.snapshot
+        if snapshot.errors.get(source) or self.breaker.is_open:
+            return True
+        interval = self.poller.intervals.get(source, 0)
+        return snapshot.is_stale(source, interval * (STALE_AFTER_INTERVALS if self.poller.running else 1))
+
+    @property
+    def upstream_connected(self) -> bool:
+        """由最新快照與斷路器判斷的上游連線狀態（不發出請求）"""
+        snapshot = self.poller.snapshot
+        return bool(snapshot.tick) and not snapshot.errors.get("tick") and not self.breaker.is_open
+
+    def _on_snapshot(self, snapshot: NetworkSnapshot, updated: set):
+        """更新串流統計、異常偵測與 epoch 預測，並將新 tick 與當時的統計寫入歷史（在抓取的執行緒中執行）"""
+        if "stats" in updated:
+            self.anomalies.observe_stats(snapshot.fetched_at["stats"], snapshot.stats)
+        if "tick" in updated:
+            self._record_tick(snapshot)
+        if updated & {"tick", "stats"}:
+            self.forecaster.update(self._forecast_stats(snapshot.tick, snapshot.stats), self.history, self.tick_stats)
+        self._push_events(snapshot, updated)
+
+    def _push_events(self, snapshot: NetworkSnapshot, updated: set):
+        """
+        將 tick、健康狀況、統計與異常事件的變動推送給 SSE（與 WebSocket）訂閱者
+
+        每次輪詢都檢查 tick 與統計的資料狀態（stale、error）：上游失敗或斷路器斷開時沒有新資料，
+        狀態改變仍會推送，訂閱者與輪詢 /api/tick 一樣會看到資料已過期
+        """
+        if "tick" in updated:
+            tick_info = snapshot.as_dict("tick")
+            # 健康狀況先推送，前端收到 tick 時已是最新狀態
+            self.events.publish("health", self.tick_stats.health(tick_info.get("tick", 0),
+                                                                 duration_s=tick_info.get("duration", 0)))
+            self.events.publish("tick", {**tick_info, "stats": self.tick_stats.summary(),
+                                         **self._source_state("tick", snapshot)})
+        if "stats" in updated:
+            self.events.publish("stats", {**self._format_stats(snapshot.stats),
+                                          **self._source_state("stats", snapshot)})
+        for source in ("tick", "stats"):
+            current = self.events.state(source)
+            if source not in updated and current is not None:
+                # 沒有新資料時只有 stale、error 可能改變（沒有變動時不會推送）
+                self.events.publish(source, {**current, **self._source_state(source, snapshot)})
+        # 只有出現新的異常事件時才會產生變動
+        self.events.publish("anomalies", {"recent": self.anomalies.recent(20)})
+
+    def _source_state(self, source: str, snapshot: NetworkSnapshot) -> Dict[str, Any]:
+        """推送事件中的資料狀態：是否過期與最近一次抓取的錯誤"""
+        return {"stale": self.is_stale(source, snapshot), "error": snapshot.errors.get(source)}
+
+    def _record_tick(self, snapshot: NetworkSnapshot):
+        """記錄新 tick 的持續時間與歷史（與回補後的重新預熱互斥）"""
+        with self._record_lock:
+            tick_info = snapshot.tick
+            stats = snapshot.stats
+            fetched_at = snapshot.fetched_at["tick"]
+            tick = tick_info.get("tick", 0)
+            reported_ms = tick_info.get("duration", 0) * 1000
+            measured_ms = self.tick_stats.observe(fetched_at, tick, reported_ms)
+            if measured_ms is not None:
+                self.anomalies.observe(fetched_at, {"duration_ms": measured_ms})
+            record = {
+                "timestamp_ms": int(fetched_at * 1000),
+                "tick": tick,
+                "duration_ms": measured_ms if measured_ms is not None else reported_ms,
+                "epoch": tick_info.get("epoch", 0),
+                "tick_quality": stats.get("epochTickQuality", 0),
+                "active_addresses": stats.get("activeAddresses", 0),
+                "price": stats.get("price", 0)
+            }
+            self.history.append(record)
+            if self.history_store is not None:
+                self.history_store.append(record)
+
+    @staticmethod
+    def _forecast_stats(tick_info: Dict[str, Any], stats: Dict[str, Any]) -> Dict[str, Any]:
+        """合併 tick 資訊與 RPC 統計（保留 ticksInCurrentEpoch）作為預測輸入"""
+        merged = dict(stats or {})
+        merged["epoch"] = (tick_info or {}).get("epoch") or merged.get("epoch", 0)
+        merged["currentTick"] = (tick_info or {}).get("tick") or merged.get("currentTick", 0)
+        return merged
+
+    def get_epoch_forecast(self) -> Dict[str, Any]:
+        """
+        獲取 epoch 進度與 tick 持續時間預測
+
+        Returns:
+            EpochForecaster 的預測結果（最近一次快照更新時的計算結果）
+        """
+        snapshot = self.refresh(["tick", "stats"])
+        if self.forecaster.latest is not None:
+            return self.forecaster.latest
+        return self.forecaster.update(self._forecast_stats(snapshot.tick, snapshot.stats),
+                                      self.history, self.tick_stats)
+
+    def get_tick_info(self) -> Dict[str, Any]:
+        """
+        獲取當前 tick 資訊
+
+        Returns:
+            包含 tick, epoch, duration, initialTick 的字典（無法取得時為備用數據）
+        """
+        tick_info = self.refresh(["tick"]).as_dict("tick") or self._get_fallback_data()
+        self.last_tick_info = tick_info
+        return tick_info
+
+    def get_network_stats(self) -> Dict[str, Any]:
+        """
+        獲取網路統計數據
+
+        Returns:
+            包含活躍地址、市值等統計資訊的字典
+        """
+        stats = self.refresh(["stats"]).stats
+        return self._format_stats(stats) if stats else self._get_fallback_stats()
+
+    def get_network_overview(self) -> Dict[str, Any]:
+        """
+        同時取得 tick、統計與健康狀況（需要抓取時 tick 與統計並行發出）
+
+        Returns:
+            {"tick_info", "stats", "health", "latency_ms"}
+        """
+        snapshot = self.refresh(["tick", "stats"])
+        return {
+            "tick_info": self.get_tick_info(),
+            "stats": self.get_network_stats(),
+            "health": self.get_network_health(),
+            "latency_ms": {k: v for k, v in snapshot.latency_ms.items() if k in ("tick", "stats")}
+        }
+
+    def get_network_health(self) -> Dict[str, str]:
+        """
+        分析網路健康狀況
+
+        Returns:
+            網路健康狀況分析
+        """
+        return self._health(self.get_tick_info())
+
+    def _health(self, tick_info: Mapping[str, Any]) -> Dict[str, str]:
+        """由 tick 資訊與串流統計判斷健康狀況"""
+        if "error" in tick_info:
+            return {
+                "overall": "離線",
+                "tick_status": "無數據",
+                "epoch_status": "無數據",
+                "duration_status": "無數據"
+            }
+        # 依串流統計（平滑後的持續時間與 tick 前進狀況）判斷，無樣本時使用上游回報的持續時間
+        return self.tick_stats.health(tick_info.get("tick", 0), duration_s=tick_info.get("duration", 0))
+
+    def freshness(self, source: str, snapshot: Optional[NetworkSnapshot] = None) -> Dict[str, Any]:
+        """
+        資料來源的抓取時間與是否過期（只含同一版本內不變的欄位，資料年齡由 fetched_at 計算）
+        """
+        snapshot = snapshot or self.poller.snapshot
+        fetched_at = snapshot.fetched_at.get(source)
+        return {
+            "fetched_at": fetched_at,
+            "stale": fetched_at is not None and self.is_stale(source, snapshot)
+        }
+
+    def _state(self, source: str, snapshot: NetworkSnapshot) -> str:
+        """版本中的資料狀態：stale（上游資料過期）、stalled（tick 停止前進）或 live"""
+        if self.is_stale(source, snapshot):
+            return "stale"
+        if source == "tick" and self.tick_stats.is_stalled():
+            return "stalled"
+        return "live"
+
+    def tick_etag(self, snapshot: Optional[NetworkSnapshot] = None) -> Optional[str]:
+        """
+        /api/tick 的版本：快照的 tick 編號與資料狀態（停滯或過期時 tick 不變但健康狀態會改變），
+        無數據時為 None
+
+        Args:
+            snapshot: 計算版本的快照（省略時讀取一次最新快照）
+        """
+        snapshot = snapshot or self.refresh(["tick"])
+        tick = snapshot.tick.get("tick")
+        if not tick:
+            return None
+        return etag_for("tick", tick, self._state("tick", snapshot))
+
+    def stats_etag(self, snapshot: Optional[NetworkSnapshot] = None) -> Optional[str]:
+        """
+        /api/stats 的版本：快照的上游統計時間戳（沒有時為抓取時間）與資料狀態，無數據時為 None
+
+        Args:
+            snapshot: 計算版本的快照（省略時讀取一次最新快照）
+        """
+        snapshot = snapshot or self.refresh(["stats"])
+        if not snapshot.stats:
+            return None
+        return etag_for("stats", snapshot.stats.get("timestamp") or snapshot.fetched_at.get("stats"),
+                        self._state("stats", snapshot))
+
+    def tick_version(self) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+        """
+        讀取一次快照，回傳 /api/tick 的版本與由同一份快照建立內容的函式
+        （輪詢器在兩者之間更新快照時，內容仍與版本一致）
+        """
+        snapshot = self.refresh(["tick"])
+        return self.tick_etag(snapshot), lambda: self.tick_payload(snapshot)
+
+    def stats_version(self) -> Tuple[Optional[str], Callable[[], Dict[str, Any]]]:
+        """讀取一次快照，回傳 /api/stats 的版本與由同一份快照建立內容的函式"""
+        snapshot = self.refresh(["stats"])
+        return self.stats_etag(snapshot), lambda: self.stats_payload(snapshot)
+
+    def tick_payload(self, snapshot: Optional[NetworkSnapshot] = None) -> Dict[str, Any]:
+        """
+        /api/tick 的回應內容（省略快照時讀取一次最新快照）
+        timestamp 為資料抓取時間，內容只含同一版本內不變的欄位，可以預先序列化後重用
+        """
+        snapshot = snapshot or self.refresh(["tick"])
+        tick_info = snapshot.as_dict("tick") or self._get_fallback_data()
+        return {
+            **tick_info,
+            **self.freshness("tick", snapshot),
+            "timestamp": int(snapshot.fetched_at.get("tick") or time.time()),
+            "health": self._health(tick_info),
+            "stats": self.tick_stats.summary(),
+            "data_source": self.data_source
+        }
+
+    def stats_payload(self, snapshot: Optional[NetworkSnapshot] = None) -> Dict[str, Any]:
+        """/api/stats 的回應內容（省略快照時讀取一次最新快照；timestamp 為資料抓取時間）"""
+        snapshot = snapshot or self.refresh(["stats"])
+        stats = self._format_stats(snapshot.stats) if snapshot.stats else self._get_fallback_stats()
+        stats.update(self.freshness("stats", snapshot))
+        stats["timestamp"] = int(snapshot.fetched_at.get("stats") or time.time())
+        stats["data_source"] = self.data_source
+        return stats
+
+    def network_context(self, anomalies: int = 5) -> Dict[str, Any]:
+        """
+        AI 分析用的目前網路狀態（直接讀取快照，不經過 HTTP 路由與 JSON 序列化）
+
+        Args:
+            anomalies: 附上的近期異常事件數
+
+        Returns:
+            /api/tick 與 /api/stats 回應內容合併後的字典，另加 anomalies 與 forecast
+        """
+        context = {**self.tick_payload(), **self.stats_payload()}
+        context["anomalies"] = self.anomalies.recent(anomalies)
+        context["forecast"] = self.get_epoch_forecast()
+        return context
+
+    def metrics(self) -> Dict[str, Any]:
+        """後端、輪詢狀態、斷路器、各資料來源新鮮度、過期資料讀取次數與回應快取統計"""
+        snapshot = self.poller.snapshot
+        return {
+            "backend": self.data_source,
+            "real": self.backend.real,
+            "polling": self.polling,
+            "intervals": dict(self.poller.intervals),
+            "refresh_ms": snapshot.refresh_ms,
+            "sources": snapshot.staleness(),
+            "stale_sources": [s for s in snapshot.fetched_at if self.is_stale(s, snapshot)],
+            "circuit_breaker": self.breaker.metrics(),
+            "upstream": self.backend.metrics(),
+            "backfill": self.backfill.metrics() if self.backfill is not None else None,
+            **self.counts,
+            "response_cache": self.responses.metrics()
+        }
+
+    def _format_stats(self, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """整理 RPC 統計數據欄位（上游的大數值為字串）"""
+        return {
+            "activeAddresses": int(stats.get("activeAddresses", 0)),
+            "marketCap": int(float(stats.get("marketCap", 0))),
+            "burnedQus": int(float(stats.get("burnedQus", 0))),
+            "epochTickQuality": float(stats.get("epochTickQuality", 0)),
+            "circulatingSupply": int(float(stats.get("circulatingSupply", 0))),
+            "price": float(stats.get("price", 0)),
+            "epoch": int(stats.get("epoch", 0)),
+            "currentTick": int(stats.get("currentTick", 0)),
+            "ticksInCurrentEpoch": int(stats.get("ticksInCurrentEpoch", 0)),
+            "emptyTicksInCurrentEpoch": int(stats.get("emptyTicksInCurrentEpoch", 0))
+        }
+
+    def _get_fallback_stats(self) -> Dict[str, Any]:
+        """統計數據不可用時的備用數據"""
+        return {
+            "activeAddresses": 0,
+            "marketCap": 0,
+            "burnedQus": 0,
+            "epochTickQuality": 0,
+            "circulatingSupply": 0,
+            "price": 0,
+            "error": "無法獲取統計數據"
+        }
+
+    def _get_fallback_data(self) -> Dict[str, Any]:
+        """
+        當 API 請求失敗時提供備用數據
+
+        Returns:
+            備用的 tick 資訊
+        """
+        return {
+            "tick": 0,
+            "epoch": 0,
+            "duration": 0,
+            "initialTick": 0,
+            "error": "無法獲取即時數據",
+            "status": "offline"
+        }
+
+
+# 全域資料提供者（API 路由與 AI 路由共用同一個輪詢器）
+_data_provider = None
+_data_provider_lock = threading.Lock()
+
+def get_data_provider() -> DataProvider:
+    """獲取全域資料提供者實例（後端依 QDASHBOARD_DATA_BACKEND 建立）"""
+    global _data_provider
+    if _data_provider is None:
+        with _data_provider_lock:
+            if _data_provider is None:
+                _data_provider = DataProvider()
+    return _data_provider
+
+def set_data_provider(provider: DataProvider) -> DataProvider:
+    """
+    將應用程式建立的資料提供者（例如子類別）設為全域實例，
+    之後 get_data_provider() 的呼叫端（AI 路由、推理引擎）都共用它的輪詢器、歷史與預測
+
+    Args:
+        provider: 資料提供者
+
+    Returns:
+        同一個資料提供者
+    """
+    global _data_provider
+    with _data_provider_lock:
+        previous, _data_provider = _data_provider, provider
+    if previous is not None and previous is not provider:
+        logger.warning("⚠️ 已有其他全域資料提供者，改用應用程式建立的實例（先前的實例停止輪詢）")
+        previous.poller.stop()
+    return provider
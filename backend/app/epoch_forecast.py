@@ -0,0 +1,292 @@
+"""
+Qubic epoch 進度與 tick 持續時間預測
+以 tick 歷史的向量化線性迴歸估計 tick 速率、以區塊速率的離散程度估計其不確定性，結合每週固定的 epoch 排程
+（每週三 12:00 UTC 切換）與觀察到的 ticksInCurrentEpoch，預測 epoch 結束時間、
+總 tick 數與近期持續時間，並提供 95% 信賴區間；計算量小到可以在每次輪詢時重算
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# epoch 長度與排程（Qubic epoch 每週三 12:00 UTC 切換）
+EPOCH_LENGTH_S = 7 * 24 * 3600
+EPOCH_SWITCH_WEEKDAY = 2
+EPOCH_SWITCH_HOUR_UTC = 12
+
+# 迴歸使用的歷史長度與近期持續時間預測的時間範圍
+DEFAULT_LOOKBACK_S = 6 * 3600
+DEFAULT_HORIZON_S = 600
+# 估計速率不確定性時將歷史切成的區塊數
+RATE_BLOCKS = 12
+Z_95 = 1.96
+
+
+def scheduled_epoch_start(now: float) -> float:
+    """依每週排程計算目前 epoch 的開始時間（Unix 秒）"""
+    current = datetime.fromtimestamp(now, tz=timezone.utc)
+    start = current.replace(hour=EPOCH_SWITCH_HOUR_UTC, minute=0, second=0, microsecond=0)
+    start -= timedelta(days=(current.weekday() - EPOCH_SWITCH_WEEKDAY) % 7)
+    if start.timestamp() > now:
+        start -= timedelta(days=7)
+    return start.timestamp()
+
+
+def fit_line(x: np.ndarray, y: np.ndarray) -> Optional[Dict[str, float]]:
+    """
+    最小平方法擬合 y = intercept + slope * x
+
+    Args:
+        x: 自變數
+        y: 應變數
+
+    Returns:
+        {"slope", "intercept", "slope_se", "resid_std"}（樣本不足時為 None）
+    """
+    n = len(x)
+    if n < 3:
+        return None
+    x_mean = x.mean()
+    y_mean = y.mean()
+    dx = x - x_mean
+    sxx = float(dx @ dx)
+    if sxx <= 0:
+        return None
+    slope = float(dx @ (y - y_mean)) / sxx
+    intercept = float(y_mean - slope * x_mean)
+    residuals = y - (intercept + slope * x)
+    resid_var = float(residuals @ residuals) / (n - 2)
+    return {
+        "slope": slope,
+        "intercept": intercept,
+        "slope_se": float(np.sqrt(resid_var / sxx)),
+        "resid_std": float(np.sqrt(resid_var))
+    }
+
+
+def block_rates(ts: np.ndarray, ticks: np.ndarray, blocks: int = RATE_BLOCKS) -> np.ndarray:
+    """
+    將歷史依時間等分成區塊，計算每個區塊的 tick 速率
+
+    Args:
+        ts: 時間戳（秒，已排序）
+        ticks: 對應的 tick
+        blocks: 區塊數
+
+    Returns:
+        各區塊的 ticks/秒（略過沒有時間跨度的區塊）
+    """
+    edges = np.searchsorted(ts, np.linspace(ts[0], ts[-1], blocks + 1))
+    edges[-1] = len(ts) - 1
+    edges = np.unique(np.minimum(edges, len(ts) - 1))
+    spans = np.diff(ts[edges])
+    valid = spans > 0
+    return np.diff(ticks[edges])[valid] / spans[valid]
+
+
+class EpochForecaster:
+    """epoch 進度與持續時間預測器"""
+
+    def __init__(self, lookback_s: float = DEFAULT_LOOKBACK_S, horizon_s: float = DEFAULT_HORIZON_S,
+                 epoch_length_s: float = EPOCH_LENGTH_S):
+        """
+        初始化預測器
+
+        Args:
+            lookback_s: 迴歸使用的歷史秒數
+            horizon_s: 近期持續時間預測的時間範圍（秒）
+            epoch_length_s: epoch 長度（秒）
+        """
+        self.lookback_s = lookback_s
+        self.horizon_s = horizon_s
+        self.epoch_length_s = epoch_length_s
+        self.latest: Optional[Dict[str, Any]] = None
+        self._observed_starts: Dict[int, float] = {}
+        # 已確認歷史中看不到切換的 epoch：{epoch: 當時的歷史 revision}
+        self._unobserved: Dict[int, int] = {}
+
+    def _epoch_start(self, now: float, epoch: int, ticks_in_epoch: int, history: Optional[Any],
+                     rate: Optional[float]) -> Dict[str, Any]:
+        """
+        估計 epoch 開始時間：優先使用歷史中觀察到的切換，其次為每週排程
+
+        搜尋切換需要掃描整個 epoch 欄位；看不到切換（冷啟動或回補只涵蓋 epoch 中段）時記住結果，
+        之後的輪詢只附加更新的紀錄，不會出現新的切換，直到歷史批次插入紀錄（revision 改變）才重新搜尋
+        """
+        observed = self._observed_starts.get(epoch)
+        revision = getattr(history, "revision", 0)
+        if observed is None and history is not None and epoch and self._unobserved.get(epoch) != revision:
+            first = history.query(epoch=epoch, limit=None, fields=["timestamp_ms"])["timestamp_ms"]
+            if len(first):
+                before = history.query(end_ms=int(first[0]) - 1, limit=1, fields=["epoch"])["epoch"]
+                # 只有看到前一個 epoch 的最後一筆紀錄時，第一筆紀錄才代表切換時間
+                if len(before) and int(before[0]) == epoch - 1:
+                    observed = float(first[0]) / 1000
+                    self._observed_starts = {epoch: observed}
+            if observed is None:
+                self._unobserved = {epoch: revision}
+        if observed is not None:
+            return {"start": observed, "source": "observed"}
+
+        scheduled = scheduled_epoch_start(now)
+        if rate and ticks_in_epoch:
+            # 排程與 tick 數推算的開始時間差距過大時（例如排程變更），改用 tick 數推算
+            implied = now - ticks_in_epoch / rate
+            if abs(implied - scheduled) > 12 * 3600:
+                return {"start": implied, "source": "tick_rate"}
+        return {"start": scheduled, "source": "schedule"}
+
+    def update(self, stats: Dict[str, Any], history: Optional[Any] = None, tick_stats: Optional[Any] = None,
+               now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        重新計算預測（每次輪詢後呼叫，只讀取最近 lookback_s 秒的歷史）
+
+        Args:
+            stats: 最新網路統計（epoch、ticksInCurrentEpoch、currentTick）
+            history: TickHistory（或具有相同 query() 介面的儲存）
+            tick_stats: TickStatsEngine（提供 EWMA 與視窗標準差）
+            now: 目前時間（Unix 秒，預設為目前時間）
+
+        Returns:
+            預測結果
+        """
+        now = now if now is not None else time.time()
+        recent: Dict[str, np.ndarray] = {}
+        if history is not None:
+            recent = history.query(start_ms=int((now - self.lookback_s) * 1000),
+                                   fields=["timestamp_ms", "tick", "duration_ms", "epoch"])
+        ts = recent.get("timestamp_ms", np.zeros(0)) / 1000.0
+        ticks = recent.get("tick", np.zeros(0)).astype(np.float64)
+        epochs = recent.get("epoch", np.zeros(0))
+        epoch = int(stats.get("epoch") or (epochs[-1] if len(epochs) else 0))
+        ticks_in_epoch = int(stats.get("ticksInCurrentEpoch") or 0)
+        current_tick = int(stats.get("currentTick") or stats.get("tick") or (ticks[-1] if len(ticks) else 0))
+
+        # 跨 epoch 的歷史只保留目前 epoch 的部分，避免切換時 tick 編號跳動影響迴歸
+        if epoch and len(epochs):
+            mask = epochs == epoch
+            if not mask.all():
+                ts, ticks = ts[mask], ticks[mask]
+                recent = {name: values[mask] for name, values in recent.items()}
+
+        # tick 速率：歷史迴歸（含標準誤），歷史不足時使用串流統計
+        rate = rate_se = None
+        fit = None
+        if len(ts) >= 3:
+            fit = fit_line(ts - ts[0], ticks)
+        if fit is not None and fit["slope"] > 0:
+            rate = fit["slope"]
+            # 累積 tick 序列的殘差高度自相關，迴歸標準誤會嚴重低估；
+            # 改以區塊速率的離散程度作為未來平均速率的不確定性
+            rates = block_rates(ts, ticks)
+            rate_se = float(rates.std(ddof=1)) if len(rates) >= 3 else fit["slope_se"]
+            rate_source = "regression"
+        elif tick_stats is not None and tick_stats.ewma_ms:
+            rate, rate_se = 1000.0 / tick_stats.ewma_ms, None
+            rate_source = "ewma"
+        else:
+            rate_source = None
+
+        start = self._epoch_start(now, epoch, ticks_in_epoch, history, rate)
+        end = start["start"] + self.epoch_length_s
+        elapsed = max(0.0, now - start["start"])
+        remaining_s = max(0.0, end - now)
+
+        forecast: Dict[str, Any] = {
+            "epoch": epoch,
+            "current_tick": current_tick,
+            "ticks_in_epoch": ticks_in_epoch,
+            "epoch_start": round(start["start"], 3),
+            "epoch_start_source": start["source"],
+            "epoch_end": round(end, 3),
+            "remaining_s": round(remaining_s, 1),
+            "progress_pct": round(min(100.0, elapsed / self.epoch_length_s * 100), 2),
+            "tick_rate": round(rate, 4) if rate else None,
+            "tick_rate_ci": None,
+            "tick_rate_source": rate_source,
+            "expected_total_ticks": None,
+            "remaining_ticks": None,
+            "remaining_ticks_ci": None,
+            "duration": None,
+            "samples": int(len(ts)),
+            "computed_at": now
+        }
+
+        if rate:
+            # 剩餘 tick 數的信賴區間：速率不確定性隨剩餘時間放大
+            expected_remaining = rate * remaining_s
+            forecast["remaining_ticks"] = int(round(expected_remaining))
+            forecast["expected_total_ticks"] = int(round(ticks_in_epoch + expected_remaining)) if ticks_in_epoch else None
+            if rate_se is not None:
+                low_rate, high_rate = max(0.0, rate - Z_95 * rate_se), rate + Z_95 * rate_se
+                forecast["tick_rate_ci"] = [round(low_rate, 4), round(high_rate, 4)]
+                forecast["remaining_ticks_ci"] = [int(low_rate * remaining_s), int(high_rate * remaining_s)]
+            forecast["duration"] = self._duration_forecast(ts, recent, rate, tick_stats)
+
+        self.latest = forecast
+        return forecast
+
+    def _duration_forecast(self, ts: np.ndarray, recent: Dict[str, np.ndarray], rate: float,
+                           tick_stats: Optional[Any]) -> Dict[str, Any]:
+        """近期每 tick 持續時間：目前水準加上迴歸趨勢外推，區間取持續時間的離散程度"""
+        durations = recent.get("duration_ms")
+        level = tick_stats.ewma_ms if tick_stats is not None and tick_stats.ewma_ms else 1000.0 / rate
+        trend = 0.0
+        spread = None
+        if durations is not None and len(durations) >= 3:
+            values = durations.astype(np.float64)
+            mask = values > 0
+            if mask.sum() >= 3:
+                fit = fit_line(ts[mask] - ts[mask][0], values[mask])
+                if fit is not None:
+                    trend = fit["slope"]
+                    spread = fit["resid_std"]
+        if spread is None:
+            summary = tick_stats.summary()["windows"] if tick_stats is not None else {}
+            spread = next((w.get("std_ms") for w in summary.values() if w.get("count")), None) or level * 0.25
+        expected = max(0.0, level + trend * self.horizon_s)
+        return {
+            "horizon_s": self.horizon_s,
+            "expected_ms": round(expected, 1),
+            "ci_ms": [round(max(0.0, expected - Z_95 * spread), 1), round(expected + Z_95 * spread, 1)],
+            "trend_ms_per_hour": round(trend * 3600, 2)
+        }
+
+
+def format_forecast(forecast: Optional[Dict[str, Any]], language: str = "zh-tw") -> str:
+    """
+    將預測結果整理成回應或分析提示用的文字
+
+    Args:
+        forecast: EpochForecaster.update() 的結果
+        language: 語言
+
+    Returns:
+        多行文字（無預測時為空字串）
+    """
+    if not forecast:
+        return ""
+    end = datetime.fromtimestamp(forecast["epoch_end"], tz=timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    hours = forecast["remaining_s"] / 3600
+    rate = forecast.get("tick_rate")
+    ci = forecast.get("remaining_ticks_ci")
+    duration = forecast.get("duration") or {}
+    if language == "en":
+        lines = [f"- Epoch {forecast['epoch']} progress: {forecast['progress_pct']:.1f}%, expected end {end} ({hours:.1f} h left)"]
+        if rate:
+            lines.append(f"- Tick rate: {rate:.3f} ticks/s; remaining ticks ≈ {forecast['remaining_ticks']:,}"
+                         + (f" (95% CI {ci[0]:,}–{ci[1]:,})" if ci else ""))
+        if duration:
+            lines.append(f"- Next {duration['horizon_s'] // 60:.0f} min tick duration ≈ {duration['expected_ms']:.0f} ms "
+                         f"(95% CI {duration['ci_ms'][0]:.0f}–{duration['ci_ms'][1]:.0f} ms)")
+    else:
+        lines = [f"- Epoch {forecast['epoch']} 進度: {forecast['progress_pct']:.1f}%，預估結束於 {end}（剩餘 {hours:.1f} 小時）"]
+        if rate:
+            lines.append(f"- tick 速率: {rate:.3f} ticks/秒，預估剩餘 Ticks 約 {forecast['remaining_ticks']:,}"
+                         + (f"（95% 區間 {ci[0]:,}–{ci[1]:,}）" if ci else ""))
+        if duration:
+            lines.append(f"- 未來 {duration['horizon_s'] // 60:.0f} 分鐘 tick 持續時間約 {duration['expected_ms']:.0f} ms"
+                         f"（95% 區間 {duration['ci_ms'][0]:.0f}–{duration['ci_ms'][1]:.0f} ms）")
+    return "\n".join(lines)
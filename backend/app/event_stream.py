@@ -0,0 +1,300 @@
+"""
+Server-Sent Events 推送
+單一生產者（輪詢器的快照通知）將 tick、統計與健康狀況的變動欄位序列化一次後
+廣播給所有訂閱者；每個訂閱者有固定上限的緩衝區，跟不上的連線會被關閉並由瀏覽器
+以 Last-Event-ID 重新連線續傳，最近的事件保留於重播緩衝區
+（WSGI 模式每個連線佔用一個執行緒等待事件；ASGI 模式以 astream 在事件迴圈中等待）
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from flask import Response, jsonify
+
+logger = logging.getLogger(__name__)
+
+# 預設參數
+DEFAULT_HEARTBEAT_S = 15.0
+DEFAULT_CLIENT_BUFFER = 64
+DEFAULT_REPLAY_SIZE = 256
+DEFAULT_MAX_SUBSCRIBERS = int(os.environ.get("QDASHBOARD_STREAM_MAX_CLIENTS", "64"))
+# 瀏覽器斷線後重新連線的等待時間（毫秒）
+RETRY_MS = 3000
+# 比較變動時忽略的欄位（每次都會改變但不代表資料更新）
+VOLATILE_KEYS = frozenset({"timestamp", "fetched_at", "staleness_s"})
+
+
+def format_event(event_id: int, event: str, data: Any) -> str:
+    """
+    組成一個 SSE 事件
+
+    Args:
+        event_id: 事件 id（Last-Event-ID 續傳使用）
+        event: 事件名稱
+        data: 可 JSON 序列化的內容
+
+    Returns:
+        SSE 文字格式的事件
+    """
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class Subscriber:
+    """單一 SSE 連線的有界緩衝區"""
+
+    __slots__ = ("frames", "limit", "overflowed", "notify")
+
+    def __init__(self, limit: int, notify: Optional[Callable[[], None]] = None):
+        self.frames: List[str] = []
+        self.limit = limit
+        self.overflowed = False
+        # 有新事件時的通知（ASGI 模式喚醒事件迴圈中等待的串流）
+        self.notify = notify
+
+    def push(self, frame: str):
+        if len(self.frames) >= self.limit:
+            # 連線跟不上推送速度：停止累積，串流結束後由瀏覽器續傳
+            self.overflowed = True
+        else:
+            self.frames.append(frame)
+        if self.notify is not None:
+            try:
+                self.notify()
+            except RuntimeError:
+                # 事件迴圈已關閉
+                pass
+
+
+class EventBroker:
+    """tick、統計與健康狀況變動的 SSE 廣播器（執行緒安全）"""
+
+    def __init__(self, heartbeat_s: float = DEFAULT_HEARTBEAT_S, client_buffer: int = DEFAULT_CLIENT_BUFFER,
+                 replay_size: int = DEFAULT_REPLAY_SIZE, max_subscribers: int = DEFAULT_MAX_SUBSCRIBERS):
+        """
+        初始化廣播器
+
+        Args:
+            heartbeat_s: 沒有事件時送出心跳註解的間隔（秒）
+            client_buffer: 每個訂閱者最多累積的事件數
+            replay_size: 保留供 Last-Event-ID 續傳的最近事件數
+            max_subscribers: 同時連線的訂閱者上限
+        """
+        self.heartbeat_s = heartbeat_s
+        self.client_buffer = client_buffer
+        self.max_subscribers = max_subscribers
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._replay: deque = deque(maxlen=replay_size)   # (id, 事件文字)
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[Subscriber] = []
+        self._sinks: List[Callable[[int, str, Dict[str, Any]], None]] = []
+        self._cond = threading.Condition()
+        self.published = 0
+
+    def publish(self, event: str, data: Dict[str, Any]) -> Optional[int]:
+        """
+        發布一個資料來源的最新完整狀態，只推送與上次不同的欄位
+
+        Args:
+            event: 事件名稱（tick、stats、health、anomalies）
+            data: 最新完整狀態
+
+        Returns:
+            事件 id（沒有變動時為 None）
+        """
+        with self._cond:
+            previous = self._state.get(event, {})
+            delta = {key: value for key, value in data.items() if previous.get(key) != value}
+            if not delta or delta.keys() <= VOLATILE_KEYS:
+                return None
+            self._state[event] = dict(data)
+
+            # 每個事件只序列化一次，所有訂閱者共用同一份文字
+            event_id = next(self._ids)
+            frame = format_event(event_id, event, delta)
+            self._last_id = event_id
+            self._replay.append((event_id, frame))
+            for subscriber in self._subscribers:
+                subscriber.push(frame)
+            self.published += 1
+            self._cond.notify_all()
+
+        for sink in self._sinks:
+            try:
+                sink(event_id, event, delta)
+            except Exception as e:
+                logger.error(f"❌ 事件轉送失敗: {e}")
+        return event_id
+
+    def add_sink(self, sink: Callable[[int, str, Dict[str, Any]], None]):
+        """
+        註冊其他推送管道（例如 WebSocket 閘道），每個事件的變動欄位會同時轉送
+
+        Args:
+            sink: 接收 (事件 id, 事件名稱, 變動欄位) 的函式
+        """
+        self._sinks.append(sink)
+
+    def state(self, event: str) -> Optional[Dict[str, Any]]:
+        """事件目前的完整狀態（尚未發布時為 None）"""
+        with self._cond:
+            state = self._state.get(event)
+            return dict(state) if state is not None else None
+
+    def _snapshot_frame(self) -> str:
+        return format_event(self._last_id, "snapshot", self._state)
+
+    def subscribe(self, last_event_id: Optional[int] = None,
+                  notify: Optional[Callable[[], None]] = None) -> Optional[Subscriber]:
+        """
+        註冊訂閱者並放入初始事件：續傳時重播遺漏的事件，否則送出完整狀態
+
+        Args:
+            last_event_id: 瀏覽器最後收到的事件 id
+            notify: 有新事件時呼叫的函式（在發布的執行緒中呼叫，不可阻塞）
+
+        Returns:
+            訂閱者（已達連線上限時為 None）
+        """
+        with self._cond:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.client_buffer, notify)
+            oldest = self._replay[0][0] if self._replay else self._last_id + 1
+            if last_event_id is not None and oldest - 1 <= last_event_id <= self._last_id \
+                    and self._last_id - last_event_id <= self.client_buffer:
+                subscriber.frames.extend(frame for event_id, frame in self._replay if event_id > last_event_id)
+            elif self._state:
+                subscriber.frames.append(self._snapshot_frame())
+            self._subscribers.append(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._cond:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def stream(self, subscriber: Subscriber) -> Iterator[str]:
+        """
+        訂閱者的事件串流（供 Flask Response 使用），結束時自動取消訂閱
+
+        Args:
+            subscriber: subscribe() 的結果
+
+        Yields:
+            SSE 文字
+        """
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while True:
+                with self._cond:
+                    if not subscriber.frames and not subscriber.overflowed:
+                        self._cond.wait(self.heartbeat_s)
+                frames, overflowed = self._drain(subscriber)
+                if frames:
+                    yield "".join(frames)
+                elif not overflowed:
+                    # 心跳註解讓代理伺服器與瀏覽器維持連線
+                    yield f": heartbeat {int(time.time())}\n\n"
+                if overflowed:
+                    logger.warning("⚠️ SSE 訂閱者緩衝區已滿，關閉連線等待續傳")
+                    break
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _drain(self, subscriber: Subscriber):
+        """取出訂閱者累積的事件與是否溢位"""
+        with self._cond:
+            frames, subscriber.frames = subscriber.frames, []
+            return frames, subscriber.overflowed
+
+    async def astream(self, subscriber: Subscriber, wake: asyncio.Event,
+                      closed: Optional[asyncio.Event] = None) -> AsyncIterator[str]:
+        """
+        訂閱者的非同步事件串流（ASGI 模式），結束時自動取消訂閱
+
+        Args:
+            subscriber: subscribe(notify=...) 的結果，notify 需設定 wake
+            wake: 有新事件或連線關閉時設定的事件
+            closed: 客戶端斷線時設定的事件（同時需設定 wake）
+
+        Yields:
+            SSE 文字
+        """
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            while closed is None or not closed.is_set():
+                if not subscriber.frames and not subscriber.overflowed:
+                    try:
+                        await asyncio.wait_for(wake.wait(), self.heartbeat_s)
+                    except asyncio.TimeoutError:
+                        pass
+                # 先清除再取出，取出後才到達的事件會再次設定 wake
+                wake.clear()
+                if closed is not None and closed.is_set():
+                    break
+                frames, overflowed = self._drain(subscriber)
+                if frames:
+                    yield "".join(frames)
+                elif not overflowed:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                if overflowed:
+                    logger.warning("⚠️ SSE 訂閱者緩衝區已滿，關閉連線等待續傳")
+                    break
+        finally:
+            self.unsubscribe(subscriber)
+
+    def metrics(self) -> Dict[str, Any]:
+        """訂閱者數量與已發布事件數"""
+        return {
+            "subscribers": len(self._subscribers),
+            "max_subscribers": self.max_subscribers,
+            "published": self.published,
+            "last_event_id": self._last_id
+        }
+
+
+def last_event_id(request) -> Optional[int]:
+    """
+    由 Last-Event-ID 標頭（瀏覽器自動重連）或 lastEventId 參數取得續傳位置
+
+    Args:
+        request: Flask request
+
+    Returns:
+        事件 id（沒有或格式錯誤時為 None）
+    """
+    value = request.headers.get("Last-Event-ID") or request.args.get("lastEventId")
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def stream_response(broker: EventBroker, request):
+    """
+    建立 /api/stream 的 Flask 回應
+
+    Args:
+        broker: 事件廣播器
+        request: Flask request
+
+    Returns:
+        text/event-stream 回應（已達連線上限時為 503，前端改用輪詢）
+    """
+    subscriber = broker.subscribe(last_event_id(request))
+    if subscriber is None:
+        return jsonify({"error": "串流連線已達上限，請改用輪詢"}), 503
+    return Response(
+        broker.stream(subscriber),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
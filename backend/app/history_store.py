@@ -0,0 +1,473 @@
+"""
+Qubic tick 歷史欄位儲存檔
+每個指標一個只附加的欄位檔，批次寫入後以 numpy.memmap 讀取，
+並以區塊索引（每區塊的時間戳與 epoch 範圍）讓範圍查詢只觸及需要的頁面，
+服務重新部署後仍保有歷史
+
+同一個儲存目錄只允許一個程序寫入（以 flock 鎖定 writer.lock）；已被其他程序（例如 Werkzeug
+重新載入器的另一個程序，或同時執行的其他入口）鎖定時無法開啟，呼叫端改為只保留記憶體歷史
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# fcntl 只在 POSIX 系統提供，沒有時不鎖定儲存目錄
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from .tick_history import HISTORY_FIELDS, TickHistory
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_HISTORY_DIR = Path(os.environ.get("QDASHBOARD_HISTORY_DIR", PROJECT_ROOT / "data" / "history"))
+
+# 每個索引區塊的列數與預設批次寫入條件
+BLOCK_ROWS = 1024
+DEFAULT_FLUSH_ROWS = 256
+DEFAULT_FLUSH_INTERVAL = 30.0
+
+LOCK_NAME = "writer.lock"
+
+# 區塊索引欄位：時間戳與 epoch 的最小/最大值
+_BLOCK_COLUMNS = ("ts_min", "ts_max", "epoch_min", "epoch_max")
+
+
+class HistoryStore:
+    """只附加的記憶體映射 tick 歷史欄位儲存檔（執行緒安全）"""
+
+    def __init__(self, store_dir: Optional[Path] = None, flush_rows: int = DEFAULT_FLUSH_ROWS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, writer: bool = True):
+        """
+        開啟（必要時建立）儲存檔
+
+        Args:
+            store_dir: 儲存目錄
+            flush_rows: 待寫入列數達到此值時寫入磁碟
+            flush_interval: 距上次寫入超過此秒數時寫入磁碟
+            writer: 是否鎖定儲存目錄以便寫入（只讀取時為 False，不與寫入的程序衝突）
+
+        Raises:
+            RuntimeError: 儲存目錄已由其他程序開啟寫入
+        """
+        self.store_dir = Path(store_dir or DEFAULT_HISTORY_DIR)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.writer = writer
+        self._writer_lock = self._acquire_writer_lock() if writer else None
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in HISTORY_FIELDS}
+        self.fields = tuple(self.dtypes)
+        self._lock = threading.RLock()
+        self._pending: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self._maps: Dict[str, np.memmap] = {}
+        self._maps_count = -1
+        self._load()
+
+    def _acquire_writer_lock(self):
+        """以非阻塞的排他 flock 鎖定儲存目錄（鎖在程序結束或關閉檔案時釋放）"""
+        if not FCNTL_AVAILABLE:
+            return None
+        lock_file = open(self.store_dir / LOCK_NAME, "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"歷史儲存檔 {self.store_dir} 已由其他程序開啟寫入")
+        return lock_file
+
+    # ---- 檔案配置 ----
+
+    def _column_path(self, name: str) -> Path:
+        return self.store_dir / f"{name}.col"
+
+    def _load(self):
+        """讀取中繼資料與區塊索引，並截掉上次中斷寫入時超出紀錄列數的部分（只有寫入的程序修改檔案）"""
+        meta_path = self.store_dir / "meta.json"
+        self.count = 0
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("version") != STORE_VERSION:
+                raise ValueError(f"不支援的歷史儲存檔版本: {meta.get('version')}")
+            self.count = int(meta.get("count", 0))
+
+        for name, dtype in self.dtypes.items():
+            if not self.writer:
+                break
+            path = self._column_path(name)
+            expected = self.count * dtype.itemsize
+            if not path.exists():
+                # 新增的欄位以 0 補齊既有列數
+                with open(path, "wb") as f:
+                    f.truncate(expected)
+            elif path.stat().st_size != expected:
+                with open(path, "r+b") as f:
+                    f.truncate(expected)
+
+        blocks_path = self.store_dir / "blocks.npy"
+        n_blocks = -(-self.count // BLOCK_ROWS)
+        if blocks_path.exists():
+            blocks = np.load(blocks_path)
+            self._blocks = blocks[:n_blocks].copy() if len(blocks) >= n_blocks else None
+        else:
+            self._blocks = None
+        if self._blocks is None:
+            self._blocks = self._rebuild_blocks()
+        self._last_ts = int(self._column("timestamp_ms")[-1]) if self.count else None
+        self._last_tick = int(self._column("tick")[-1]) if self.count else None
+
+    def _rebuild_blocks(self) -> np.ndarray:
+        """由欄位檔重新計算區塊索引"""
+        blocks = np.zeros((0, len(_BLOCK_COLUMNS)), dtype=np.int64)
+        if self.count:
+            ts = self._column("timestamp_ms")
+            epoch = self._column("epoch")
+            starts = np.arange(0, self.count, BLOCK_ROWS)
+            blocks = np.stack([
+                np.minimum.reduceat(ts, starts), np.maximum.reduceat(ts, starts),
+                np.minimum.reduceat(epoch, starts), np.maximum.reduceat(epoch, starts)
+            ], axis=1).astype(np.int64)
+        return blocks
+
+    def _column(self, name: str) -> np.ndarray:
+        """欄位的唯讀記憶體映射（列數變更時重新映射）"""
+        if self._maps_count != self.count:
+            self._maps = {}
+            self._maps_count = self.count
+        column = self._maps.get(name)
+        if column is None:
+            if self.count == 0:
+                column = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                column = np.memmap(self._column_path(name), dtype=self.dtypes[name], mode="r",
+                                   shape=(self.count,))
+            self._maps[name] = column
+        return column
+
+    # ---- 寫入 ----
+
+    def __len__(self) -> int:
+        return self.count + len(self._pending)
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """
+        附加一筆紀錄（累積到批次條件時寫入磁碟）
+
+        Args:
+            record: 欄位值字典，缺少的欄位記為 0；timestamp_ms 省略時使用目前時間
+
+        Returns:
+            是否已加入（與最近一筆相同 tick 的重複觀察會略過）
+        """
+        with self._lock:
+            tick = int(record.get("tick", 0))
+            if self._last_tick is not None and tick == self._last_tick:
+                return False
+            timestamp_ms = record.get("timestamp_ms")
+            timestamp_ms = int(timestamp_ms) if timestamp_ms is not None else int(time.time() * 1000)
+            if self._last_ts is not None:
+                # 維持時間戳單調遞增
+                timestamp_ms = max(timestamp_ms, self._last_ts)
+            row = {name: record.get(name) or 0 for name in self.fields}
+            row["timestamp_ms"] = timestamp_ms
+            self._pending.append(row)
+            self._last_ts = timestamp_ms
+            self._last_tick = tick
+
+            if len(self._pending) >= self.flush_rows or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+            return True
+
+    def _pending_columns(self) -> Dict[str, np.ndarray]:
+        return {
+            name: np.array([float(row[name]) if isinstance(row[name], str) else row[name]
+                            for row in self._pending], dtype=dtype)
+            for name, dtype in self.dtypes.items()
+        }
+
+    def flush(self):
+        """將待寫入的紀錄附加到欄位檔，並原子更新中繼資料與區塊索引"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return
+            columns = self._pending_columns()
+            for name, values in columns.items():
+                with open(self._column_path(name), "ab") as f:
+                    f.write(values.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            start = self.count
+            self.count += len(self._pending)
+            self._pending = []
+            self._update_blocks(start, columns)
+
+            # 欄位檔先寫入，再更新列數，中斷時多出的尾端會在下次開啟時截掉
+            self._write_meta()
+
+    def _write_meta(self):
+        """原子更新區塊索引與中繼資料（列數）"""
+        np.save(self.store_dir / "blocks.tmp.npy", self._blocks)
+        os.replace(self.store_dir / "blocks.tmp.npy", self.store_dir / "blocks.npy")
+        meta_tmp = self.store_dir / "meta.json.tmp"
+        meta_tmp.write_text(json.dumps({
+            "version": STORE_VERSION,
+            "count": self.count,
+            "block_rows": BLOCK_ROWS,
+            "fields": {name: dtype.str for name, dtype in self.dtypes.items()}
+        }), encoding="utf-8")
+        os.replace(meta_tmp, self.store_dir / "meta.json")
+
+    def merge(self, columns: Dict[str, np.ndarray]) -> int:
+        """
+        合併不一定比既有紀錄新的紀錄（例如回補的歷史），依時間戳重寫整個儲存檔
+        成本與儲存檔大小成正比，只適合偶爾的批次合併；一般的新紀錄請使用 append()
+
+        Args:
+            columns: {欄位: 陣列}，須包含 timestamp_ms 與 tick，缺少的欄位記為 0
+
+        Returns:
+            新增的紀錄數（已存在的 tick 會略過）
+        """
+        if "tick" not in columns or "timestamp_ms" not in columns:
+            return 0
+        with self._lock:
+            self.flush()
+            existing = {name: np.array(self._column(name)) for name in self.fields}
+            count = len(columns["tick"])
+            incoming = {name: np.asarray(columns[name], dtype=dtype) if name in columns
+                        else np.zeros(count, dtype=dtype) for name, dtype in self.dtypes.items()}
+            keep = ~np.isin(incoming["tick"], existing["tick"])
+            added = int(keep.sum())
+            if not added:
+                return 0
+            merged = {name: np.concatenate((existing[name], incoming[name][keep])) for name in self.fields}
+            order = np.argsort(merged["timestamp_ms"], kind="stable")
+
+            # 先寫入所有暫存欄位檔再替換，最後更新中繼資料
+            for name in self.fields:
+                tmp = self._column_path(name).with_suffix(".col.tmp")
+                with open(tmp, "wb") as f:
+                    f.write(merged[name][order].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._maps = {}
+            self._maps_count = -1
+            for name in self.fields:
+                os.replace(self._column_path(name).with_suffix(".col.tmp"), self._column_path(name))
+            self.count = len(order)
+            self._blocks = self._rebuild_blocks()
+            self._write_meta()
+            self._last_ts = int(self._column("timestamp_ms")[-1])
+            self._last_tick = int(self._column("tick")[-1])
+            logger.info(f"💾 已合併 {added:,} 筆紀錄到 tick 歷史儲存檔（共 {self.count:,} 筆）")
+            return added
+
+    def _update_blocks(self, start: int, columns: Dict[str, np.ndarray]):
+        """更新新列涉及的區塊索引（只有最後一個區塊可能與先前的列合併）"""
+        ts = columns["timestamp_ms"]
+        epoch = columns["epoch"].astype(np.int64)
+        blocks = [row for row in self._blocks]
+        offset = 0
+        row = start
+        while offset < len(ts):
+            block = row // BLOCK_ROWS
+            take = min(len(ts) - offset, (block + 1) * BLOCK_ROWS - row)
+            part_ts = ts[offset:offset + take]
+            part_epoch = epoch[offset:offset + take]
+            stats = np.array([part_ts.min(), part_ts.max(), part_epoch.min(), part_epoch.max()], dtype=np.int64)
+            if block < len(blocks):
+                previous = blocks[block]
+                stats = np.array([min(previous[0], stats[0]), max(previous[1], stats[1]),
+                                  min(previous[2], stats[2]), max(previous[3], stats[3])], dtype=np.int64)
+                blocks[block] = stats
+            else:
+                blocks.append(stats)
+            offset += take
+            row += take
+        self._blocks = np.array(blocks, dtype=np.int64).reshape(-1, len(_BLOCK_COLUMNS))
+
+    def close(self):
+        """寫入所有待寫入的紀錄並釋放寫入鎖"""
+        self.flush()
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
+
+    # ---- 讀取 ----
+
+    def _block_range(self, lo: int, hi: int, column_min: int, column_max: int) -> Tuple[int, int]:
+        """由區塊索引找出與 [lo, hi] 重疊的區塊所涵蓋的列範圍"""
+        overlap = np.nonzero((self._blocks[:, column_max] >= lo) & (self._blocks[:, column_min] <= hi))[0]
+        if len(overlap) == 0:
+            return 0, 0
+        return int(overlap[0]) * BLOCK_ROWS, min(self.count, (int(overlap[-1]) + 1) * BLOCK_ROWS)
+
+    def _timestamp_range(self, lo: int, hi: int) -> Tuple[int, int]:
+        """時間戳範圍對應的列範圍（只映射區塊索引選出的頁面再二分搜尋）"""
+        start, stop = self._block_range(lo, hi, 0, 1)
+        if start >= stop:
+            return 0, 0
+        window = self._column("timestamp_ms")[start:stop]
+        return (start + int(np.searchsorted(window, lo, side="left")),
+                start + int(np.searchsorted(window, hi, side="right")))
+
+    def _epoch_range(self, epoch: int) -> Tuple[int, int]:
+        """epoch 對應的列範圍（區塊索引選出候選區塊後逐列比對）"""
+        start, stop = self._block_range(epoch, epoch, 2, 3)
+        if start >= stop:
+            return 0, 0
+        matches = np.nonzero(self._column("epoch")[start:stop] == epoch)[0]
+        if len(matches) == 0:
+            return 0, 0
+        return start + int(matches[0]), start + int(matches[-1]) + 1
+
+    def query(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+              limit: Optional[int] = None, max_points: Optional[int] = None,
+              fields: Optional[Sequence[str]] = None, epoch: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        查詢時間範圍（或指定 epoch）內的紀錄，包含尚未寫入磁碟的列
+
+        Args:
+            start_ms: 起始時間戳（含，毫秒）
+            end_ms: 結束時間戳（含，毫秒）
+            limit: 只保留範圍內最新的 limit 筆
+            max_points: 超過時以固定間隔抽樣到最多 max_points 筆（保留最新一筆）
+            fields: 要取出的欄位（預設全部）
+            epoch: 只取出此 epoch 的紀錄
+
+        Returns:
+            {欄位: 依時間排序的陣列}
+        """
+        names = [name for name in (fields or self.fields) if name in self.dtypes]
+        ts_lo = start_ms if start_ms is not None else np.iinfo(np.int64).min
+        ts_hi = end_ms if end_ms is not None else np.iinfo(np.int64).max
+
+        with self._lock:
+            lo, hi = 0, self.count
+            if start_ms is not None or end_ms is not None:
+                lo, hi = self._timestamp_range(ts_lo, ts_hi)
+            if epoch is not None:
+                e_lo, e_hi = self._epoch_range(epoch)
+                lo, hi = max(lo, e_lo), min(hi, e_hi)
+            hi = max(lo, hi)
+
+            pending = self._pending_columns() if self._pending else None
+            if pending is not None:
+                mask = (pending["timestamp_ms"] >= ts_lo) & (pending["timestamp_ms"] <= ts_hi)
+                if epoch is not None:
+                    mask &= pending["epoch"] == epoch
+                pending = {name: values[mask] for name, values in pending.items()}
+            n_pending = len(pending["timestamp_ms"]) if pending is not None else 0
+
+            if limit is not None and limit >= 0:
+                keep_disk = max(0, limit - n_pending)
+                lo = max(lo, hi - keep_disk)
+                if n_pending > limit:
+                    pending = {name: values[n_pending - limit:] for name, values in pending.items()}
+
+            columns = {}
+            for name in names:
+                values = np.array(self._column(name)[lo:hi])
+                if pending is not None:
+                    values = np.concatenate((values, pending[name]))
+                columns[name] = values
+
+        count = len(columns[names[0]]) if names else 0
+        if max_points and count > max_points:
+            step = -(-count // max_points)
+            index = np.arange(count - 1, -1, -step)[::-1]
+            columns = {name: values[index] for name, values in columns.items()}
+        return columns
+
+    def oldest_timestamp(self) -> Optional[int]:
+        """最舊一筆紀錄的時間戳"""
+        with self._lock:
+            if self.count:
+                return int(self._column("timestamp_ms")[0])
+            return int(self._pending[0]["timestamp_ms"]) if self._pending else None
+
+    def to_json(self, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """將查詢結果轉為 JSON 友善的欄位格式"""
+        count = len(next(iter(columns.values()))) if columns else 0
+        return {
+            "count": count,
+            "size": len(self),
+            "source": "store",
+            "fields": {name: values.tolist() for name, values in columns.items()}
+        }
+
+
+def open_history_store(store_dir: Optional[Path] = None, writer: bool = True) -> Optional[HistoryStore]:
+    """
+    開啟歷史儲存檔，無法寫入（例如唯讀檔案系統，或已由其他程序開啟寫入）時回傳 None
+
+    Args:
+        store_dir: 儲存目錄
+        writer: 是否鎖定儲存目錄以便寫入
+
+    Returns:
+        歷史儲存檔或 None
+    """
+    try:
+        store = HistoryStore(store_dir, writer=writer)
+        logger.info(f"💾 tick 歷史儲存檔已開啟: {store.store_dir}（{store.count:,} 筆）")
+        return store
+    except Exception as e:
+        logger.warning(f"⚠️ 無法開啟 tick 歷史儲存檔，僅保留記憶體歷史: {e}")
+        return None
+
+
+def warm_history(history: TickHistory, store: Optional[HistoryStore]) -> int:
+    """
+    以儲存檔最新的紀錄填入記憶體環形緩衝區（服務重啟後立即有歷史）
+
+    Args:
+        history: 記憶體環形緩衝區
+        store: 歷史儲存檔
+
+    Returns:
+        載入的紀錄數
+    """
+    if store is None or len(store) == 0:
+        return 0
+    return history.extend(store.query(limit=history.capacity))
+
+
+def query_history(history: TickHistory, store: Optional[HistoryStore], **query) -> Dict[str, Any]:
+    """
+    查詢歷史：記憶體緩衝區涵蓋請求範圍時直接讀取，否則讀取儲存檔
+
+    Args:
+        history: 記憶體環形緩衝區
+        store: 歷史儲存檔（可為 None）
+        **query: query() 參數
+
+    Returns:
+        JSON 友善的查詢結果
+    """
+    if store is not None and len(store) > len(history):
+        start_ms = query.get("start_ms")
+        limit = query.get("limit")
+        oldest = history.oldest_timestamp()
+        covered = query.get("epoch") is None and oldest is not None and (
+            (start_ms is not None and start_ms >= oldest) or
+            (start_ms is None and limit is not None and limit <= len(history))
+        )
+        if not covered:
+            return store.to_json(store.query(**query))
+    return history.to_json(history.query(**query))
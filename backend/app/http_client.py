@@ -0,0 +1,306 @@
+"""
+上游 HTTP 客戶端
+共用的 keep-alive 連線池（每個主機獨立的連線數上限、重試與退避），
+以及遵循 Cache-Control 與 ETag 的小型回應快取，並統計連線重用與快取命中率
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 預設連線池與重試設定
+DEFAULT_POOL_CONNECTIONS = 8     # 保留連線池的主機數
+DEFAULT_POOL_MAXSIZE = 10        # 每個主機的最大連線數
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+DEFAULT_CACHE_SIZE = 128
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def parse_cache_control(header: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    解析 Cache-Control 標頭
+
+    Args:
+        header: 標頭值，例如 "public, max-age=30"
+
+    Returns:
+        {指令: 值}（沒有值的指令為 None）
+    """
+    directives: Dict[str, Optional[str]] = {}
+    for part in (header or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') if value else None
+    return directives
+
+
+class CacheEntry:
+    """快取的回應"""
+
+    __slots__ = ("status_code", "headers", "content", "encoding", "url", "etag", "last_modified",
+                 "expires_at", "must_revalidate")
+
+    def __init__(self, response: requests.Response, expires_at: float, must_revalidate: bool):
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.content
+        self.encoding = response.encoding
+        self.url = response.url
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        self.expires_at = expires_at
+        self.must_revalidate = must_revalidate
+
+    def is_fresh(self, now: float) -> bool:
+        return not self.must_revalidate and now < self.expires_at
+
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def to_response(self) -> requests.Response:
+        """重建 requests.Response（呼叫端無法分辨是否來自快取，除了 from_cache 屬性）"""
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers.update(self.headers)
+        response._content = self.content
+        response.encoding = self.encoding
+        response.url = self.url
+        response.elapsed = timedelta(0)
+        response.from_cache = True
+        return response
+
+
+class UpstreamHTTPClient:
+    """具連線池與回應快取的上游 HTTP 客戶端"""
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF,
+                 cache_size: int = DEFAULT_CACHE_SIZE,
+                 default_ttl: float = 0.0):
+        """
+        初始化客戶端
+
+        Args:
+            pool_connections: 保留連線池的主機數
+            pool_maxsize: 每個主機的最大 keep-alive 連線數
+            retries: 連線錯誤與暫時性錯誤狀態碼的重試次數（只重試冪等方法）
+            backoff_factor: 重試退避係數（第 n 次重試等待 backoff_factor * 2^(n-1) 秒）
+            cache_size: 快取的最大回應數
+            default_ttl: 上游未提供快取標頭時的存活秒數（0 表示不快取）
+        """
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.cache_size = cache_size
+        self.default_ttl = default_ttl
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "network_requests": 0,
+            "cache_hits": 0,
+            "cache_revalidated": 0,
+            "cache_misses": 0,
+            "cache_stores": 0,
+            "retries": 0,
+            "errors": 0
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _cache_key(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        return requests.Request("GET", url, params=params).prepare().url
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+            return entry
+
+    def _store(self, key: str, response: requests.Response):
+        """依回應的快取標頭決定是否存入快取"""
+        if response.status_code != 200:
+            return
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        if "no-store" in directives or "private" in directives:
+            return
+
+        ttl = self.default_ttl
+        max_age = directives.get("s-maxage") or directives.get("max-age")
+        if max_age is not None:
+            try:
+                ttl = max(0.0, float(max_age))
+            except ValueError:
+                ttl = 0.0
+        must_revalidate = "no-cache" in directives
+        entry = CacheEntry(response, time.time() + ttl, must_revalidate)
+        if ttl <= 0 and not entry.can_revalidate():
+            return
+
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self._stats["cache_stores"] += 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        透過連線池發送請求（不經過快取）
+
+        Args:
+            method: HTTP 方法
+            url: 請求 URL
+            **kwargs: 傳給 requests.Session.request 的參數
+
+        Returns:
+            HTTP 回應
+        """
+        self._count("requests")
+        return self._send(method, url, **kwargs)
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        self._count("network_requests")
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._count("errors")
+            raise
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            self._count("retries", len(retries.history))
+        return response
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, use_cache: bool = True,
+            **kwargs) -> requests.Response:
+        """
+        發送 GET 請求，新鮮的快取直接回傳，過期但有 ETag/Last-Modified 的快取以條件式請求重新驗證
+
+        Args:
+            url: 請求 URL
+            params: 查詢參數
+            use_cache: 是否使用回應快取
+            **kwargs: 傳給 requests.Session.request 的參數（例如 timeout）
+
+        Returns:
+            HTTP 回應（來自快取時 from_cache 為 True）
+        """
+        if not use_cache:
+            return self.request("GET", url, params=params, **kwargs)
+
+        self._count("requests")
+        key = self._cache_key(url, params)
+        entry = self._lookup(key)
+        if entry is not None and entry.is_fresh(time.time()):
+            self._count("cache_hits")
+            return entry.to_response()
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None and entry.can_revalidate():
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = self._send("GET", url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            self._count("cache_revalidated")
+            # 以 304 回應的快取標頭更新存活時間
+            merged = entry.to_response()
+            merged.headers.update(response.headers)
+            merged.from_cache = True
+            self._store(key, merged)
+            return merged
+
+        self._count("cache_misses")
+        response.from_cache = False
+        self._store(key, response)
+        return response
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """發送 POST 請求（不快取、不自動重試）"""
+        return self.request("POST", url, **kwargs)
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> Any:
+        """發送 GET 請求並解析 JSON（錯誤狀態碼時拋出例外）"""
+        response = self.get(url, params=params, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def clear_cache(self):
+        """清除回應快取"""
+        with self._lock:
+            self._cache.clear()
+
+    def _connection_stats(self) -> Dict[str, int]:
+        """從 urllib3 連線池統計建立的連線數與經過連線池的請求數"""
+        opened = 0
+        pooled_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            opened += getattr(pool, "num_connections", 0)
+            pooled_requests += getattr(pool, "num_requests", 0)
+        return {"opened": opened, "requests": pooled_requests}
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        取得連線重用與快取統計
+
+        Returns:
+            請求數、快取命中率、連線重用率等指標
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cache_entries"] = len(self._cache)
+        connections = self._connection_stats()
+        stats["connections_opened"] = connections["opened"]
+        stats["connection_reuse_rate"] = round(
+            1 - connections["opened"] / connections["requests"], 4
+        ) if connections["requests"] else 0.0
+        cacheable = stats["cache_hits"] + stats["cache_revalidated"] + stats["cache_misses"]
+        stats["cache_hit_rate"] = round(
+            (stats["cache_hits"] + stats["cache_revalidated"]) / cacheable, 4
+        ) if cacheable else 0.0
+        return stats
+
+    def close(self):
+        """關閉所有連線"""
+        self.session.close()
+
+
+# 全域上游 HTTP 客戶端實例（同一行程內共用連線池與快取）
+_http_client = None
+
+def get_http_client() -> UpstreamHTTPClient:
+    """獲取全域上游 HTTP 客戶端實例"""
+    global _http_client
+    if _http_client is None:
+        _http_client = UpstreamHTTPClient()
+    return _http_client
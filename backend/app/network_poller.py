@@ -0,0 +1,310 @@
+"""
+Qubic 網路背景輪詢器
+由單一背景執行緒依各自的排程抓取 tick、統計與狀態（同一輪的 RPC 呼叫並行發出），
+發布不可變的網路快照，路由只讀取最新快照，不在請求執行緒中進行任何網路 I/O
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = MappingProxyType({})
+
+# 預設輪詢間隔（秒）
+DEFAULT_POLL_INTERVALS = {
+    "tick": 3,
+    "stats": 15,
+    "status": 10
+}
+
+
+def fetch_concurrently(calls: Dict[str, Callable[[], Any]], executor: Optional[ThreadPoolExecutor] = None,
+                       timeout: Optional[float] = None) -> Tuple[Dict[str, Any], Dict[str, str], Dict[str, float]]:
+    """
+    並行執行多個獨立的 RPC 呼叫，個別失敗不影響其他結果
+
+    Args:
+        calls: {名稱: 呼叫函式}
+        executor: 共用的執行緒池（省略時建立暫時的執行緒池）
+        timeout: 等待所有呼叫完成的最長秒數（逾時的呼叫記為失敗）
+
+    Returns:
+        (成功結果, 錯誤訊息, 各呼叫延遲毫秒數)
+    """
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    latency_ms: Dict[str, float] = {}
+    if not calls:
+        return results, errors, latency_ms
+
+    def timed(call):
+        start = time.perf_counter()
+        try:
+            return call(), None, (time.perf_counter() - start) * 1000
+        except Exception as e:
+            return None, e, (time.perf_counter() - start) * 1000
+
+    pool = executor or ThreadPoolExecutor(max_workers=len(calls))
+    try:
+        futures = {name: pool.submit(timed, call) for name, call in calls.items()}
+        wait_futures(list(futures.values()), timeout=timeout)
+        for name, future in futures.items():
+            if not future.done():
+                errors[name] = f"逾時（>{timeout}s）"
+                latency_ms[name] = timeout * 1000 if timeout else 0.0
+                continue
+            value, error, elapsed = future.result()
+            latency_ms[name] = round(elapsed, 2)
+            if error is None:
+                results[name] = value
+            else:
+                errors[name] = str(error)
+    finally:
+        if executor is None:
+            pool.shutdown(wait=False)
+    return results, errors, latency_ms
+
+
+def _freeze(value: Any) -> Any:
+    """將字典包成唯讀檢視，其他值原樣保留"""
+    return MappingProxyType(dict(value)) if isinstance(value, dict) else value
+
+
+class NetworkSnapshot:
+    """不可變的網路狀態快照"""
+
+    __slots__ = ("values", "fetched_at", "errors", "latency_ms", "refresh_ms", "sequence", "created_at")
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None,
+                 fetched_at: Optional[Dict[str, float]] = None,
+                 errors: Optional[Dict[str, str]] = None,
+                 latency_ms: Optional[Dict[str, float]] = None,
+                 refresh_ms: float = 0.0,
+                 sequence: int = 0, created_at: Optional[float] = None):
+        """
+        建立快照
+
+        Args:
+            values: 各資料來源的最新成功結果
+            fetched_at: 各資料來源最後成功抓取的時間（Unix 秒）
+            errors: 各資料來源最近一次失敗的錯誤訊息（成功後清除）
+            latency_ms: 各資料來源最近一次呼叫的延遲（毫秒）
+            refresh_ms: 產生此快照的那一輪抓取總耗時（毫秒）
+            sequence: 發布序號
+            created_at: 快照建立時間
+        """
+        object.__setattr__(self, "values", MappingProxyType({k: _freeze(v) for k, v in (values or {}).items()}))
+        object.__setattr__(self, "fetched_at", MappingProxyType(dict(fetched_at or {})))
+        object.__setattr__(self, "errors", MappingProxyType(dict(errors or {})))
+        object.__setattr__(self, "latency_ms", MappingProxyType(dict(latency_ms or {})))
+        object.__setattr__(self, "refresh_ms", refresh_ms)
+        object.__setattr__(self, "sequence", sequence)
+        object.__setattr__(self, "created_at", created_at if created_at is not None else time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NetworkSnapshot 為不可變物件")
+
+    def __delattr__(self, name):
+        raise AttributeError("NetworkSnapshot 為不可變物件")
+
+    def __repr__(self) -> str:
+        return f"NetworkSnapshot(sequence={self.sequence}, sources={list(self.values)})"
+
+    @property
+    def ready(self) -> bool:
+        """是否已有任何成功抓取的資料"""
+        return bool(self.values)
+
+    @property
+    def tick(self) -> Mapping[str, Any]:
+        return self.values.get("tick", _EMPTY)
+
+    @property
+    def stats(self) -> Mapping[str, Any]:
+        return self.values.get("stats", _EMPTY)
+
+    @property
+    def status(self) -> Mapping[str, Any]:
+        return self.values.get("status", _EMPTY)
+
+    def get(self, source: str, default: Any = None) -> Any:
+        """取得資料來源的值（字典為唯讀檢視）"""
+        return self.values.get(source, default)
+
+    def as_dict(self, source: str) -> Dict[str, Any]:
+        """取得資料來源的可修改副本（例如用於組合 JSON 回應）"""
+        value = self.values.get(source)
+        return dict(value) if isinstance(value, Mapping) else {}
+
+    def age(self, source: str, now: Optional[float] = None) -> Optional[float]:
+        """資料來源距離最後成功抓取的秒數（從未成功時為 None）"""
+        fetched = self.fetched_at.get(source)
+        if fetched is None:
+            return None
+        return max(0.0, (now if now is not None else time.time()) - fetched)
+
+    def is_stale(self, source: str, max_age: float, now: Optional[float] = None) -> bool:
+        """資料是否超過 max_age 秒未更新"""
+        age = self.age(source, now)
+        return age is None or age > max_age
+
+    def staleness(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        各資料來源的新鮮度資訊（附加在 API 回應中）
+
+        Returns:
+            {來源: {"fetched_at", "age_s", "latency_ms", "error"}}
+        """
+        now = now if now is not None else time.time()
+        sources = set(self.fetched_at) | set(self.errors)
+        return {
+            source: {
+                "fetched_at": self.fetched_at.get(source),
+                "age_s": round(self.age(source, now), 3) if source in self.fetched_at else None,
+                "latency_ms": self.latency_ms.get(source),
+                "error": self.errors.get(source)
+            }
+            for source in sorted(sources)
+        }
+
+
+class NetworkPoller:
+    """Qubic 網路背景輪詢器"""
+
+    def __init__(self, fetchers: Dict[str, Callable[[], Any]], intervals: Dict[str, float],
+                 name: str = "qubic-network-poller", fetch_timeout: Optional[float] = 15.0):
+        """
+        初始化輪詢器
+
+        Args:
+            fetchers: {資料來源: 抓取函式}，抓取函式失敗時應拋出例外
+            intervals: {資料來源: 更新間隔秒數}
+            name: 背景執行緒名稱
+            fetch_timeout: 每輪等待所有呼叫完成的最長秒數
+        """
+        self.fetchers = dict(fetchers)
+        self.intervals = {source: float(intervals.get(source, 5)) for source in self.fetchers}
+        self.name = name
+        self.fetch_timeout = fetch_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.fetchers)),
+                                            thread_name_prefix=f"{name}-fetch")
+        self._snapshot = NetworkSnapshot()
+        self._next_due = {source: 0.0 for source in self.fetchers}
+        self._listeners: List[Callable[[NetworkSnapshot, set], None]] = []
+        self._publish_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> NetworkSnapshot:
+        """最新發布的快照（讀取不需鎖定）"""
+        return self._snapshot
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, listener: Callable[[NetworkSnapshot, set], None]):
+        """
+        註冊快照更新通知（在輪詢執行緒中呼叫）
+
+        Args:
+            listener: 接收 (新快照, 本輪成功更新的資料來源集合) 的函式
+        """
+        self._listeners.append(listener)
+
+    def start(self, wait: float = 0.0) -> "NetworkPoller":
+        """
+        啟動背景輪詢
+
+        Args:
+            wait: 等待第一份快照的最長秒數（0 表示不等待）
+        """
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.info(f"🔄 網路輪詢器已啟動: {self.intervals}")
+        if wait > 0:
+            self._ready.wait(wait)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """停止背景輪詢"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待第一輪輪詢完成"""
+        return self._ready.wait(timeout)
+
+    def refresh(self, sources: Optional[List[str]] = None) -> NetworkSnapshot:
+        """
+        立即並行抓取指定資料來源並發布新快照（耗時取決於最慢的單一呼叫）
+
+        Args:
+            sources: 資料來源列表（預設為全部）
+
+        Returns:
+            新發布的快照
+        """
+        sources = list(sources or self.fetchers)
+        start = time.perf_counter()
+        results, errors, latency_ms = fetch_concurrently(
+            {source: self.fetchers[source] for source in sources}, self._executor, self.fetch_timeout
+        )
+        refresh_ms = round((time.perf_counter() - start) * 1000, 2)
+        for source, error in errors.items():
+            logger.warning(f"⚠️ 輪詢 {source} 失敗: {error}")
+        return self._publish(sources, results, errors, latency_ms, refresh_ms)
+
+    def _publish(self, sources: List[str], results: Dict[str, Any], errors: Dict[str, str],
+                 latency_ms: Dict[str, float], refresh_ms: float) -> NetworkSnapshot:
+        with self._publish_lock:
+            now = time.time()
+            previous = self._snapshot
+            values = dict(previous.values)
+            fetched_at = dict(previous.fetched_at)
+            all_errors = dict(previous.errors)
+            all_latency = dict(previous.latency_ms)
+            all_latency.update(latency_ms)
+            for source in sources:
+                if source in results:
+                    values[source] = results[source]
+                    fetched_at[source] = now
+                    all_errors.pop(source, None)
+                elif source in errors:
+                    all_errors[source] = errors[source]
+            snapshot = NetworkSnapshot(values, fetched_at, all_errors, all_latency, refresh_ms,
+                                       previous.sequence + 1, now)
+            self._snapshot = snapshot
+
+        self._ready.set()
+        updated = set(results)
+        for listener in self._listeners:
+            try:
+                listener(snapshot, updated)
+            except Exception as e:
+                logger.error(f"❌ 快照通知處理失敗: {e}")
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            due = [source for source, at in self._next_due.items() if at <= now]
+            if due:
+                self.refresh(due)
+                finished = time.monotonic()
+                for source in due:
+                    self._next_due[source] = finished + self.intervals[source]
+            delay = max(0.0, min(self._next_due.values()) - time.monotonic())
+            self._stop.wait(delay)
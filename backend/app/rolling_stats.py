@@ -0,0 +1,346 @@
+"""
+Qubic tick 串流統計
+以 O(1) 更新維護 tick 持續時間的 EWMA、多個時間視窗的平均值/變異數/tick 速率，
+以及 P² 串流分位數（p50/p95/p99），所有健康狀態判斷共用同一組門檻
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 預設統計視窗（名稱: 秒）
+DEFAULT_WINDOWS = {"1m": 60, "5m": 300, "1h": 3600}
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+DEFAULT_EWMA_ALPHA = 0.2
+
+# tick 持續時間（秒）分級門檻，由快到慢
+DURATION_LEVELS = (
+    (0.2, "極快"),
+    (0.8, "很快"),
+    (1.2, "快速"),
+    (2.0, "正常"),
+    (3.0, "稍慢"),
+)
+# 總體狀況門檻（秒）
+OVERALL_LEVELS = (
+    (2.0, "健康"),
+    (3.0, "一般"),
+)
+# 超過此秒數且不少於 STALL_FACTOR 倍平均持續時間沒有新 tick 時視為停滯
+STALL_MIN_SECONDS = 15.0
+STALL_FACTOR = 5.0
+
+
+class P2Quantile:
+    """P² 串流分位數估計（Jain & Chlamtac），固定 5 個標記，O(1) 更新"""
+
+    __slots__ = ("p", "count", "_q", "_n", "_np", "_dn")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._q: List[float] = []
+        self._n = [0, 1, 2, 3, 4]
+        self._np = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._dn = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        self.count += 1
+        q = self._q
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self._n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+
+        for i in (1, 2, 3):
+            d = self._np[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                # 拋物線插值，超出相鄰標記時改用線性插值
+                candidate = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = candidate
+                n[i] += step
+
+    def value(self) -> Optional[float]:
+        """目前的分位數估計（樣本不足 5 個時取已排序樣本的最近秩）"""
+        if not self._q:
+            return None
+        if self.count < 5:
+            return self._q[min(len(self._q) - 1, int(round(self.p * (len(self._q) - 1))))]
+        return self._q[2]
+
+
+class RollingWindow:
+    """
+    時間視窗統計
+
+    平均值、變異數與 tick 速率以累計和隨樣本進出視窗 O(1)（攤銷）更新；
+    分位數使用 P² 估計器，每經過一個視窗長度輪替一次，回報樣本較多的那一組
+    """
+
+    def __init__(self, seconds: float, quantiles: Tuple[float, ...] = DEFAULT_QUANTILES):
+        self.seconds = seconds
+        self.quantiles = quantiles
+        self._samples: deque = deque()   # (時間戳, tick, 持續時間毫秒)
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._sketch = self._new_sketch()
+        self._previous_sketch: Optional[Dict[float, P2Quantile]] = None
+        self._sketch_started: Optional[float] = None
+
+    def _new_sketch(self) -> Dict[float, P2Quantile]:
+        return {p: P2Quantile(p) for p in self.quantiles}
+
+    def add(self, timestamp: float, tick: int, duration_ms: float):
+        self._samples.append((timestamp, tick, duration_ms))
+        self._sum += duration_ms
+        self._sumsq += duration_ms * duration_ms
+
+        if self._sketch_started is None:
+            self._sketch_started = timestamp
+        elif timestamp - self._sketch_started >= self.seconds:
+            self._previous_sketch = self._sketch
+            self._sketch = self._new_sketch()
+            self._sketch_started = timestamp
+        for estimator in self._sketch.values():
+            estimator.add(duration_ms)
+        self.expire(timestamp)
+
+    def expire(self, now: float):
+        """移除超出視窗的樣本"""
+        samples = self._samples
+        while samples and now - samples[0][0] > self.seconds:
+            _, _, old = samples.popleft()
+            self._sum -= old
+            self._sumsq -= old * old
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self._samples)
+        if count == 0:
+            return {"count": 0}
+        mean = self._sum / count
+        variance = max(0.0, self._sumsq / count - mean * mean)
+        first_ts, first_tick, _ = self._samples[0]
+        last_ts, last_tick, _ = self._samples[-1]
+        span = last_ts - first_ts
+
+        sketch = self._sketch
+        previous = self._previous_sketch
+        if previous is not None and next(iter(previous.values())).count > next(iter(sketch.values())).count:
+            sketch = previous
+        result = {
+            "count": count,
+            "mean_ms": round(mean, 2),
+            "std_ms": round(math.sqrt(variance), 2),
+            "tick_rate": round((last_tick - first_tick) / span, 4) if span > 0 else None
+        }
+        for p, estimator in sketch.items():
+            value = estimator.value()
+            result[f"p{int(round(p * 100))}_ms"] = round(value, 2) if value is not None else None
+        return result
+
+
+class TickStatsEngine:
+    """tick 持續時間與健康狀態的串流統計（執行緒安全）"""
+
+    def __init__(self, windows: Optional[Dict[str, float]] = None, alpha: float = DEFAULT_EWMA_ALPHA):
+        """
+        初始化統計
+
+        Args:
+            windows: {名稱: 視窗秒數}
+            alpha: EWMA 平滑係數
+        """
+        self.alpha = alpha
+        self.windows = {name: RollingWindow(seconds) for name, seconds in (windows or DEFAULT_WINDOWS).items()}
+        self.ewma_ms: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_tick: Optional[int] = None
+        self.last_seen: Optional[float] = None
+        self.last_advance: Optional[float] = None
+        self.regressed = False
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, timestamp: float, tick: int, reported_ms: Optional[float] = None) -> Optional[float]:
+        """
+        記錄一次 tick 觀察
+
+        tick 前進時優先記錄上游回報的持續時間（網路本身量測的值）；上游沒有提供
+        （缺少或為 0）時才退而以「兩次觀察的經過時間 / 前進的 tick 數」估計
+
+        Args:
+            timestamp: 觀察時間（Unix 秒）
+            tick: 觀察到的 tick
+            reported_ms: 上游提供的持續時間（毫秒，可省略）
+
+        Returns:
+            本次記錄的每 tick 持續時間（毫秒），未記錄樣本時為 None
+        """
+        with self._lock:
+            previous_tick = self.last_tick
+            previous_advance = self.last_advance
+            self.last_seen = timestamp
+            if tick <= 0:
+                return None
+            if previous_tick is not None and tick < previous_tick:
+                self.regressed = True
+                self.last_tick = tick
+                self.last_advance = timestamp
+                return None
+            self.regressed = False
+            if previous_tick is not None and tick == previous_tick:
+                for window in self.windows.values():
+                    window.expire(timestamp)
+                return None
+
+            duration_ms = reported_ms if reported_ms else None
+            if duration_ms is None and previous_tick is not None and previous_advance is not None \
+                    and timestamp > previous_advance:
+                # 輪詢間隔估計只作為上游沒有持續時間時的備用
+                duration_ms = (timestamp - previous_advance) * 1000 / (tick - previous_tick)
+            self.last_tick = tick
+            self.last_advance = timestamp
+            if duration_ms is None:
+                return None
+
+            duration_ms = float(duration_ms)
+            self.ewma_ms = duration_ms if self.ewma_ms is None else \
+                self.alpha * duration_ms + (1 - self.alpha) * self.ewma_ms
+            self.last_duration_ms = duration_ms
+            self.samples += 1
+            for window in self.windows.values():
+                window.add(timestamp, tick, duration_ms)
+            return duration_ms
+
+    @property
+    def horizon(self) -> float:
+        """最長統計視窗的秒數（預熱時需要的歷史長度）"""
+        return max(window.seconds for window in self.windows.values())
+
+    def warm(self, columns: Dict[str, np.ndarray]) -> int:
+        """
+        以歷史紀錄（timestamp_ms、tick、duration_ms 欄位）預熱統計
+
+        Args:
+            columns: 依時間排序的歷史欄位
+
+        Returns:
+            記錄的樣本數
+        """
+        if "tick" not in columns or "timestamp_ms" not in columns:
+            return 0
+        durations = columns.get("duration_ms")
+        recorded = 0
+        for i in range(len(columns["tick"])):
+            reported = float(durations[i]) if durations is not None else None
+            if self.observe(columns["timestamp_ms"][i] / 1000, int(columns["tick"][i]), reported) is not None:
+                recorded += 1
+        return recorded
+
+    def duration_s(self) -> Optional[float]:
+        """平滑後的每 tick 持續時間（秒）：最短視窗的中位數，樣本不足時使用 EWMA"""
+        with self._lock:
+            window = next(iter(self.windows.values()))
+            summary = window.summary()
+            if summary.get("count", 0) >= 5 and summary.get("p50_ms") is not None:
+                return summary["p50_ms"] / 1000
+            return self.ewma_ms / 1000 if self.ewma_ms is not None else None
+
+    def is_stalled(self, now: Optional[float] = None) -> bool:
+        """是否已超過停滯門檻沒有新 tick"""
+        if self.last_advance is None:
+            return False
+        now = now if now is not None else time.time()
+        typical = (self.ewma_ms or 1000) / 1000
+        return now - self.last_advance > max(STALL_MIN_SECONDS, STALL_FACTOR * typical)
+
+    def health(self, tick: Optional[int] = None, duration_s: Optional[float] = None,
+               now: Optional[float] = None) -> Dict[str, str]:
+        """
+        由串流統計判斷網路健康狀況
+
+        Args:
+            tick: 目前 tick（預設為最近觀察到的 tick）
+            duration_s: 沒有統計樣本時使用的持續時間（秒）
+            now: 判斷時間（預設為目前時間）
+
+        Returns:
+            包含 overall、tick_status、epoch_status、duration_status 的字典
+        """
+        tick = tick if tick is not None else (self.last_tick or 0)
+        smoothed = self.duration_s()
+        if smoothed is None:
+            smoothed = duration_s
+
+        if smoothed is None:
+            duration_status = "無數據"
+        else:
+            duration_status = "異常"
+            for limit, label in DURATION_LEVELS:
+                if smoothed <= limit:
+                    duration_status = label
+                    break
+
+        if tick <= 0:
+            overall, tick_status = "異常", "異常"
+        elif self.regressed:
+            overall, tick_status = "異常", "倒退"
+        elif self.is_stalled(now):
+            overall, tick_status = "停滯", "停滯"
+        else:
+            tick_status = "正常"
+            overall = "緩慢"
+            if smoothed is None:
+                overall = "健康"
+            else:
+                for limit, label in OVERALL_LEVELS:
+                    if smoothed <= limit:
+                        overall = label
+                        break
+        return {
+            "overall": overall,
+            "tick_status": tick_status,
+            "epoch_status": "正常",
+            "duration_status": duration_status
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        統計摘要（附加在 /api/tick 回應中）
+
+        Returns:
+            EWMA、最近一次持續時間與各視窗的平均值、標準差、分位數與 tick 速率
+        """
+        with self._lock:
+            return {
+                "samples": self.samples,
+                "ewma_ms": round(self.ewma_ms, 2) if self.ewma_ms is not None else None,
+                "last_ms": round(self.last_duration_ms, 2) if self.last_duration_ms is not None else None,
+                "windows": {name: window.summary() for name, window in self.windows.items()}
+            }
@@ -2,15 +2,21 @@
 QDashboard API 路由
 """
 
-from flask import Blueprint, jsonify, render_template
-from .qubic_client import QubicNetworkClient
+from flask import Blueprint, jsonify, render_template, request
+from .data_provider import get_data_provider
+from .tick_history import history_query_args
+from .history_store import query_history
+from .event_stream import stream_response
+from .ws_gateway import get_ws_gateway
+from .asgi import get_asgi_bridge
+from .conditional import cached_json
 import time
 
 # 建立藍圖
 api_bp = Blueprint('api', __name__)
 
-# 初始化 Qubic 客戶端
-qubic_client = QubicNetworkClient()
+# 共用的資料提供者（由 create_app 啟動背景輪詢，路由只讀取快照）
+qubic_client = get_data_provider()
 
 @api_bp.route('/tick', methods=['GET'])
 def get_tick():
@@ -21,17 +27,10 @@ def get_tick():
         JSON: 包含 tick, epoch, duration, initialTick 和時間戳的資料
     """
     try:
-        # 獲取 tick 資訊
-        tick_info = qubic_client.get_tick_info()
-        
-        # 添加時間戳和網路健康狀況
-        response_data = {
-            **tick_info,
-            "timestamp": int(time.time()),
-            "health": qubic_client.get_network_health()
-        }
-        
-        return jsonify(response_data)
+        # 版本由 tick 編號與資料狀態決定，同一版本只建立並序列化一次
+        etag, build = qubic_client.tick_version()
+        return cached_json(qubic_client.responses, "tick", etag, build,
+                           max_age=qubic_client.poll_interval("tick"))
     
     except Exception as e:
         return jsonify({
@@ -58,10 +57,10 @@ def get_stats():
         JSON: 包含活躍地址數、市值等統計資訊
     """
     try:
-        stats = qubic_client.get_network_stats()
-        stats["timestamp"] = int(time.time())
-        
-        return jsonify(stats)
+        # 版本由上游統計時間戳（沒有時為抓取時間）決定
+        etag, build = qubic_client.stats_version()
+        return cached_json(qubic_client.responses, "stats", etag, build,
+                           max_age=qubic_client.poll_interval("stats"))
     
     except Exception as e:
         return jsonify({
@@ -75,6 +74,93 @@ def get_stats():
             "timestamp": int(time.time())
         }), 500
 
+@api_bp.route('/history', methods=['GET'])
+def get_history():
+    """
+    獲取 tick 歷史的 API 端點
+    
+    Query 參數: start/end（毫秒時間戳）、epoch、limit、max_points、fields（逗號分隔）
+    記憶體緩衝區涵蓋請求範圍時直接讀取，否則讀取磁碟上的歷史儲存檔
+    
+    Returns:
+        JSON: 依時間排序的欄位陣列
+    """
+    try:
+        query = history_query_args(request.args)
+    except ValueError:
+        return jsonify({"error": "start、end、epoch、limit、max_points 必須為整數"}), 400
+    
+    return jsonify(query_history(qubic_client.history, qubic_client.history_store, **query))
+
+@api_bp.route('/anomalies', methods=['GET'])
+def get_anomalies():
+    """
+    獲取最近異常事件的 API 端點
+    
+    Query 參數: limit（預設 50）、since（只回傳 id 大於此值的事件）
+    
+    Returns:
+        JSON: 異常事件（由舊到新）與各指標目前的基準
+    """
+    try:
+        return jsonify(anomalies_payload(request.args))
+    except ValueError:
+        return jsonify({"error": "limit、since 必須為整數"}), 400
+
+def anomalies_payload(args) -> dict:
+    """
+    /api/anomalies 的回應內容（WSGI 路由與 ASGI 原生處理共用）
+    
+    Args:
+        args: 查詢參數（limit、since）
+    
+    Raises:
+        ValueError: 參數不是整數
+    """
+    limit = int(args.get('limit', 50))
+    since = args.get('since')
+    since = int(since) if since not in (None, "") else None
+    return {
+        "anomalies": qubic_client.anomalies.recent(limit, since),
+        "baselines": qubic_client.anomalies.baselines(),
+        "timestamp": int(time.time())
+    }
+
+@api_bp.route('/forecast', methods=['GET'])
+def get_forecast():
+    """
+    獲取 epoch 進度與 tick 持續時間預測的 API 端點
+
+    Returns:
+        JSON: 預估 epoch 結束時間、剩餘 tick 數與近期持續時間（含 95% 信賴區間）
+    """
+    try:
+        return jsonify(forecast_payload())
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "message": "無法計算 epoch 預測"
+        }), 500
+
+def forecast_payload() -> dict:
+    """/api/forecast 的回應內容（WSGI 路由與 ASGI 原生處理共用）"""
+    forecast = dict(qubic_client.get_epoch_forecast())
+    forecast["timestamp"] = int(time.time())
+    return forecast
+
+@api_bp.route('/stream', methods=['GET'])
+def get_stream():
+    """
+    tick、統計與健康狀況的 Server-Sent Events 串流
+    
+    連線時先送出完整狀態（snapshot 事件），之後只推送變動的欄位（tick、stats、health 事件）；
+    斷線重連時依 Last-Event-ID 重播遺漏的事件
+    
+    Returns:
+        text/event-stream 回應
+    """
+    return stream_response(qubic_client.events, request)
+
 @api_bp.route('/status', methods=['GET'])
 def get_status():
     """
@@ -84,16 +170,7 @@ def get_status():
         JSON: API 狀態資訊
     """
     try:
-        # 測試 Qubic 連接
-        tick_info = qubic_client.get_tick_info()
-        
-        return jsonify({
-            "status": "online",
-            "message": "QDashboard API 運行正常",
-            "qubic_connected": "error" not in tick_info,
-            "timestamp": int(time.time()),
-            "version": "0.1.0"
-        })
+        return jsonify(status_payload())
     
     except Exception as e:
         return jsonify({
@@ -103,3 +180,23 @@ def get_status():
             "timestamp": int(time.time()),
             "version": "0.1.0"
         }), 500
+
+def status_payload() -> dict:
+    """/api/status 的回應內容（WSGI 路由與 ASGI 原生處理共用）"""
+    # 由最新快照與斷路器判斷 Qubic 連接狀態
+    snapshot = qubic_client.snapshot
+    return {
+        "status": "online",
+        "message": "QDashboard API 運行正常",
+        "qubic_connected": qubic_client.upstream_connected,
+        "circuit_breaker": qubic_client.breaker.metrics(),
+        "poller_running": qubic_client.polling,
+        "data_provider": qubic_client.metrics(),
+        "stream": qubic_client.events.metrics(),
+        "response_cache": qubic_client.responses.metrics(),
+        "websocket": get_ws_gateway().metrics() if get_ws_gateway() else {"enabled": False},
+        "asgi": get_asgi_bridge().metrics() if get_asgi_bridge() else {"enabled": False},
+        "sources": snapshot.staleness(),
+        "timestamp": int(time.time()),
+        "version": "0.1.0"
+    }
@@ -0,0 +1,240 @@
+"""
+多端點 RPC 呼叫
+追蹤每個 RPC 端點的延遲（EWMA 與近期百分位數）與健康狀態，依此排序端點：
+- 先呼叫最佳端點；超過其近期 p95 延遲仍未回應時，對次佳端點送出一個對沖（hedged）請求，
+  採用先回應的結果，單一緩慢節點不再決定尾端延遲；只設定一個端點時不對沖（重送到同一節點只會加重其負載）
+- 對沖與容錯多送出的請求可由呼叫端計入自己的速率配額（on_launch）
+- 端點失敗時立即改用下一個端點；連續失敗的端點暫時排到最後
+- 落後請求完成時仍記錄延遲，緩慢的端點會自然排到後面
+
+端點由 QDASHBOARD_RPC_URLS 設定（以逗號分隔，預設為官方 RPC）
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RPC_URLS = [url.strip() for url in os.environ.get("QDASHBOARD_RPC_URLS", "https://rpc.qubic.org/v1").split(",")
+                    if url.strip()]
+EWMA_ALPHA = 0.2
+LATENCY_SAMPLES = 256
+# 樣本數不足時的對沖等待時間，以及對沖等待時間的上下限（秒）
+DEFAULT_HEDGE_DELAY_S = 1.0
+MIN_HEDGE_DELAY_S = 0.05
+MIN_SAMPLES = 10
+HEDGE_PERCENTILE = 95
+# 連續失敗幾次後暫時排到最後，以及排到最後的時間（秒）
+UNHEALTHY_AFTER_FAILURES = 3
+UNHEALTHY_COOLDOWN_S = 30.0
+
+
+def percentile(samples: Sequence[float], q: float) -> Optional[float]:
+    """
+    計算百分位數（最近排名法）
+
+    Args:
+        samples: 樣本
+        q: 百分位數（0–100）
+
+    Returns:
+        百分位數值（沒有樣本時為 None）
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RPCEndpoint:
+    """單一 RPC 端點的延遲與健康狀態"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma_s: Optional[float] = None
+        self.samples: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.calls = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def hedge_delay(self) -> float:
+        """對沖等待時間：近期 p95 延遲（樣本不足時為預設值）"""
+        if len(self.samples) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_S
+        return max(MIN_HEDGE_DELAY_S, percentile(self.samples, HEDGE_PERCENTILE))
+
+    def record(self, elapsed_s: float, error: Optional[str] = None):
+        """記錄一次呼叫的延遲與結果（呼叫端持有鎖）"""
+        self.calls += 1
+        if error is None:
+            self.samples.append(elapsed_s)
+            self.ewma_s = elapsed_s if self.ewma_s is None else EWMA_ALPHA * elapsed_s + (1 - EWMA_ALPHA) * self.ewma_s
+            self.consecutive_failures = 0
+            self.unhealthy_until = 0.0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.consecutive_failures >= UNHEALTHY_AFTER_FAILURES and self.healthy:
+            self.unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN_S
+            logger.warning(f"⚠️ RPC 端點 {self.url} 連續失敗 {self.consecutive_failures} 次，"
+                           f"{UNHEALTHY_COOLDOWN_S:.0f} 秒內改用其他端點")
+
+    def metrics(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ewma_ms": ms(self.ewma_s),
+            "p50_ms": ms(percentile(samples, 50)),
+            "p95_ms": ms(percentile(samples, 95)),
+            "p99_ms": ms(percentile(samples, 99)),
+            "calls": self.calls,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
+
+
+class EndpointPool:
+    """多個 RPC 端點的對沖與容錯呼叫（執行緒安全）"""
+
+    def __init__(self, urls: Optional[Sequence[str]] = None, timeout: Optional[float] = None,
+                 hedge: bool = True, max_workers: int = 8):
+        """
+        初始化端點池
+
+        Args:
+            urls: RPC 端點 URL 列表（省略時讀取 QDASHBOARD_RPC_URLS）
+            timeout: 單次 call() 等待結果的最長秒數
+            hedge: 是否送出對沖請求（只有一個端點時一律不對沖）
+            max_workers: 同時進行的上游請求數上限
+        """
+        urls = list(urls or DEFAULT_RPC_URLS)
+        if not urls:
+            raise ValueError("至少需要一個 RPC 端點")
+        self.endpoints = [RPCEndpoint(url) for url in urls]
+        self.timeout = timeout
+        self.hedge = hedge and len(self.endpoints) > 1
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rpc-pool")
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "failed": 0}
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def ranked(self) -> List[RPCEndpoint]:
+        """依健康狀態與 EWMA 延遲排序的端點（沒有延遲紀錄的端點優先嘗試）"""
+        with self._lock:
+            return sorted(self.endpoints, key=lambda e: (not e.healthy, e.ewma_s if e.ewma_s is not None else 0.0))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _run(self, endpoint: RPCEndpoint, func: Callable[[str], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = func(endpoint.url)
+        except Exception as e:
+            with self._lock:
+                endpoint.record(time.perf_counter() - start, str(e) or type(e).__name__)
+            raise
+        with self._lock:
+            endpoint.record(time.perf_counter() - start)
+        return result
+
+    def call(self, func: Callable[[str], Any], on_launch: Optional[Callable[[], None]] = None) -> Any:
+        """
+        對最佳端點發出呼叫，必要時對沖或改用其他端點
+
+        Args:
+            func: 接收端點 URL 並回傳結果的函式（失敗時拋出例外）
+            on_launch: 送出第一個之外的每個請求（對沖或容錯）前呼叫，例如取得呼叫端速率限制的配額
+
+        Returns:
+            最先成功的結果
+
+        Raises:
+            最後一個失敗端點的例外；全部逾時時為 TimeoutError
+        """
+        self._count("calls")
+        # 候選端點：依序用於對沖與容錯
+        candidates = self.ranked()
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        pending: Dict[Future, int] = {}
+        next_index = 0
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            nonlocal next_index
+            if next_index > 0 and on_launch is not None:
+                on_launch()
+            endpoint = candidates[next_index]
+            pending[self._executor.submit(self._run, endpoint, func)] = next_index
+            next_index += 1
+            return endpoint
+
+        current = launch()
+        while pending:
+            wait_s = None
+            if self.hedge and not hedged and next_index < len(candidates):
+                wait_s = current.hedge_delay()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait_s = remaining if wait_s is None else min(wait_s, remaining)
+            done, _ = wait_futures(list(pending), timeout=wait_s, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if self.hedge and not hedged and next_index < len(candidates):
+                    # 最佳端點超過 p95 仍未回應：對下一個端點送出對沖請求
+                    hedged = True
+                    self._count("hedged")
+                    launch()
+                continue
+
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    if index > 0:
+                        self._count("hedge_wins" if hedged and last_error is None else "failovers")
+                    return future.result()
+                last_error = error
+            # 有端點失敗且沒有其他進行中的請求時，立即改用下一個端點
+            if not pending and next_index < len(candidates):
+                current = launch()
+
+        self._count("failed")
+        if last_error is not None and not pending:
+            raise last_error
+        raise TimeoutError(f"RPC 端點在 {self.timeout}s 內沒有回應")
+
+    def metrics(self) -> Dict[str, Any]:
+        """對沖與容錯次數，以及各端點的延遲百分位數與健康狀態"""
+        with self._lock:
+            return {
+                "hedge": self.hedge,
+                **self.counts,
+                "endpoints": [endpoint.metrics() for endpoint in self.endpoints]
+            }
@@ -0,0 +1,193 @@
+"""
+前端靜態檔案
+啟動時將前端目錄整個載入記憶體，請求只查表、不存取檔案系統：
+- ETag 為內容雜湊，If-None-Match 相符時回覆 304
+- 文字類檔案（JS、CSS、HTML、語系 JSON 等）預先以 br/gzip 壓縮，依 Accept-Encoding 回傳
+- 支援 Range 請求（回傳未壓縮內容的部分範圍）
+- HTML 中引用的本地檔案改寫為 ?v=<內容雜湊> 網址，雜湊相符的請求以 immutable 長期快取
+
+設定 QDASHBOARD_STATIC_REVALIDATE_S 時（開發用），每個檔案最多每隔該秒數檢查一次修改時間，
+有變動才重新載入；預設 0 表示不檢查（部署後前端檔案不會改變）
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from flask import Response, request
+from werkzeug.security import safe_join
+
+from .compression import ENCODINGS, compress, encoded_response, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".json", ".svg", ".txt", ".map", ".webmanifest"}
+DEFAULT_REVALIDATE_S = float(os.environ.get("QDASHBOARD_STATIC_REVALIDATE_S", "0"))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# HTML 中的本地檔案引用（src/href，保留原本的相對或絕對寫法，去除既有的查詢字串）
+_REFERENCE = re.compile(r'(?P<attr>\b(?:src|href)=")(?P<path>[^"#?:]+)(?:\?[^"#]*)?"')
+
+
+class StaticAsset:
+    """記憶體中的單一前端檔案"""
+
+    def __init__(self, name: str, path: str, data: bytes, stat: os.stat_result):
+        self.name = name
+        self.path = path
+        self.source = data
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.checked_at = time.monotonic()
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+        self.is_html = self.mimetype == "text/html"
+        self.set_data(data)
+
+    def set_data(self, data: bytes):
+        """設定回應內容（HTML 改寫引用後也經由此處），重新計算雜湊與壓縮內容"""
+        self.data = data
+        self.hash = hashlib.sha256(data).hexdigest()[:16]
+        self.variants: Dict[str, bytes] = {}
+        if self.compressible:
+            self.variants = {encoding: compress(data, encoding, static=True) for encoding in ENCODINGS}
+
+
+class StaticAssets:
+    """前端目錄的記憶體檔案服務"""
+
+    def __init__(self, root: str, revalidate_s: float = DEFAULT_REVALIDATE_S):
+        """
+        初始化靜態檔案服務
+
+        Args:
+            root: 前端目錄
+            revalidate_s: 檢查檔案修改時間的間隔秒數（0 表示不檢查）
+        """
+        self.root = os.path.abspath(root)
+        self.revalidate_s = revalidate_s
+        self._assets: Dict[str, StaticAsset] = {}
+        self._preloaded = False
+        self._lock = threading.Lock()
+
+    def preload(self) -> int:
+        """
+        載入前端目錄中的所有檔案
+
+        Returns:
+            載入的檔案數
+        """
+        with self._lock:
+            for directory, _, files in os.walk(self.root):
+                for filename in files:
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    self._load(name, path)
+            self._render_html()
+            self._preloaded = True
+        original = sum(asset.size for asset in self._assets.values())
+        compressed = sum(len(asset.variants.get(ENCODINGS[0], asset.data)) for asset in self._assets.values())
+        logger.info(f"🗜️ 已載入 {len(self._assets)} 個前端檔案"
+                    f"（{original // 1024} KB，{ENCODINGS[0]} 壓縮後 {compressed // 1024} KB）")
+        return len(self._assets)
+
+    def _load(self, name: str, path: str) -> StaticAsset:
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            asset = StaticAsset(name, path, f.read(), stat)
+        self._assets[name] = asset
+        return asset
+
+    def _render_html(self):
+        """將 HTML 中的本地檔案引用改寫為含內容雜湊的網址"""
+        for asset in self._assets.values():
+            if not asset.is_html:
+                continue
+            directory = posixpath.dirname(asset.name)
+            html = asset.source.decode("utf-8")
+
+            def versioned(match):
+                path = match.group("path")
+                target = path.lstrip("/") if path.startswith("/") else posixpath.normpath(posixpath.join(directory, path))
+                referenced = self._assets.get(target)
+                if referenced is None or referenced.is_html:
+                    return match.group(0)
+                return f'{match.group("attr")}{path}?v={referenced.hash}"'
+
+            asset.set_data(_REFERENCE.sub(versioned, html).encode("utf-8"))
+
+    def _lookup(self, name: str) -> Optional[StaticAsset]:
+        asset = self._assets.get(name)
+        if not self.revalidate_s:
+            if asset is not None or self._preloaded:
+                return asset
+        elif asset is not None and time.monotonic() - asset.checked_at < self.revalidate_s:
+            return asset
+
+        # 未預先載入、檢查間隔已到或是新檔案時才存取檔案系統
+        path = safe_join(self.root, name)
+        with self._lock:
+            if path is None or not os.path.isfile(path):
+                self._assets.pop(name, None)
+                return None
+            stat = os.stat(path)
+            if asset is not None and (asset.mtime, asset.size) == (stat.st_mtime, stat.st_size):
+                asset.checked_at = time.monotonic()
+                return asset
+            asset = self._load(name, path)
+            logger.info(f"🔄 前端檔案已更新: {name}")
+            self._render_html()
+        return self._assets.get(name)
+
+    def asset_url(self, name: str) -> str:
+        """
+        含內容雜湊的檔案網址（可長期快取）
+
+        Args:
+            name: 相對於前端目錄的路徑
+
+        Returns:
+            例如 /js/dashboard.js?v=1a2b3c4d5e6f7a8b（檔案不存在時不加雜湊）
+        """
+        asset = self._lookup(name)
+        return f"/{name}?v={asset.hash}" if asset is not None else f"/{name}"
+
+    def send(self, filename: str) -> Optional[Response]:
+        """
+        回傳前端檔案
+
+        Args:
+            filename: 相對於前端目錄的路徑（以 / 結尾時回傳該目錄的 index.html）
+
+        Returns:
+            回應（檔案不存在或路徑超出前端目錄時為 None）
+        """
+        name = posixpath.normpath(filename.lstrip("/") + ("index.html" if filename.endswith("/") or not filename else ""))
+        if name.startswith(".."):
+            return None
+        asset = self._lookup(name)
+        if asset is None:
+            return None
+
+        # Range 請求回傳未壓縮內容的部分範圍
+        encoding = None
+        if asset.variants and "Range" not in request.headers:
+            encoding = negotiate_encoding(len(asset.data))
+        response = Response(asset.variants[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+        response.last_modified = asset.mtime
+        response.set_etag(asset.hash)
+        if request.args.get("v") == asset.hash:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        if asset.variants:
+            response = encoded_response(response, encoding)
+        return response.make_conditional(request, accept_ranges=encoding is None,
+                                         complete_length=len(asset.data) if encoding is None else None)
@@ -0,0 +1,277 @@
+"""
+Qubic tick 歷史環形緩衝區
+以固定容量的 NumPy 欄位陣列記錄每個觀察到的 tick 與當時的網路統計，
+附加為 O(1)，範圍查詢以時間戳二分搜尋後用最多兩段切片取出
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 欄位名稱與資料型別（時間戳單調遞增，作為範圍查詢的索引）
+HISTORY_FIELDS = (
+    ("timestamp_ms", np.int64),
+    ("tick", np.int64),
+    ("duration_ms", np.float32),
+    ("epoch", np.int32),
+    ("tick_quality", np.float32),
+    ("active_addresses", np.int64),
+    ("price", np.float64),
+)
+
+# 預設容量：每 3 秒一筆約可保存 4.5 天，約 5 MB
+DEFAULT_HISTORY_CAPACITY = 1 << 17
+
+
+class TickHistory:
+    """固定容量的 tick 歷史環形緩衝區（執行緒安全）"""
+
+    def __init__(self, capacity: int = DEFAULT_HISTORY_CAPACITY):
+        """
+        配置欄位陣列
+
+        Args:
+            capacity: 最多保存的紀錄數，超過時覆寫最舊的紀錄
+        """
+        if capacity <= 0:
+            raise ValueError("capacity 必須大於 0")
+        self.capacity = capacity
+        self.fields = tuple(name for name, _ in HISTORY_FIELDS)
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in HISTORY_FIELDS}
+        self._head = 0    # 下一筆寫入位置
+        self._size = 0
+        # 批次寫入（extend、merge）的次數：可能在既有紀錄之前插入紀錄，依賴歷史開頭的快取以此判斷是否失效
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """緩衝區佔用的記憶體位元組數"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    @property
+    def last_tick(self) -> Optional[int]:
+        """最近一筆紀錄的 tick（無紀錄時為 None）"""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return int(self._columns["tick"][self._head - 1])
+
+    def append(self, record: Dict[str, Any]) -> bool:
+        """
+        附加一筆紀錄（O(1)）
+
+        Args:
+            record: 欄位值字典，缺少的欄位記為 0；timestamp_ms 省略時使用目前時間
+
+        Returns:
+            是否已寫入（與最近一筆相同 tick 的重複觀察會略過）
+        """
+        with self._lock:
+            last = self._head - 1
+            tick = int(record.get("tick", 0))
+            if self._size and int(self._columns["tick"][last]) == tick:
+                return False
+
+            timestamp_ms = record.get("timestamp_ms")
+            timestamp_ms = int(timestamp_ms) if timestamp_ms is not None else int(time.time() * 1000)
+            if self._size:
+                # 維持時間戳單調遞增，範圍查詢才能使用二分搜尋
+                timestamp_ms = max(timestamp_ms, int(self._columns["timestamp_ms"][last]))
+
+            head = self._head
+            for name, column in self._columns.items():
+                value = timestamp_ms if name == "timestamp_ms" else (record.get(name) or 0)
+                # RPC 統計值可能是字串
+                column[head] = value if isinstance(value, (int, float)) else float(value)
+            self._head = (head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            return True
+
+    def extend(self, columns: Dict[str, np.ndarray]) -> int:
+        """
+        批次附加依時間排序的紀錄（例如由儲存檔載入），以向量化方式寫入
+
+        Args:
+            columns: {欄位: 陣列}，須包含 timestamp_ms 與 tick
+
+        Returns:
+            寫入的紀錄數
+        """
+        if "tick" not in columns or "timestamp_ms" not in columns:
+            return 0
+        with self._lock:
+            self.revision += 1
+            return self._extend(columns)
+
+    def merge(self, columns: Dict[str, np.ndarray]) -> int:
+        """
+        依時間戳合併不一定比既有紀錄新的紀錄（例如回補的歷史）
+
+        讀取既有紀錄、合併與重寫都在鎖內完成，合併期間並行的 append() 會等待而不會遺失；
+        超過容量時保留最新的紀錄
+
+        Args:
+            columns: {欄位: 陣列}，須包含 timestamp_ms 與 tick，缺少的欄位記為 0
+
+        Returns:
+            新增的紀錄數（已存在的 tick 會略過）
+        """
+        if "tick" not in columns or "timestamp_ms" not in columns:
+            return 0
+        count = len(columns["tick"])
+        incoming = {name: np.asarray(columns[name], dtype=column.dtype) if name in columns
+                    else np.zeros(count, dtype=column.dtype) for name, column in self._columns.items()}
+        with self._lock:
+            existing = {name: self._take(name, 0, self._size) for name in self.fields}
+            keep = ~np.isin(incoming["tick"], existing["tick"])
+            if not keep.any():
+                return 0
+            self.revision += 1
+            merged = {name: np.concatenate((existing[name], incoming[name][keep])) for name in self.fields}
+            order = np.argsort(merged["timestamp_ms"], kind="stable")
+            size = self._size
+            self._head = 0
+            self._size = 0
+            self._extend({name: values[order] for name, values in merged.items()})
+            return max(0, self._size - size)
+
+    def _extend(self, columns: Dict[str, np.ndarray]) -> int:
+        """批次附加紀錄（呼叫端持有鎖）"""
+        count = len(columns["tick"])
+        begin = max(0, count - self.capacity)
+        if self._size and count > begin and \
+                int(columns["tick"][begin]) == int(self._columns["tick"][self._head - 1]):
+            begin += 1
+        n = count - begin
+        if n <= 0:
+            return 0
+
+        first = self._head
+        split = min(n, self.capacity - first)
+        for name, column in self._columns.items():
+            values = columns[name][begin:] if name in columns else np.zeros(n, dtype=column.dtype)
+            if name == "timestamp_ms" and self._size:
+                values = np.maximum(values, column[self._head - 1])
+            column[first:first + split] = values[:split]
+            column[:n - split] = values[split:]
+        self._head = (first + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+        return n
+
+    def oldest_timestamp(self) -> Optional[int]:
+        """最舊一筆紀錄的時間戳（無紀錄時為 None）"""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return int(self._columns["timestamp_ms"][(self._head - self._size) % self.capacity])
+
+    def _segments(self) -> List[slice]:
+        """依時間順序排列的實體切片（未繞回時一段，繞回後兩段）"""
+        if self._size < self.capacity:
+            return [slice(0, self._size)]
+        return [slice(self._head, self.capacity), slice(0, self._head)]
+
+    def _locate(self, timestamp_ms: int, side: str) -> int:
+        """時間戳在時間順序中的位置（各段皆已排序且前段整體早於後段）"""
+        column = self._columns["timestamp_ms"]
+        return sum(int(np.searchsorted(column[s], timestamp_ms, side=side)) for s in self._segments())
+
+    def _take(self, name: str, lo: int, hi: int) -> np.ndarray:
+        """取出時間順序 [lo, hi) 的欄位值"""
+        column = self._columns[name]
+        start = (self._head - self._size + lo) % self.capacity
+        stop = start + (hi - lo)
+        if stop <= self.capacity:
+            return column[start:stop].copy()
+        return np.concatenate((column[start:], column[:stop - self.capacity]))
+
+    def query(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+              limit: Optional[int] = None, max_points: Optional[int] = None,
+              fields: Optional[Sequence[str]] = None, epoch: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        查詢時間範圍內的紀錄
+
+        Args:
+            start_ms: 起始時間戳（含，毫秒）
+            end_ms: 結束時間戳（含，毫秒）
+            limit: 只保留範圍內最新的 limit 筆
+            max_points: 超過時以固定間隔抽樣到最多 max_points 筆（保留最新一筆）
+            fields: 要取出的欄位（預設全部）
+            epoch: 只取出此 epoch 的紀錄
+
+        Returns:
+            {欄位: 依時間排序的陣列}
+        """
+        names = [name for name in (fields or self.fields) if name in self._columns]
+        with self._lock:
+            lo = self._locate(start_ms, "left") if start_ms is not None else 0
+            hi = self._locate(end_ms, "right") if end_ms is not None else self._size
+            if epoch is not None:
+                matches = np.nonzero(self._take("epoch", 0, self._size) == epoch)[0]
+                lo, hi = (max(lo, int(matches[0])), min(hi, int(matches[-1]) + 1)) if len(matches) else (0, 0)
+            if limit is not None and limit >= 0:
+                lo = max(lo, hi - limit)
+            lo = min(lo, hi)
+            columns = {name: self._take(name, lo, hi) for name in names}
+
+        count = hi - lo
+        if max_points and count > max_points:
+            # 從最新一筆往回等距抽樣
+            step = -(-count // max_points)
+            index = np.arange(count - 1, -1, -step)[::-1]
+            columns = {name: values[index] for name, values in columns.items()}
+        return columns
+
+    def latest(self, count: int = 1) -> Dict[str, np.ndarray]:
+        """最新 count 筆紀錄"""
+        return self.query(limit=count)
+
+    def to_json(self, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        將查詢結果轉為 JSON 友善的欄位格式
+
+        Args:
+            columns: query() 的結果
+
+        Returns:
+            {"count", "capacity", "size", "fields": {欄位: 列表}}
+        """
+        count = len(next(iter(columns.values()))) if columns else 0
+        return {
+            "count": count,
+            "size": self._size,
+            "capacity": self.capacity,
+            "source": "memory",
+            "fields": {name: values.tolist() for name, values in columns.items()}
+        }
+
+
+def history_query_args(args) -> Dict[str, Any]:
+    """
+    由請求參數（start、end、limit、max_points、fields、epoch）組成 query() 參數
+
+    Args:
+        args: Flask request.args
+
+    Returns:
+        query() 的關鍵字參數
+    """
+    def to_int(name):
+        value = args.get(name)
+        return int(value) if value not in (None, "") else None
+
+    fields = args.get("fields")
+    return {
+        "start_ms": to_int("start"),
+        "end_ms": to_int("end"),
+        "limit": to_int("limit"),
+        "max_points": to_int("max_points"),
+        "epoch": to_int("epoch"),
+        "fields": [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    }
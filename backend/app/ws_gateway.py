@@ -0,0 +1,367 @@
+"""
+WebSocket 多工閘道
+與 HTTP API 同一個來源與埠（ASGI 模式下的 /api/ws），由 ASGI 伺服器的事件迴圈處理所有連線，
+不為每個連線佔用執行緒，單一實例即可維持數千個閒置的儀表板連線。客戶端以 subscribe/unsubscribe
+訊息訂閱主題（tick、stats、health、anomalies），AI 分析與問答以 job 訊息提交，在有限的執行緒池中執行，
+完成後將結果推送回提交的連線
+
+只在 QDASHBOARD_WS_ENABLED=1 且以 ASGI 模式執行時啟用；WSGI 模式下 /api/status 回報未啟用，
+前端改用 HTTP 與 SSE
+
+訊息格式（JSON）:
+    客戶端 → 伺服器
+        {"op": "subscribe", "topics": ["tick", "stats"]}
+        {"op": "unsubscribe", "topics": ["stats"]}
+        {"op": "job", "kind": "analyze" | "query", "ref": "客戶端自訂 id", "payload": {...}}
+        {"op": "ping"}
+    伺服器 → 客戶端
+        {"topic": "tick", "snapshot": true, "data": {...完整狀態}}   訂閱後與重新同步時送出（取代客戶端的狀態）
+        {"topic": "tick", "id": 12, "data": {...變動欄位}}
+        {"topic": "ai-job", "job": 3, "ref": "...", "status": "accepted" | "done" | "error", "result": {...}}
+        {"op": "subscribed" | "unsubscribed" | "pong" | "error", ...}
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+WS_ENABLED = os.environ.get("QDASHBOARD_WS_ENABLED", "0") == "1"
+WS_PATH = "/api/ws"
+TOPICS = ("tick", "stats", "health", "anomalies")
+JOB_TOPIC = "ai-job"
+DEFAULT_AI_WORKERS = 2
+MAX_MESSAGE_BYTES = 64 * 1024
+# 每個連線待送出的訊息上限，寫入跟不上的慢速連線略過主題更新，佇列清空後改送完整狀態重新同步
+OUTBOX_SIZE = 64
+# 1008: 違反政策（路徑或閘道未啟用）、1009: 訊息過大
+CLOSE_POLICY = 1008
+CLOSE_TOO_BIG = 1009
+
+
+def _dumps(message: Dict[str, Any]) -> str:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class WebSocketConnection:
+    """
+    ASGI websocket 連線：送出的訊息經由有上限的佇列由獨立的寫入工作送出
+
+    主題更新只含變動欄位，佇列已滿而略過更新的主題標記為需要重新同步，
+    佇列清空後以 resync_fn 取得的完整狀態（snapshot 訊息）取代，客戶端不會一直保留過期的欄位
+    """
+
+    def __init__(self, receive: Callable, send: Callable, outbox_size: int = OUTBOX_SIZE,
+                 resync_fn: Optional[Callable[[str], Optional[str]]] = None):
+        """
+        Args:
+            receive: ASGI receive
+            send: ASGI send
+            outbox_size: 待送出的訊息上限
+            resync_fn: 取得主題完整狀態訊息的函式（省略時由閘道設定）
+        """
+        self._receive = receive
+        self._send = send
+        self._outbox: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=outbox_size)
+        self.resync_fn = resync_fn
+        self.resync: Set[str] = set()
+        self.dropped = 0
+        self.closed = False
+
+    async def accept(self) -> bool:
+        """完成握手（客戶端在握手前斷線時為 False）"""
+        message = await self._receive()
+        if message["type"] != "websocket.connect":
+            return False
+        await self._send({"type": "websocket.accept"})
+        return True
+
+    async def receive(self) -> Optional[str]:
+        """下一則文字訊息（斷線時為 None）"""
+        while True:
+            message = await self._receive()
+            if message["type"] == "websocket.disconnect":
+                self.closed = True
+                return None
+            if message["type"] == "websocket.receive":
+                if message.get("text") is not None:
+                    return message["text"]
+                return (message.get("bytes") or b"").decode("utf-8", "replace")
+
+    def offer(self, text: str, topic: Optional[str] = None) -> bool:
+        """
+        不等待地排入主題更新（佇列已滿時略過並標記主題需要重新同步）
+
+        Returns:
+            是否已排入（等待重新同步的主題不再排入變動欄位，也回傳 False）
+        """
+        if topic is not None and topic in self.resync:
+            return False
+        try:
+            self._outbox.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if topic is not None:
+                self.resync.add(topic)
+            return False
+
+    async def send(self, text: str):
+        """排入回覆（佇列已滿時等待）"""
+        await self._outbox.put(text)
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+        await self._send({"type": "websocket.close", "code": code})
+
+    async def writer(self):
+        """依序送出佇列中的訊息，佇列清空時送出需要重新同步的主題完整狀態，直到連線關閉"""
+        try:
+            while not self.closed:
+                text = await self._outbox.get()
+                await self._send({"type": "websocket.send", "text": text})
+                while self.resync and self._outbox.empty() and not self.closed:
+                    topic = self.resync.pop()
+                    snapshot = self.resync_fn(topic) if self.resync_fn else None
+                    if snapshot is not None:
+                        await self._send({"type": "websocket.send", "text": snapshot})
+        except Exception:
+            # 客戶端已斷線
+            self.closed = True
+
+
+class WebSocketGateway:
+    """主題訂閱與 AI 工作的 WebSocket 閘道（在 ASGI 事件迴圈中執行）"""
+
+    def __init__(self, state_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+                 executor: Optional[Executor] = None, ai_workers: int = DEFAULT_AI_WORKERS):
+        """
+        初始化閘道
+
+        Args:
+            state_fn: 取得主題目前完整狀態的函式（訂閱時立即送出）
+            executor: 執行 AI 工作的執行緒池（省略時建立 ai_workers 個執行緒）
+            ai_workers: 未提供 executor 時同時執行的 AI 工作數
+        """
+        self.state_fn = state_fn
+        self._subscribers: Dict[str, Set[WebSocketConnection]] = {topic: set() for topic in TOPICS}
+        self._jobs: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=ai_workers, thread_name_prefix="ws-ai-job")
+        self._job_ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.connections = 0
+        self.dropped = 0
+        self.resyncs = 0
+        self.jobs_running = 0
+        self.jobs_completed = 0
+
+    def register_job(self, kind: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """
+        註冊 AI 工作處理函式（在執行緒池中執行，可以是阻塞呼叫）
+
+        Args:
+            kind: 工作種類（例如 analyze、query）
+            handler: 接收 payload、回傳結果字典的函式
+        """
+        self._jobs[kind] = handler
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """綁定處理連線的事件迴圈（其他執行緒的 publish 排入此迴圈）"""
+        self._loop = loop
+
+    def close(self):
+        """關閉自行建立的執行緒池"""
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+    def publish(self, topic: str, data: Dict[str, Any], event_id: Optional[int] = None):
+        """
+        推送主題更新給訂閱者（可由任何執行緒呼叫，訊息只序列化一次）
+
+        Args:
+            topic: 主題
+            data: 變動的欄位
+            event_id: 事件 id
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._subscribers.get(topic):
+            return
+        message = _dumps({"topic": topic, "id": event_id, "data": data})
+        loop.call_soon_threadsafe(self._broadcast, topic, message)
+
+    def _broadcast(self, topic: str, message: str):
+        # 不等待個別連線的寫入，佇列已滿的慢速連線略過這次更新，之後改送完整狀態
+        for connection in list(self._subscribers.get(topic, ())):
+            if not connection.offer(message, topic):
+                self.dropped += 1
+
+    def _snapshot_message(self, topic: str) -> Optional[str]:
+        """主題目前完整狀態的 snapshot 訊息（沒有狀態時為 None）"""
+        state = self.state_fn(topic) if self.state_fn else None
+        return _dumps({"topic": topic, "snapshot": True, "data": state}) if state else None
+
+    def _resync_message(self, topic: str) -> Optional[str]:
+        """略過更新的連線重新同步用的 snapshot 訊息"""
+        self.resyncs += 1
+        return self._snapshot_message(topic)
+
+    async def handle(self, connection: WebSocketConnection):
+        """處理一個連線直到斷線"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        if not await connection.accept():
+            return
+        if connection.resync_fn is None:
+            connection.resync_fn = self._resync_message
+        writer = asyncio.ensure_future(connection.writer())
+        self.connections += 1
+        topics: Set[str] = set()
+        try:
+            while not connection.closed:
+                raw = await connection.receive()
+                if raw is None:
+                    break
+                if len(raw) > MAX_MESSAGE_BYTES:
+                    await connection.close(CLOSE_TOO_BIG)
+                    break
+                await self._dispatch(connection, raw, topics)
+        finally:
+            for topic in topics:
+                self._subscribers[topic].discard(connection)
+            self.connections -= 1
+            writer.cancel()
+
+    async def _dispatch(self, connection: WebSocketConnection, raw: str, topics: Set[str]):
+        try:
+            message = json.loads(raw)
+            op = message.get("op")
+        except (ValueError, AttributeError):
+            await connection.send(_dumps({"op": "error", "error": "訊息必須為 JSON 物件"}))
+            return
+
+        if op == "subscribe":
+            requested = [t for t in message.get("topics", []) if t in self._subscribers]
+            for topic in requested:
+                self._subscribers[topic].add(connection)
+                topics.add(topic)
+            await connection.send(_dumps({"op": "subscribed", "topics": sorted(topics)}))
+            for topic in requested:
+                snapshot = self._snapshot_message(topic)
+                if snapshot is not None:
+                    await connection.send(snapshot)
+        elif op == "unsubscribe":
+            for topic in message.get("topics", []):
+                if topic in topics:
+                    self._subscribers[topic].discard(connection)
+                    topics.discard(topic)
+                    connection.resync.discard(topic)
+            await connection.send(_dumps({"op": "unsubscribed", "topics": sorted(topics)}))
+        elif op == "job":
+            await self._submit_job(connection, message)
+        elif op == "ping":
+            await connection.send(_dumps({"op": "pong"}))
+        else:
+            await connection.send(_dumps({"op": "error", "error": f"未知的操作: {op}"}))
+
+    async def _submit_job(self, connection: WebSocketConnection, message: Dict[str, Any]):
+        kind = message.get("kind")
+        ref = message.get("ref")
+        handler = self._jobs.get(kind)
+        if handler is None:
+            await connection.send(_dumps({"topic": JOB_TOPIC, "ref": ref, "status": "error",
+                                          "result": {"error": f"不支援的工作種類: {kind}"}}))
+            return
+        job_id = next(self._job_ids)
+        await connection.send(_dumps({"topic": JOB_TOPIC, "job": job_id, "ref": ref, "status": "accepted"}))
+        asyncio.get_running_loop().create_task(
+            self._run_job(connection, job_id, ref, handler, message.get("payload") or {})
+        )
+
+    async def _run_job(self, connection: WebSocketConnection, job_id: int, ref: Any, handler: Callable,
+                       payload: Dict[str, Any]):
+        self.jobs_running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, handler, payload)
+            status = "done"
+        except Exception as e:
+            logger.error(f"❌ AI 工作 {job_id} 失敗: {e}")
+            result, status = {"success": False, "error": str(e)}, "error"
+        finally:
+            self.jobs_running -= 1
+            self.jobs_completed += 1
+        if not connection.closed:
+            await connection.send(_dumps({"topic": JOB_TOPIC, "job": job_id, "ref": ref,
+                                          "status": status, "result": result}))
+
+    def metrics(self) -> Dict[str, Any]:
+        """連線數、各主題訂閱數、略過的更新數、重新同步數與 AI 工作統計"""
+        return {
+            "enabled": True,
+            "path": WS_PATH,
+            "connections": self.connections,
+            "subscribers": {topic: len(conns) for topic, conns in self._subscribers.items()},
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+            "jobs_running": self.jobs_running,
+            "jobs_completed": self.jobs_completed
+        }
+
+
+def flask_view_job(app, view: Callable) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    將 POST JSON 的 Flask 視圖函式包裝成 AI 工作處理函式（在應用程式請求環境中直接呼叫，不經過 HTTP）
+
+    Args:
+        app: Flask 應用程式
+        view: 視圖函式
+
+    Returns:
+        接收 payload、回傳 JSON 結果的函式
+    """
+    def handler(payload: Dict[str, Any]) -> Dict[str, Any]:
+        with app.test_request_context(method="POST", json=payload):
+            response = app.make_response(view())
+            return response.get_json()
+    return handler
+
+
+# 全域閘道實例
+_gateway = None
+
+def get_ws_gateway() -> Optional[WebSocketGateway]:
+    """獲取已建立的 WebSocket 閘道（未啟用時為 None）"""
+    return _gateway
+
+def create_ws_gateway(broker, jobs: Optional[Dict[str, Callable]] = None,
+                      executor: Optional[Executor] = None,
+                      enabled: bool = WS_ENABLED) -> Optional[WebSocketGateway]:
+    """
+    建立全域 WebSocket 閘道，並將 SSE 廣播器的事件轉送到對應主題
+
+    Args:
+        broker: EventBroker（提供主題狀態與變動事件）
+        jobs: {工作種類: 處理函式}
+        executor: 執行 AI 工作的執行緒池
+        enabled: 是否啟用（預設讀取 QDASHBOARD_WS_ENABLED）
+
+    Returns:
+        閘道（未啟用時為 None）
+    """
+    global _gateway
+    if _gateway is not None:
+        return _gateway
+    if not enabled:
+        return None
+    gateway = WebSocketGateway(state_fn=broker.state, executor=executor)
+    for kind, handler in (jobs or {}).items():
+        gateway.register_job(kind, handler)
+    broker.add_sink(lambda event_id, event, delta: gateway.publish(event, delta, event_id))
+    _gateway = gateway
+    logger.info(f"🔌 WebSocket 閘道已啟用: {WS_PATH}")
+    return gateway
@@ -1,11 +1,14 @@
 # 雲端部署整合模組
 # 用於將當前 AI 系統整合到三 VM 架構
 
-import requests
 import time
 import logging
 from typing import Optional, Dict, Any
 
+from backend.app.http_client import get_http_client
+from backend.app.anomaly_detector import format_anomalies
+from backend.app.epoch_forecast import format_forecast
+
 logger = logging.getLogger(__name__)
 
 class CloudAIIntegration:
@@ -18,6 +21,8 @@ class CloudAIIntegration:
         self.orchestrator_url = orchestrator_url
         self.timeout = 30
         self.retry_attempts = 2
+        # 共用 keep-alive 連線池，避免每次請求重新建立 TCP/TLS 連線
+        self.http = get_http_client()
         
     def generate_response(self, prompt: str, language: str = "zh-tw", **kwargs) -> str:
         """
@@ -43,7 +48,7 @@ class CloudAIIntegration:
             # 發送請求到協調器
             logger.info(f"🌐 發送請求到雲端 AI 協調器: {self.orchestrator_url}")
             
-            response = requests.post(
+            response = self.http.post(
                 f"{self.orchestrator_url}/api/inference",
                 json=request_data,
                 timeout=self.timeout
@@ -98,8 +103,9 @@ class CloudAIIntegration:
             健康狀態資訊
         """
         try:
-            response = requests.get(
+            response = self.http.get(
                 f"{self.orchestrator_url}/health",
+                use_cache=False,
                 timeout=5
             )
             
@@ -108,7 +114,8 @@ class CloudAIIntegration:
                     "status": "healthy",
                     "cloud_available": True,
                     "response_time": response.elapsed.total_seconds(),
-                    "details": response.json()
+                    "details": response.json(),
+                    "http": self.http.metrics()
                 }
             else:
                 return {
@@ -126,6 +133,17 @@ class CloudAIIntegration:
     
     def _build_analysis_prompt(self, network_data: Dict[str, Any], language: str) -> str:
         """構建分析提示詞"""
+        # 資料層偵測到的近期異常事件
+        anomaly_text = format_anomalies(network_data.get('anomalies') or [], language)
+        if language == "en":
+            anomaly_section = f"\nRecent anomalies:\n{anomaly_text}\n" if anomaly_text else ""
+        else:
+            anomaly_section = f"\n近期異常事件：\n{anomaly_text}\n" if anomaly_text else ""
+        # 由 tick 歷史預測的 epoch 進度
+        forecast_text = format_forecast(network_data.get('forecast'), language)
+        if forecast_text:
+            anomaly_section += f"\nEpoch forecast:\n{forecast_text}\n" if language == "en" else f"\nEpoch 預測：\n{forecast_text}\n"
+        
         if language == "en":
             prompt = f"""<think>
 I need to analyze Qubic network data and provide insights about network health, performance, and trends.
@@ -152,7 +170,7 @@ Current Network Status:
 - Tick Quality: {network_data.get('epochTickQuality', 'N/A')}%
 - Active Addresses: {network_data.get('activeAddresses', 'N/A')}
 - Market Cap: ${network_data.get('marketCap', 'N/A')}
-
+{anomaly_section}
 Please provide a comprehensive analysis including network health assessment, performance evaluation, and any notable trends or recommendations."""
         else:
             prompt = f"""<think>
@@ -180,7 +198,7 @@ Please provide a comprehensive analysis including network health assessment, per
 - Tick 品質: {network_data.get('epochTickQuality', 'N/A')}%
 - 活躍地址數: {network_data.get('activeAddresses', 'N/A')}
 - 市值: ${network_data.get('marketCap', 'N/A')}
-
+{anomaly_section}
 請提供全面的分析，包括網路健康評估、性能評價以及任何值得注意的趨勢或建議。"""
         
         return prompt
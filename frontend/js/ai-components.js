@@ -731,27 +731,43 @@ class QubicAIComponents {
         }
     }
     
+    // AI 請求：WebSocket 閘道已連線時以工作提交（長時間分析不佔用 HTTP 請求），否則使用 HTTP
+    async postAI(kind, path, body) {
+        const socket = window.qubicSocket;
+        if (socket && socket.isOpen()) {
+            try {
+                return await socket.job(kind, body);
+            } catch (error) {
+                // 只有連線中斷時改用 HTTP 重試，伺服器端錯誤直接回報
+                if (socket.isOpen()) throw error;
+                console.warn('⚠️ WebSocket 中斷，改用 HTTP:', error);
+            }
+        }
+        
+        const response = await fetch(`${this.apiBaseUrl}${path}`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(body)
+        });
+        
+        if (!response.ok) {
+            throw new Error(`AI API 請求失敗: ${response.status}`);
+        }
+        
+        return await response.json();
+    }
+    
     async callAIAnalysis(data) {
         try {
             console.log('🌐 發送 AI 分析請求:', data);
             
-            const response = await fetch(`${this.apiBaseUrl}/ai/analyze`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    data: data,
-                    analysis_type: 'comprehensive',
-                    language: window.languageSwitcher ? window.languageSwitcher.getCurrentLanguage() : 'zh-tw'
-                })
+            const apiResult = await this.postAI('analyze', '/ai/analyze', {
+                data: data,
+                analysis_type: 'comprehensive',
+                language: window.languageSwitcher ? window.languageSwitcher.getCurrentLanguage() : 'zh-tw'
             });
-            
-            if (!response.ok) {
-                throw new Error(`AI API 請求失敗: ${response.status}`);
-            }
-            
-            const apiResult = await response.json();
             console.log('📥 AI API 原始回應:', apiResult);
             
             // 轉換 API 回應格式為前端期望的格式
@@ -1164,23 +1180,11 @@ class QubicAIComponents {
     
     async callQAAPI(question) {
         try {
-            const response = await fetch(`${this.apiBaseUrl}/ai/query`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    question: question,
-                    context: this.currentData,
-                    language: window.languageSwitcher ? window.languageSwitcher.getCurrentLanguage() : 'zh-tw'
-                })
+            return await this.postAI('query', '/ai/query', {
+                question: question,
+                context: this.currentData,
+                language: window.languageSwitcher ? window.languageSwitcher.getCurrentLanguage() : 'zh-tw'
             });
-            
-            if (!response.ok) {
-                throw new Error(`QA API 請求失敗: ${response.status}`);
-            }
-            
-            return await response.json();
         } catch (error) {
             console.error('❌ QA API 調用失敗:', error);
             // 返回模擬回答
@@ -23,6 +23,11 @@ class QDashboard {
         this.dataUpdateTimer = null;
         this.statsUpdateTimer = null;
         
+        // 即時推送串流（/api/stream），連線成功後取代輪詢
+        this.eventSource = null;
+        this.streaming = false;
+        this.streamState = { tick: {}, stats: {}, health: {} };
+        
         // 初始化
         this.init();
     }
@@ -52,8 +57,8 @@ class QDashboard {
         // 載入初始數據
         this.loadInitialData();
         
-        // 開始自動更新
-        this.startAutoUpdate();
+        // 開始自動更新（優先使用推送串流）
+        this.startLiveUpdates();
         
         // 綁定事件
         this.bindEvents();
@@ -216,6 +221,12 @@ class QDashboard {
     updateEpochProgress(data) {
         console.log('📊 更新 Epoch 進度數據:', data);
         
+        // 串流模式下統計數據已由推送更新，不再另外請求
+        if (this.streaming && this.lastStats) {
+            this.updateEpochProgressDisplay(this.lastStats);
+            return;
+        }
+        
         // 獲取統計數據以獲得準確的 Epoch 信息
         this.fetchAndUpdateEpochStats();
     }
@@ -629,6 +640,93 @@ class QDashboard {
         });
     }
     
+    startLiveUpdates() {
+        // 有後端且瀏覽器支援 EventSource 時使用推送串流，否則輪詢
+        if (this.apiBaseUrl && window.EventSource) {
+            this.connectStream();
+        } else {
+            this.startAutoUpdate();
+        }
+    }
+    
+    connectStream() {
+        this.stopStream();
+        
+        const source = new EventSource(`${this.apiBaseUrl}/stream`);
+        this.eventSource = source;
+        
+        source.addEventListener('open', () => {
+            console.log('📡 已連接即時推送串流，停止輪詢');
+            this.streaming = true;
+            this.stopAutoUpdate();
+        });
+        
+        // 連線（或無法續傳時）先收到完整狀態，之後只收到變動的欄位
+        source.addEventListener('snapshot', (event) => {
+            const state = JSON.parse(event.data);
+            this.streamState = {
+                tick: state.tick || {},
+                stats: state.stats || {},
+                health: state.health || {}
+            };
+            if (state.stats) this.applyStreamStats();
+            if (state.tick) this.applyStreamTick();
+        });
+        
+        source.addEventListener('health', (event) => {
+            Object.assign(this.streamState.health, JSON.parse(event.data));
+            this.updateHealthIndicators(this.streamState.health);
+        });
+        
+        source.addEventListener('tick', (event) => {
+            Object.assign(this.streamState.tick, JSON.parse(event.data));
+            this.applyStreamTick();
+        });
+        
+        source.addEventListener('stats', (event) => {
+            Object.assign(this.streamState.stats, JSON.parse(event.data));
+            this.applyStreamStats();
+        });
+        
+        source.addEventListener('error', () => {
+            // 瀏覽器會以 Last-Event-ID 自動重連；連線被拒（後端不支援串流或連線數已滿）時改回輪詢
+            if (source.readyState === EventSource.CLOSED) {
+                console.warn('⚠️ 即時推送不可用，改用輪詢更新');
+                this.stopStream();
+                this.startAutoUpdate();
+            }
+        });
+    }
+    
+    stopStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.streaming = false;
+    }
+    
+    applyStreamTick() {
+        const data = { ...this.streamState.tick, health: this.streamState.health };
+        this.updateMetrics(data);
+        this.updateCharts(data);
+        this.updateHealthIndicators(data.health);
+        // 上游失敗或斷路器斷開時串流只推送 stale/error，顯示為連線失敗而非最後的健康狀態
+        if (data.stale) {
+            this.updateConnectionStatus(false, '連線失敗');
+        } else {
+            this.updateConnectionStatus(true);
+            this.updateLastUpdateTime();
+        }
+    }
+    
+    applyStreamStats() {
+        const stats = { ...this.streamState.stats };
+        this.updateStatsUI(stats);
+        this.updatePriceChart(stats);
+        this.lastStats = stats;
+    }
+    
     startAutoUpdate() {
         // 清除現有定時器，防止重複
         this.stopAutoUpdate();
@@ -0,0 +1,150 @@
+// QDashboard WebSocket 客戶端 - 主題訂閱與 AI 工作共用一個連線
+// 閘道與 API 同一個來源與埠（/api/status 回報路徑），閘道不可用或重試次數用完時各元件繼續使用 HTTP
+
+class QubicSocket {
+    constructor(apiBaseUrl) {
+        this.apiBaseUrl = apiBaseUrl;
+        this.socket = null;
+        this.url = null;
+        this.handlers = {};       // 主題 -> 處理函式列表
+        this.pendingJobs = {};    // ref -> { resolve, reject, timer }
+        this.jobCounter = 0;
+        this.retryDelay = 1000;
+        this.maxRetryDelay = 30000;
+        this.retries = 0;
+        this.maxRetries = 8;      // 連續失敗的重新連線次數上限，超過後改用 HTTP
+        this.closed = false;
+    }
+
+    async connect() {
+        if (!this.apiBaseUrl || !window.WebSocket) return false;
+
+        try {
+            const response = await fetch(`${this.apiBaseUrl}/status`);
+            const status = await response.json();
+            const ws = status.websocket || {};
+            if (!ws.enabled || !ws.path) {
+                console.log('ℹ️ WebSocket 閘道未啟用，使用 HTTP');
+                return false;
+            }
+            // 與 API 相同的主機與埠
+            const api = new URL(this.apiBaseUrl, window.location.href);
+            const protocol = api.protocol === 'https:' ? 'wss' : 'ws';
+            this.url = `${protocol}://${api.host}${ws.path}`;
+        } catch (error) {
+            console.warn('⚠️ 無法取得 WebSocket 閘道資訊:', error);
+            return false;
+        }
+
+        this.open();
+        return true;
+    }
+
+    open() {
+        const socket = new WebSocket(this.url);
+        this.socket = socket;
+
+        socket.addEventListener('open', () => {
+            console.log('🔌 WebSocket 已連線');
+            this.retryDelay = 1000;
+            this.retries = 0;
+            // 重新連線後恢復訂閱
+            const topics = Object.keys(this.handlers);
+            if (topics.length) this.send({ op: 'subscribe', topics });
+        });
+
+        socket.addEventListener('message', (event) => {
+            const message = JSON.parse(event.data);
+            if (message.topic === 'ai-job') {
+                this.resolveJob(message);
+            } else if (message.topic) {
+                (this.handlers[message.topic] || []).forEach(handler => handler(message.data, message));
+            }
+        });
+
+        socket.addEventListener('close', () => {
+            this.socket = null;
+            // 連線中斷時未完成的工作改由呼叫端以 HTTP 重試
+            Object.keys(this.pendingJobs).forEach(ref => {
+                this.rejectJob(ref, new Error('WebSocket 連線中斷'));
+            });
+            if (this.closed) return;
+            if (++this.retries > this.maxRetries) {
+                console.warn('⚠️ WebSocket 多次重新連線失敗，改用 HTTP');
+                this.closed = true;
+                return;
+            }
+            // 指數退避加上隨機抖動，避免大量客戶端同時重新連線
+            setTimeout(() => this.open(), this.retryDelay * (0.5 + Math.random() / 2));
+            this.retryDelay = Math.min(this.retryDelay * 2, this.maxRetryDelay);
+        });
+    }
+
+    isOpen() {
+        return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    send(message) {
+        if (this.isOpen()) {
+            this.socket.send(JSON.stringify(message));
+            return true;
+        }
+        return false;
+    }
+
+    subscribe(topic, handler) {
+        if (!this.handlers[topic]) {
+            this.handlers[topic] = [];
+            this.send({ op: 'subscribe', topics: [topic] });
+        }
+        this.handlers[topic].push(handler);
+    }
+
+    unsubscribe(topic) {
+        delete this.handlers[topic];
+        this.send({ op: 'unsubscribe', topics: [topic] });
+    }
+
+    // 提交 AI 工作（analyze / query），回傳與 HTTP 端點相同格式的結果
+    job(kind, payload, timeoutMs = 120000) {
+        const ref = `job-${++this.jobCounter}`;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => this.rejectJob(ref, new Error('AI 工作逾時')), timeoutMs);
+            this.pendingJobs[ref] = { resolve, reject, timer };
+            if (!this.send({ op: 'job', kind, ref, payload })) {
+                this.rejectJob(ref, new Error('WebSocket 未連線'));
+            }
+        });
+    }
+
+    resolveJob(message) {
+        const pending = this.pendingJobs[message.ref];
+        if (!pending || message.status === 'accepted') return;
+        clearTimeout(pending.timer);
+        delete this.pendingJobs[message.ref];
+        if (message.status === 'done') {
+            pending.resolve(message.result);
+        } else {
+            pending.reject(new Error((message.result && message.result.error) || 'AI 工作失敗'));
+        }
+    }
+
+    rejectJob(ref, error) {
+        const pending = this.pendingJobs[ref];
+        if (!pending) return;
+        clearTimeout(pending.timer);
+        delete this.pendingJobs[ref];
+        pending.reject(error);
+    }
+
+    close() {
+        this.closed = true;
+        if (this.socket) this.socket.close();
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const apiBaseUrl = window.QDASHBOARD_CONFIG ? window.QDASHBOARD_CONFIG.getApiBaseUrl() : null;
+    window.qubicSocket = new QubicSocket(apiBaseUrl);
+    window.qubicSocket.connect();
+});
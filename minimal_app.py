@@ -2,36 +2,43 @@
 """
 最簡化 QDashboard - 純基本功能
 """
-from flask import Flask, send_file, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
 from app_config import config
 import os
 import time
 import random
 
+from backend.app.static_assets import StaticAssets
+
 app = Flask(__name__)
 CORS(app)
 
+# 前端檔案在啟動時載入記憶體
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), 'frontend'))
+static_assets.preload()
+
 @app.route('/')
 def index():
     return "<h1>QDashboard 正在運行!</h1><p><a href='/qdashboard/'>前往 QDashboard</a></p>"
 
 @app.route('/qdashboard/')
 def qdashboard():
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'qdashboard', 'index.html')
     try:
-        return send_file(frontend_path)
+        response = static_assets.send('qdashboard/index.html')
+        if response is None:
+            return f"<h1>錯誤</h1><p>無法載入前端: 找不到 index.html</p><p>路徑: {static_assets.root}</p>"
+        return response
     except Exception as e:
-        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {frontend_path}</p>"
+        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {static_assets.root}</p>"
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', filename)
     try:
-        if os.path.exists(frontend_path) and os.path.isfile(frontend_path):
-            return send_file(frontend_path)
-        else:
+        response = static_assets.send(filename)
+        if response is None:
             return f"File not found: {filename}", 404
+        return response
     except Exception as e:
         return f"Error serving {filename}: {e}", 500
 
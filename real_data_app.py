@@ -3,142 +3,30 @@
 QDashboard - 真實數據版本
 使用 QubiPy 獲取真實的 Qubic 網路數據
 """
-from flask import Flask, send_file, jsonify, request
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from app_config import config
 import os
 import time
-import random
 
-# 嘗試導入 QubiPy
-try:
-    import qubic  # type: ignore
-    QUBIC_AVAILABLE = True
-    print("✅ QubiPy 已載入，將使用真實 Qubic 數據")
-except ImportError as e:
-    QUBIC_AVAILABLE = False
-    print(f"❌ QubiPy 未安裝: {e}")
-    print("📝 將使用模擬數據，要獲取真實數據請安裝 QubiPy")
+from backend.app.data_provider import DataProvider, set_data_provider, QUBIPY_AVAILABLE as QUBIC_AVAILABLE
+from backend.app.static_assets import StaticAssets
 
 app = Flask(__name__)
 CORS(app)
 
-class QubicDataProvider:
-    """Qubic 數據提供者 - 統一管理真實和模擬數據"""
-    
-    def __init__(self):
-        self.use_real_data = QUBIC_AVAILABLE
-        self.last_fetch_time = 0
-        self.cache_duration = 5  # 5秒緩存
-        self.cached_data = None
-        
-        if self.use_real_data:
-            try:
-                # 初始化 Qubic 客戶端
-                self.qubic_client = qubic.QubicClient()
-                print("🌐 Qubic 客戶端初始化成功")
-            except Exception as e:
-                print(f"⚠️ Qubic 客戶端初始化失敗: {e}")
-                self.use_real_data = False
-    
-    def get_current_tick_data(self):
-        """獲取當前 tick 數據"""
-        current_time = time.time()
-        
-        # 檢查緩存
-        if (self.cached_data and 
-            current_time - self.last_fetch_time < self.cache_duration):
-            return self.cached_data
-        
-        if self.use_real_data:
-            try:
-                # 獲取真實數據
-                tick_info = self.qubic_client.get_tick_info()
-                network_status = self.qubic_client.get_status()
-                
-                data = {
-                    "tick": tick_info.get('tick', 0),
-                    "duration": tick_info.get('duration', 0),
-                    "epoch": tick_info.get('epoch', 0),
-                    "timestamp": int(current_time),
-                    "health": {
-                        "overall": self._determine_health_status(tick_info, network_status)
-                    }
-                }
-                
-                self.cached_data = data
-                self.last_fetch_time = current_time
-                return data
-                
-            except Exception as e:
-                print(f"❌ 獲取真實數據失敗: {e}")
-                print("🔄 切換到模擬數據模式")
-                self.use_real_data = False
-        
-        # 模擬數據
-        data = {
-            "tick": 31530000 + random.randint(0, 1000),
-            "duration": random.choice([0, 1, 2]),
-            "epoch": 175,
-            "timestamp": int(current_time),
-            "health": {"overall": "健康"}
-        }
-        
-        self.cached_data = data
-        self.last_fetch_time = current_time
-        return data
-    
-    def _determine_health_status(self, tick_info, network_status):
-        """根據網路狀態判斷健康狀況"""
-        try:
-            if network_status.get('connected', False):
-                duration = tick_info.get('duration', 0)
-                if duration == 0:
-                    return "健康"
-                elif duration <= 2:
-                    return "正常"
-                else:
-                    return "緩慢"
-            else:
-                return "離線"
-        except:
-            return "未知"
-    
-    def get_network_stats(self):
-        """獲取網路統計數據"""
-        if self.use_real_data:
-            try:
-                # 獲取真實統計數據
-                stats = self.qubic_client.get_network_stats()
-                return {
-                    "activeAddresses": stats.get('active_addresses', 0),
-                    "marketCap": stats.get('market_cap', 0),
-                    "price": stats.get('price', 0.0),
-                    "epochTickQuality": stats.get('epoch_quality', 0.0),
-                    "circulatingSupply": stats.get('circulating_supply', 0),
-                    "burnedQus": stats.get('burned_qus', 0),
-                    "timestamp": int(time.time())
-                }
-            except Exception as e:
-                print(f"❌ 獲取統計數據失敗: {e}")
-        
-        # 模擬統計數據
-        return {
-            "activeAddresses": 1198,
-            "marketCap": 2450000000,
-            "price": 0.000000245,
-            "epochTickQuality": 99.2,
-            "circulatingSupply": 10000000000000000,
-            "burnedQus": 500000000000000,
-            "timestamp": int(time.time())
-        }
+# 前端檔案在啟動時載入記憶體
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), 'frontend'))
+static_assets.preload()
 
-# 創建數據提供者實例
-data_provider = QubicDataProvider()
+# 共用資料層：後端依 QDASHBOARD_DATA_BACKEND 選擇（預設 QubiPy，未安裝時直接呼叫 RPC HTTP API，
+# 設為 mock 時使用模擬數據）；未啟動背景輪詢時按需抓取，更新間隔內重用上次的結果
+data_provider = set_data_provider(DataProvider())
+print(f"🌐 Qubic 資料後端: {data_provider.data_source}")
 
 @app.route('/')
 def index():
-    data_source = "真實數據" if data_provider.use_real_data else "模擬數據"
+    data_source = "真實數據" if data_provider.backend.real else "模擬數據"
     return f"""
     <h1>QDashboard 正在運行!</h1>
     <p>數據來源: <strong>{data_source}</strong></p>
@@ -147,50 +35,48 @@ def index():
 
 @app.route('/qdashboard/')
 def qdashboard():
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'qdashboard', 'index.html')
     try:
-        return send_file(frontend_path)
+        response = static_assets.send('qdashboard/index.html')
+        if response is None:
+            return f"<h1>錯誤</h1><p>無法載入前端: 找不到 index.html</p><p>路徑: {static_assets.root}</p>"
+        return response
     except Exception as e:
-        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {frontend_path}</p>"
+        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {static_assets.root}</p>"
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', filename)
     try:
-        if os.path.exists(frontend_path) and os.path.isfile(frontend_path):
-            return send_file(frontend_path)
-        else:
+        response = static_assets.send(filename)
+        if response is None:
             return f"File not found: {filename}", 404
+        return response
     except Exception as e:
         return f"Error serving {filename}: {e}", 500
 
 @app.route('/api/tick')
 def get_tick():
     """獲取當前 tick 數據"""
-    data = data_provider.get_current_tick_data()
-    data['data_source'] = 'real' if data_provider.use_real_data else 'mock'
-    return jsonify(data)
+    return jsonify(data_provider.tick_payload())
 
 @app.route('/api/stats')
 def api_stats():
     """獲取網路統計數據"""
-    stats = data_provider.get_network_stats()
-    stats['data_source'] = 'real' if data_provider.use_real_data else 'mock'
-    return jsonify(stats)
+    return jsonify(data_provider.stats_payload())
 
 @app.route('/api/status')
 def api_status():
     return jsonify({
         "status": "ok", 
-        "data_source": "real" if data_provider.use_real_data else "mock",
+        "data_source": "real" if data_provider.backend.real else "mock",
         "qubic_available": QUBIC_AVAILABLE,
+        "data_provider": data_provider.metrics(),
         "timestamp": int(time.time())
     })
 
 @app.route('/api/ai/analyze', methods=['POST'])  
 def ai_analyze():
-    data = data_provider.get_current_tick_data()
-    analysis_text = f"📊 Qubic 網路即時分析 (數據來源: {'真實' if data_provider.use_real_data else '模擬'})\n"
+    data = data_provider.tick_payload()
+    analysis_text = f"📊 Qubic 網路即時分析 (數據來源: {'真實' if data_provider.backend.real else '模擬'})\n"
     analysis_text += f"當前 Tick: {data['tick']:,}\n"
     analysis_text += f"持續時間: {data['duration']} 秒\n"
     analysis_text += f"Epoch: {data['epoch']}\n"
@@ -199,7 +85,7 @@ def ai_analyze():
     return jsonify({
         "analysis": analysis_text,
         "success": True,
-        "data_source": "real" if data_provider.use_real_data else "mock",
+        "data_source": "real" if data_provider.backend.real else "mock",
         "timestamp": int(time.time())
     })
 
@@ -210,8 +96,8 @@ def ai_query():
     question = data.get('question', '')
     
     # 獲取實時數據
-    tick_data = data_provider.get_current_tick_data()
-    data_source_note = f"(數據來源: {'真實 Qubic 網路' if data_provider.use_real_data else '模擬'})"
+    tick_data = data_provider.tick_payload()
+    data_source_note = f"(數據來源: {'真實 Qubic 網路' if data_provider.backend.real else '模擬'})"
     
     # 根據問題類型提供回應
     if any(keyword in question.lower() for keyword in ['network', 'status', '網路', '狀況']):
@@ -234,7 +120,7 @@ def ai_query():
     return jsonify({
         "answer": answer,
         "success": True,
-        "data_source": "real" if data_provider.use_real_data else "mock",
+        "data_source": "real" if data_provider.backend.real else "mock",
         "timestamp": int(time.time())
     })
 
@@ -242,11 +128,10 @@ if __name__ == '__main__':
     print("🚀 啟動 QDashboard (真實數據版本)...")
     config.print_config()
     
-    if data_provider.use_real_data:
+    if data_provider.backend.real:
         print("🌐 使用真實 Qubic 網路數據")
     else:
-        print("🎭 使用模擬數據 (QubiPy 不可用)")
-        print("💡 提示: 安裝 QubiPy 以獲取真實數據")
+        print(f"🎭 使用{data_provider.data_source}數據 (QDASHBOARD_DATA_BACKEND)")
     
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
 
@@ -3,23 +3,28 @@
 QDashboard - 真實 Qubic 數據版本
 使用 QubiPy 獲取真實的 Qubic 網路數據
 """
-from flask import Flask, send_file, jsonify, request
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from app_config import config
 import os
 import time
-import threading
 import logging
 
-# 導入 QubiPy
-try:
-    from qubipy.rpc.rpc_client import QubiPy_RPC  # type: ignore
-    from qubipy.core.core_client import QubiPy_Core  # type: ignore
+from backend.app.data_provider import DataProvider, create_backend, set_data_provider, QUBIPY_AVAILABLE
+from backend.app.tick_history import history_query_args
+from backend.app.history_store import query_history
+from backend.app.event_stream import stream_response
+from backend.app.ws_gateway import get_ws_gateway
+from backend.app.conditional import cached_json, etag_for
+from backend.app.compression import install_compression
+from backend.app.static_assets import StaticAssets
+
+# QubiPy 為選用：未安裝時資料層直接呼叫 Qubic RPC HTTP API
+QUBIC_AVAILABLE = QUBIPY_AVAILABLE
+if QUBIC_AVAILABLE:
     print("✅ QubiPy 已載入，將使用真實 Qubic 數據")
-    QUBIC_AVAILABLE = True
-except ImportError as e:
-    print(f"❌ QubiPy 導入失敗: {e}")
-    QUBIC_AVAILABLE = False
+else:
+    print("ℹ️ QubiPy 未安裝，將直接呼叫 Qubic RPC HTTP API")
 
 # 導入 AI 組件
 try:
@@ -32,24 +37,21 @@ except ImportError as e:
 
 app = Flask(__name__)
 CORS(app)
+install_compression(app)
 
-class RealQubicDataProvider:
-    """真實 Qubic 數據提供者"""
+class RealQubicDataProvider(DataProvider):
+    """真實 Qubic 數據提供者（共用資料層加上 AI 引擎與本應用的回應欄位）"""
     
     def __init__(self):
-        self.qubic_client = None
-        self.last_tick_data = None
-        self.last_fetch_time = 0
-        self.cache_duration = 3  # 3秒緩存
-        self.connection_status = "初始化中"
+        # 後端依 QDASHBOARD_DATA_BACKEND 選擇（預設有 QubiPy 時用 QubiPy，否則直接呼叫 RPC HTTP API）
+        super().__init__(create_backend())
         self.ai_engine = None
-        # 高精度時間紀錄（毫秒級計算用）
-        self._last_tick_ns = None
+        print(f"🌐 Qubic 資料後端: {self.data_source}")
         
-        if QUBIC_AVAILABLE:
-            self._initialize_client()
-        else:
-            self.connection_status = "QubiPy 不可用"
+        # 背景輪詢 tick、統計與狀態，請求執行緒不直接呼叫 RPC（同時載入磁碟上的歷史）
+        self.start_polling(wait=5)
+        if self.history_store is not None:
+            print(f"💾 已載入 {len(self.history):,} 筆 tick 歷史（儲存檔共 {len(self.history_store):,} 筆）")
             
         # 延遲初始化 AI 引擎
         if AI_AVAILABLE:
@@ -57,21 +59,36 @@ class RealQubicDataProvider:
         else:
             print("⚠️ AI 推理引擎不可用")
     
-    def _initialize_client(self):
-        """初始化 Qubic 客戶端"""
-        try:
-            # 初始化 RPC 和 Core 客戶端
-            self.rpc_client = QubiPy_RPC()
-            self.core_client = QubiPy_Core()
-            self.qubic_client = self.rpc_client  # 主要使用 RPC 客戶端
-            self.connection_status = "已連線"
-            print("🌐 Qubic RPC 和 Core 客戶端初始化成功")
-        except Exception as e:
-            print(f"⚠️ Qubic 客戶端初始化失敗: {e}")
-            self.connection_status = f"連線失敗: {str(e)}"
-            self.qubic_client = None
-            self.rpc_client = None
-            self.core_client = None
+    @property
+    def connection_status(self):
+        """由最新快照與斷路器判斷的連線狀態（含重試倒數，只用於即時顯示）"""
+        if self.breaker.is_open:
+            return f"上游故障，{self.breaker.retry_in():.0f} 秒後重試（顯示最後一份數據）"
+        return self.connection_text(self.snapshot)
+    
+    def connection_state(self, snapshot=None):
+        """
+        連線狀態代碼，只由快照與斷路器是否斷開決定（作為回應版本的一部分）
+        
+        Returns:
+            "breaker_open"、"error"、"connected" 或 "initializing"
+        """
+        snapshot = snapshot or self.snapshot
+        if self.breaker.is_open:
+            return "breaker_open"
+        if snapshot.errors.get("tick"):
+            return "error"
+        return "connected" if snapshot.tick else "initializing"
+    
+    def connection_text(self, snapshot=None, state=None):
+        """連線狀態說明（不含重試倒數，同一版本內不變）"""
+        snapshot = snapshot or self.snapshot
+        state = state or self.connection_state(snapshot)
+        if state == "breaker_open":
+            return "上游故障，稍後重試（顯示最後一份數據）"
+        if state == "error":
+            return f"數據獲取失敗: {snapshot.errors.get('tick')}"
+        return "已連線" if state == "connected" else "初始化中"
     
     def _initialize_ai_engine(self):
         """延遲初始化 AI 推理引擎"""
@@ -95,189 +112,40 @@ class RealQubicDataProvider:
                 self.ai_engine = None
         return self.ai_engine
     
-    def get_current_tick_data(self):
-        """獲取當前 tick 數據"""
-        current_time = time.time()
-        
-        # 檢查緩存
-        if (self.last_tick_data and 
-            current_time - self.last_fetch_time < self.cache_duration):
-            return self.last_tick_data
-        
-        if self.qubic_client and self.rpc_client:
-            try:
-                # 獲取真實的 Qubic 網路數據
-                print("🔄 正在獲取真實 Qubic 數據...")
-                
-                # 獲取當前 tick 信息（返回整數）
-                tick_number = self.rpc_client.get_latest_tick()
-                print(f"📊 獲取到 tick 號碼: {tick_number}")
-                
-                # 嘗試獲取 epoch 信息（從統計數據中獲取）
-                try:
-                    stats_data = self.rpc_client.get_latest_stats()
-                    epoch = stats_data.get('epoch', 0)
-                    print(f"📊 獲取到 epoch: {epoch}")
-                except Exception as e:
-                    print(f"⚠️ 無法從統計數據獲取 epoch: {e}")
-                    epoch = 0
-                
-                # 嘗試獲取更多狀態信息
-                try:
-                    status_info = self.rpc_client.get_status()
-                    print(f"📊 獲取到狀態信息: {status_info}")
-                except:
-                    status_info = {}
-                
-                # 計算持續時間（毫秒級 + 相容秒級）
-                duration_info = self._calculate_duration(tick_number, status_info)
-                
-                data = {
-                    "tick": tick_number,
-                    # 相容欄位（整數秒）
-                    "duration": duration_info.get("duration", 0),
-                    # 新增毫秒級/浮點秒欄位
-                    "duration_ms": duration_info.get("duration_ms", 0),
-                    "duration_s": duration_info.get("duration_s", 0.0),
-                    "epoch": epoch,
-                    "timestamp": int(current_time),
-                    "health": {
-                        "overall": self._determine_health_status(tick_number, status_info)
-                    },
-                    "data_source": "real",
-                    "connection_status": self.connection_status
-                }
-                
-                self.last_tick_data = data
-                self.last_fetch_time = current_time
-                print(
-                    f"✅ 成功獲取真實數據: Tick {data['tick']}, "
-                    f"Duration {data.get('duration_s', 0.0):.2f}s (int={data.get('duration', 0)}s)"
-                )
-                return data
-                
-            except Exception as e:
-                print(f"❌ 獲取真實數據失敗: {e}")
-                self.connection_status = f"數據獲取失敗: {str(e)}"
-        
-        # 如果無法獲取真實數據，返回錯誤信息
-        return {
-            "tick": 0,
-            "duration": 0,
-            "epoch": 0,
-            "timestamp": int(current_time),
-            "health": {"overall": "無法連接"},
-            "data_source": "error",
-            "connection_status": self.connection_status,
-            "error": "無法獲取真實 Qubic 數據"
-        }
+    def tick_version(self):
+        """讀取一次快照與斷路器狀態，回傳版本與由同一份快照、同一個連線狀態建立內容的函式"""
+        snapshot = self.refresh(["tick"])
+        state = self.connection_state(snapshot)
+        return self.tick_etag(snapshot, state), lambda: self.tick_payload(snapshot, state)
     
-    def _calculate_duration(self, tick_number, status_info):
-        """計算 tick 持續時間，提供毫秒級與秒級（相容）。"""
-        try:
-            delta_ms = None
-            # 1) 優先使用 RPC 提供的時間戳
-            if isinstance(status_info, dict):
-                if 'timestamp_ms' in status_info and 'previous_timestamp_ms' in status_info:
-                    delta_ms = max(0, int(status_info['timestamp_ms']) - int(status_info['previous_timestamp_ms']))
-                elif 'timestamp' in status_info and 'previous_timestamp' in status_info:
-                    # 秒 → 毫秒
-                    delta_ms = max(0, int(status_info['timestamp']) - int(status_info['previous_timestamp'])) * 1000
-                elif 'duration' in status_info:
-                    # 僅有整數秒
-                    delta_ms = max(0, int(status_info['duration']) * 1000)
-
-            # 2) 回退：使用高精度計時器估算（僅在 tick 前進時）
-            if delta_ms is None:
-                now_ns = time.perf_counter_ns()
-                if self._last_tick_ns is not None and hasattr(self, 'last_tick_number') and self.last_tick_number is not None:
-                    if tick_number > self.last_tick_number:
-                        delta_ms = max(0, (now_ns - self._last_tick_ns) // 1_000_000)
-                self._last_tick_ns = now_ns
-
-            # 記錄最近 tick
-            self.last_tick_number = tick_number
-
-            # 3) 統一輸出
-            if delta_ms is None:
-                delta_ms = 1000  # 最末回退 1 秒
-
-            duration_s = delta_ms / 1000.0
-            duration_int = 0 if delta_ms == 0 else int((delta_ms + 999) // 1000)  # ceil
-
-            return {
-                'duration_ms': delta_ms,
-                'duration_s': duration_s,
-                'duration': duration_int
-            }
-        except Exception:
-            return {
-                'duration_ms': 0,
-                'duration_s': 0.0,
-                'duration': 0
-            }
+    def tick_etag(self, snapshot=None, state=None):
+        """共用的 tick 版本加上連線狀態代碼"""
+        snapshot = snapshot or self.refresh(["tick"])
+        etag = super().tick_etag(snapshot)
+        return etag_for(etag, state or self.connection_state(snapshot)) if etag is not None else None
     
-    def _determine_health_status(self, tick_number, status):
-        """根據網路狀態判斷健康狀況"""
-        try:
-            # 檢查 tick 是否有效
-            if tick_number > 0:
-                # 基於 tick 變化判斷健康狀況
-                if hasattr(self, 'last_tick_number') and self.last_tick_number:
-                    if tick_number > self.last_tick_number:
-                        return "健康"  # Tick 在增長
-                    elif tick_number == self.last_tick_number:
-                        return "停滯"  # Tick 沒有變化
-                    else:
-                        return "異常"  # Tick 倒退
-                else:
-                    return "健康"  # 首次獲取，假設健康
-            else:
-                return "錯誤"  # 無效的 tick
-        except Exception as e:
-            print(f"⚠️ 健康狀態判斷失敗: {e}")
-            return "未知"
+    def tick_payload(self, snapshot=None, state=None):
+        """共用的 tick 回應加上毫秒級持續時間與連線狀態"""
+        snapshot = snapshot or self.refresh(["tick"])
+        data = super().tick_payload(snapshot)
+        duration_ms = self.tick_stats.last_duration_ms
+        if duration_ms is None:
+            duration_ms = data.get("duration", 0) * 1000
+        data.update({
+            "duration_ms": int(round(duration_ms)),
+            "duration_s": round(duration_ms / 1000.0, 3),
+            "connection_status": self.connection_text(snapshot, state)
+        })
+        if "error" in data:
+            data["data_source"] = "error"
+        return data
     
-    def get_network_stats(self):
-        """獲取網路統計數據"""
-        if self.rpc_client:
-            try:
-                # 獲取真實統計數據
-                stats = self.rpc_client.get_latest_stats()
-                print(f"📊 獲取到統計數據: {stats}")
-                
-                return {
-                    "activeAddresses": stats.get('activeAddresses', 0),
-                    "marketCap": stats.get('marketCap', 0),
-                    "price": stats.get('price', 0.0),
-                    "epochTickQuality": stats.get('epochTickQuality', 0.0),
-                    "circulatingSupply": int(stats.get('circulatingSupply', 0)),
-                    "burnedQus": int(stats.get('burnedQus', 0)),
-                    "timestamp": int(time.time()),
-                    "data_source": "real",
-                    "epoch": stats.get('epoch', 0),
-                    "currentTick": stats.get('currentTick', 0),
-                    "ticksInCurrentEpoch": stats.get('ticksInCurrentEpoch', 0),
-                    "emptyTicksInCurrentEpoch": stats.get('emptyTicksInCurrentEpoch', 0)
-                }
-            except Exception as e:
-                print(f"❌ 獲取統計數據失敗: {e}")
-        
-        # 返回錯誤狀態
-        return {
-            "activeAddresses": 0,
-            "marketCap": 0,
-            "price": 0.0,
-            "epochTickQuality": 0.0,
-            "circulatingSupply": 0,
-            "burnedQus": 0,
-            "timestamp": int(time.time()),
-            "data_source": "error",
-            "error": "無法獲取統計數據"
-        }
+    def get_current_tick_data(self):
+        """獲取當前 tick 數據（讀取最新快照，不進行網路 I/O）"""
+        return self.tick_payload()
 
-# 創建真實數據提供者實例
-data_provider = RealQubicDataProvider()
+# 創建真實數據提供者實例（同時作為全域實例，AI 組件共用同一個輪詢器與預測）
+data_provider = set_data_provider(RealQubicDataProvider())
 
 @app.route('/')
 def index():
@@ -288,34 +156,92 @@ def index():
     <p><a href='/qdashboard/'>前往 QDashboard</a></p>
     """
 
+# 前端檔案在啟動時載入記憶體（文字類檔案預先壓縮）
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), 'frontend'))
+static_assets.preload()
+
 @app.route('/qdashboard/')
 def qdashboard():
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'qdashboard', 'index.html')
     try:
-        return send_file(frontend_path)
+        response = static_assets.send(os.path.join('qdashboard', 'index.html'))
+        if response is None:
+            return f"<h1>錯誤</h1><p>無法載入前端: 找不到 index.html</p><p>路徑: {static_assets.root}</p>"
+        return response
     except Exception as e:
-        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {frontend_path}</p>"
+        return f"<h1>錯誤</h1><p>無法載入前端: {e}</p><p>路徑: {static_assets.root}</p>"
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', filename)
     try:
-        if os.path.exists(frontend_path) and os.path.isfile(frontend_path):
-            return send_file(frontend_path)
-        else:
+        response = static_assets.send(filename)
+        if response is None:
             return f"File not found: {filename}", 404
+        return response
     except Exception as e:
         return f"Error serving {filename}: {e}", 500
 
 @app.route('/api/tick')
 def get_tick():
-    """獲取當前 tick 數據"""
-    return jsonify(data_provider.get_current_tick_data())
+    """獲取當前 tick 數據（tick 編號與資料狀態未變時回覆 304）"""
+    etag, build = data_provider.tick_version()
+    return cached_json(data_provider.responses, "tick", etag, build,
+                       max_age=data_provider.poll_interval("tick"))
 
 @app.route('/api/stats')
 def api_stats():
-    """獲取網路統計數據"""
-    return jsonify(data_provider.get_network_stats())
+    """獲取網路統計數據（上游統計時間戳未變時回覆 304）"""
+    etag, build = data_provider.stats_version()
+    return cached_json(data_provider.responses, "stats", etag, build,
+                       max_age=data_provider.poll_interval("stats"))
+
+@app.route('/api/history')
+def api_history():
+    """
+    查詢 tick 歷史
+    
+    Query 參數: start/end（毫秒時間戳）、epoch、limit、max_points、fields（逗號分隔）
+    """
+    try:
+        query = history_query_args(request.args)
+    except ValueError:
+        return jsonify({"error": "start、end、epoch、limit、max_points 必須為整數"}), 400
+    return jsonify(query_history(data_provider.history, data_provider.history_store, **query))
+
+@app.route('/api/anomalies')
+def api_anomalies():
+    """
+    最近異常事件
+    
+    Query 參數: limit（預設 50）、since（只回傳 id 大於此值的事件）
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+        since = request.args.get('since')
+        since = int(since) if since not in (None, "") else None
+    except ValueError:
+        return jsonify({"error": "limit、since 必須為整數"}), 400
+    return jsonify({
+        "anomalies": data_provider.anomalies.recent(limit, since),
+        "baselines": data_provider.anomalies.baselines(),
+        "timestamp": int(time.time())
+    })
+
+@app.route('/api/forecast')
+def api_forecast():
+    """epoch 進度與 tick 持續時間預測（含 95% 信賴區間）"""
+    forecast = data_provider.forecaster.latest
+    if forecast is None:
+        return jsonify({"error": "尚無足夠數據進行預測", "timestamp": int(time.time())}), 503
+    return jsonify(dict(forecast, timestamp=int(time.time())))
+
+@app.route('/api/stream')
+def api_stream():
+    """
+    tick、統計與健康狀況的 Server-Sent Events 串流
+    
+    連線時先送出完整狀態（snapshot 事件），之後只推送變動的欄位；斷線重連時依 Last-Event-ID 續傳
+    """
+    return stream_response(data_provider.events, request)
 
 @app.route('/api/status')
 def api_status():
@@ -323,7 +249,13 @@ def api_status():
         "status": "ok", 
         "qubic_available": QUBIC_AVAILABLE,
         "connection_status": data_provider.connection_status,
-        "data_source": "real",
+        "data_source": data_provider.data_source,
+        "data_provider": data_provider.metrics(),
+        "circuit_breaker": data_provider.breaker.metrics(),
+        "sources": data_provider.snapshot.staleness(),
+        "stream": data_provider.events.metrics(),
+        "response_cache": data_provider.responses.metrics(),
+        "websocket": get_ws_gateway().metrics() if get_ws_gateway() else {"enabled": False},
         "timestamp": int(time.time())
     })
 
@@ -374,8 +306,10 @@ def ai_analyze():
         # 獲取要分析的數據
         data_to_analyze = request_data.get('data')
         if not data_to_analyze:
-            # 使用實時數據
+            # 使用實時數據，附上近期異常事件供分析參考
             data_to_analyze = data_provider.get_current_tick_data()
+            data_to_analyze["anomalies"] = data_provider.anomalies.recent(5)
+            data_to_analyze["forecast"] = data_provider.forecaster.latest
         
         if ai_engine and data_to_analyze.get('data_source') != 'error':
             # 數據健全性：若 duration 缺失或為 0，嘗試以最新 tick 值補充；最後保底為 1
@@ -575,10 +509,6 @@ if __name__ == '__main__':
     print("🚀 啟動 QDashboard (真實 Qubic 數據版本)...")
     config.print_config()
     
-    if QUBIC_AVAILABLE:
-        print("🌐 QubiPy 可用，將嘗試連接真實 Qubic 網路")
-        print("⏳ 正在初始化 Qubic 客戶端...")
-    else:
-        print("❌ QubiPy 不可用，無法獲取真實數據")
+    print(f"🌐 Qubic 資料後端: {data_provider.data_source}（{data_provider.connection_status}）")
     
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
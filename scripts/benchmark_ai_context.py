@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+AI 分析資料取得微基準測試
+比較 /api/ai/analyze 原本以 test_client 呼叫自身 /api/tick、/api/stats 再解析 JSON 的做法，
+與直接讀取共用資料層快照的 network_context()
+"""
+
+import json
+import os
+import sys
+import timeit
+from pathlib import Path
+
+# 添加專案根目錄到路徑
+sys.path.append(str(Path(__file__).parent.parent))
+
+# 使用合成數據，不連線 Qubic RPC
+os.environ.setdefault("QDASHBOARD_DATA_BACKEND", "mock")
+
+from backend.app import create_app
+from backend.app.data_provider import get_data_provider
+
+
+def loopback_context(app, provider) -> dict:
+    """原本的做法：兩次行程內 HTTP 往返與 JSON 解析"""
+    with app.test_client() as client:
+        tick_response = client.get('/api/tick')
+        tick_data = json.loads(tick_response.data) if tick_response.status_code == 200 else {}
+        stats_response = client.get('/api/stats')
+        stats_data = json.loads(stats_response.data) if stats_response.status_code == 200 else {}
+    context = {**tick_data, **stats_data}
+    context["anomalies"] = provider.anomalies.recent(5)
+    context["forecast"] = provider.get_epoch_forecast()
+    return context
+
+
+def run_benchmark(number: int = 2000):
+    """執行微基準測試"""
+    app = create_app()
+    provider = get_data_provider()
+
+    legacy = loopback_context(app, provider)
+    direct = provider.network_context()
+    assert legacy.keys() == direct.keys(), f"欄位不一致: {legacy.keys() ^ direct.keys()}"
+
+    print("🧪 AI 分析資料取得微基準測試")
+    print("=" * 50)
+    print(f"📝 資料後端: {provider.data_source}，欄位 {len(direct)} 個，重複 {number} 次")
+
+    legacy_time = timeit.timeit(lambda: loopback_context(app, provider), number=number)
+    direct_time = timeit.timeit(provider.network_context, number=number)
+
+    print(f"⏱️  test_client 往返: {legacy_time / number * 1e6:8.1f} µs/次")
+    print(f"⏱️  直接讀取快照:     {direct_time / number * 1e6:8.1f} µs/次")
+    print(f"🚀 加速比: {legacy_time / direct_time:.2f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
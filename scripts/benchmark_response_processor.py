@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+回應後處理微基準測試
+比較原本的多段處理流程與預編譯後處理器，以及逐詞比對與多詞彙自動機驗證器
+"""
+
+import random
+import re
+import sys
+import timeit
+from pathlib import Path
+
+# 添加專案根目錄到路徑
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.ai.response_processor import get_response_processor, DEFAULT_ANSWER_MARKERS
+from backend.ai.response_validator import ResponseValidator, load_scoring_rules
+
+# 原本 validate_response 寫死的詞彙（作為對照組）
+KEY_CONCEPTS = [
+    'tick', 'epoch', 'duration', 'qubic', '網路', 'network',
+    '健康', 'health', '狀況', 'status', '分析', 'analysis'
+]
+CONCLUSION_INDICATORS = [
+    '建議', '總結', '結論', 'recommend', 'conclusion', '分析', '評估'
+]
+ERROR_INDICATORS = [
+    'netcat', 'netnat', '移動設備', 'mobile device',
+    '比特幣', 'bitcoin', '以太坊', 'ethereum', 'chatgpt', 'openai'
+]
+
+PROMPT = """<think>
+我需要仔細分析用戶的具體問題："當前網路狀況如何？"
+</think>
+
+作為專業的 Qubic 區塊鏈分析師，當前網路狀態：
+Tick: 31,530,000 | Duration: 1秒 | Health: 健康
+問題：當前網路狀況如何？
+針對此問題的專業分析："""
+
+ANSWER = """📊 ✅ **Qubic 網路即時分析**
+
+Tick: 31,530,000 - 穩定增長，處理週期正常
+Duration: 1 秒 - 正常範圍，運行順暢
+Epoch: 175 - 當前階段運行中
+---
+
+
+
+健康狀態: 健康，network status 良好
+
+總結：網路整體運行穩定正常，建議持續監控 Duration 與 Tick 趨勢。
+""" * 3
+
+
+def legacy_pipeline(full_response: str, prompt: str) -> dict:
+    """原本 generate_response + validate_response 的處理步驟"""
+    if full_response.startswith(prompt):
+        response = full_response[len(prompt):].strip()
+    else:
+        response = full_response.strip()
+
+    if '<think>' in response and '</think>' in response:
+        think_end = response.find('</think>')
+        response = response[think_end + 8:].strip()
+
+    for marker in DEFAULT_ANSWER_MARKERS:
+        if marker in response:
+            response = response.split(marker)[-1].strip()
+            break
+
+    response = re.sub(r'([📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟]+)\s*([📊🔹✅⚠️💡🎯🔍📈📉🚀⭐🌟]+)', r'\1', response)
+    response = re.sub(r'\*\*([^*]+)\*\*', r'\1', response)
+    response = re.sub(r'[-=]{3,}', '', response)
+    response = re.sub(r'\n{3,}', '\n\n', response)
+    response = response.strip()
+
+    has_chinese = any('一' <= char <= '鿿' for char in response)
+
+    score = 50
+    if len(response) >= 20:
+        score += 10
+    if re.findall(r'\d+', response):
+        score += 15
+    found = [c for c in KEY_CONCEPTS if c.lower() in response.lower()]
+    score += min(len(found) * 5, 25) if found else 0
+    if [c for c in CONCLUSION_INDICATORS if c.lower() in response.lower()]:
+        score += 10
+    errors = [e for e in ERROR_INDICATORS if e.lower() in response.lower()]
+    score -= len(errors) * 15
+
+    return {"response": response, "has_chinese": has_chinese, "score": max(30, min(100, score))}
+
+
+def run_benchmark(number: int = 2000):
+    """執行微基準測試"""
+    processor = get_response_processor()
+    full_response = PROMPT + ANSWER
+
+    legacy = legacy_pipeline(full_response, PROMPT)
+    result = processor.process(full_response, prompt=PROMPT)
+    assert legacy["response"] == result["response"], "清理結果不一致"
+    assert legacy["score"] == result["validation"]["accuracy_score"], "評分結果不一致"
+
+    print("🧪 回應後處理微基準測試")
+    print("=" * 50)
+    print(f"📝 輸入長度: {len(full_response)} 字符，重複 {number} 次")
+
+    legacy_time = timeit.timeit(lambda: legacy_pipeline(full_response, PROMPT), number=number)
+    single_time = timeit.timeit(lambda: processor.process(full_response, prompt=PROMPT), number=number)
+
+    def streamed():
+        stream = processor.stream(prompt=PROMPT)
+        for i in range(0, len(full_response), 16):
+            stream.feed(full_response[i:i + 16])
+        return stream.finish()
+
+    stream_time = timeit.timeit(streamed, number=number)
+
+    print(f"⏱️  原本多段流程:   {legacy_time / number * 1e6:8.1f} µs/次")
+    print(f"⏱️  預編譯後處理:   {single_time / number * 1e6:8.1f} µs/次")
+    print(f"⏱️  串流處理(16字): {stream_time / number * 1e6:8.1f} µs/次")
+    print(f"🚀 加速比: {legacy_time / single_time:.2f}x")
+
+
+def scan_terms(terms, text):
+    """逐詞子字串比對（原本的做法）"""
+    lowered = text.lower()
+    return {t for t in terms if t in lowered}
+
+
+def run_validator_benchmark(number: int = 2000):
+    """比較逐詞比對與自動機在不同詞彙量下的掃描時間"""
+    print("\n🧪 回應驗證詞彙掃描")
+    print("=" * 50)
+
+    rng = random.Random(42)
+    alphabet = "abcdefghijklmnopqrstuvwxyz網路健康分析狀況區塊鏈節點共識礦工算力"
+    rules = load_scoring_rules()
+    responses = [ANSWER, ANSWER.replace("健康", "bitcoin 以太坊"), "Tick 31530000 network analysis: recommend monitoring."]
+
+    for extra in (0, 200, 1000):
+        synthetic = {"".join(rng.choice(alphabet) for _ in range(rng.randint(3, 8))) for _ in range(extra)}
+        rules["categories"].append({"name": "synthetic", "terms": sorted(synthetic), "weight": 0})
+        validator = ResponseValidator(rules=rules)
+        rules["categories"].pop()
+        terms = validator.automaton.terms
+
+        for text in responses:
+            assert validator.automaton.find(text) == scan_terms(terms, text), "詞彙比對結果不一致"
+
+        naive_time = timeit.timeit(lambda: scan_terms(terms, ANSWER), number=number)
+        automaton_time = timeit.timeit(lambda: validator.automaton.find(ANSWER), number=number)
+        print(f"📚 {len(terms):5d} 個詞彙: 逐詞比對 {naive_time / number * 1e6:7.1f} µs | "
+              f"自動機 {automaton_time / number * 1e6:7.1f} µs")
+
+    validator = ResponseValidator()
+    batch = responses * 100
+    assert validator.score_batch(batch) == [validator.score(text) for text in batch], "批次評分結果不一致"
+    loop_time = timeit.timeit(lambda: [validator.score(text) for text in batch], number=20)
+    batch_time = timeit.timeit(lambda: validator.score_batch(batch), number=20)
+    print(f"📦 {len(batch)} 筆評分: 逐筆 {loop_time / 20 * 1e3:.2f} ms | 批次 {batch_time / 20 * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    run_benchmark()
+    run_validator_benchmark()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Qubic 知識匯入工具
+將 Qubic 知識文件依標題切片並寫入記憶體映射知識儲存檔，只重新處理內容有變更的檔案
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加專案根目錄到路徑
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.ai.knowledge_store import (
+    build_store, discover_sources, DEFAULT_STORE_DIR, DEFAULT_SOURCES, PROJECT_ROOT
+)
+from backend.ai.qubic_knowledge import QubicKnowledgeBase
+
+
+def main():
+    """主函數"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest project Markdown docs into the Qubic knowledge store")
+    parser.add_argument('paths', nargs='*',
+                        help='Markdown files to ingest (default: the Qubic knowledge docs in DEFAULT_SOURCES)')
+    parser.add_argument('--store-dir', type=Path, default=DEFAULT_STORE_DIR,
+                        help=f'Knowledge store directory (default: {DEFAULT_STORE_DIR})')
+    parser.add_argument('--max-tokens', type=int, default=200,
+                        help='Maximum estimated tokens per chunk (default: 200)')
+    parser.add_argument('--force', action='store_true',
+                        help='Reprocess every file even if unchanged')
+
+    args = parser.parse_args()
+
+    sources = [Path(p) for p in args.paths] if args.paths else discover_sources(PROJECT_ROOT, DEFAULT_SOURCES)
+    print(f"📚 匯入 {len(sources)} 個 Markdown 文件...")
+
+    start = time.perf_counter()
+    stats = build_store(sources, store_dir=args.store_dir, max_tokens=args.max_tokens, force=args.force)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"✅ 重新處理 {stats['reprocessed']} 個，沿用 {stats['reused']} 個，略過 {stats['skipped']} 個")
+    print(f"🧩 {stats['chunks']:,} 個片段，{stats['terms']:,} 個詞項，文字 {stats['bytes'] / 1024:.1f} KB")
+    print(f"⏱️  匯入耗時 {build_ms:.1f} ms → {stats['path']}")
+
+    # 預先更新向量索引，避免服務啟動時才編碼新片段
+    start = time.perf_counter()
+    kb = QubicKnowledgeBase(store_dir=args.store_dir)
+    print(f"🧮 向量索引重新編碼 {kb.vector_index.encoded_count} 個片段，"
+          f"知識庫載入 {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
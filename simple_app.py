@@ -3,40 +3,35 @@
 簡化版 QDashboard - 不含 AI 功能
 """
 
-from flask import Flask, send_file, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
 import os
 import time
 import random
 
+from backend.app.static_assets import StaticAssets
+
 app = Flask(__name__)
 CORS(app)
 
+# 前端檔案在啟動時載入記憶體
+static_assets = StaticAssets(os.path.join(os.path.dirname(__file__), 'frontend'))
+static_assets.preload()
+
 @app.route('/')
 def index():
     """首頁路由"""
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'index.html')
-    return send_file(frontend_path)
+    return static_assets.send('index.html') or ("File not found", 404)
 
 @app.route('/qdashboard/')
 def qdashboard():
     """QDashboard 主頁面"""
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', 'qdashboard', 'index.html')
-    return send_file(frontend_path)
+    return static_assets.send('qdashboard/') or ("File not found", 404)
 
 @app.route('/<path:filename>')
 def static_files(filename):
-    """靜態文件路由"""
-    if filename.endswith('/'):
-        index_path = os.path.join(os.path.dirname(__file__), 'frontend', filename, 'index.html')
-        if os.path.exists(index_path):
-            return send_file(index_path)
-    
-    frontend_path = os.path.join(os.path.dirname(__file__), 'frontend', filename)
-    if os.path.exists(frontend_path) and os.path.isfile(frontend_path):
-        return send_file(frontend_path)
-    else:
-        return "File not found", 404
+    """靜態文件路由（以 / 結尾時回傳目錄的 index.html）"""
+    return static_assets.send(filename) or ("File not found", 404)
 
 @app.route('/api/tick')
 def get_tick():